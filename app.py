@@ -1,12 +1,102 @@
-from flask import Flask, request, render_template, send_file
+from psycopg2 import Error
+from flask import Flask, Response, g, request, render_template, send_file, jsonify, url_for, stream_with_context
+import batch
+import build_cache
+import code_analysis
+import db
+import history
+import jobs
+import llm_cache
+import llm_client
+import log_writer
+import metrics
+import pdf_render
+import sandbox
+import winnowing
+import minhash
+import pattern_library
 import test5
 import test7
 import test8
 import test9
+import importlib
 import io
+import json
+import time
 
 app = Flask(__name__)
 
+# Heavy optional imports that are otherwise deferred to the first request using them
+WARMUP_MODULES = ("javalang", "reportlab.platypus")
+
+def warmup():
+    """
+    Do the one-time startup work up front instead of on the first requests.
+    Nothing here runs at import time: each step also happens lazily on first
+    use, so a worker boots quickly even when Postgres or Gemini isn't up yet.
+    """
+    # Create or migrate the database schema once per process, not per request
+    db.ensure_schema()
+    # Start loading past submissions into the plagiarism indexes in the background
+    winnowing.ensure_loaded()
+    minhash.ensure_loaded()
+    # Compile the algorithm pattern libraries once, before the first request
+    pattern_library.load()
+    # Configure the Gemini client and import the parsers and ReportLab
+    llm_client.get_model()
+    for module in WARMUP_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            app.logger.warning(f"Warmup could not import {module}: {e}")
+
+def preload():
+    """
+    The startup work a pre-fork server's master can do once for all workers
+    (see gunicorn.conf.py): migrate the schema, load the plagiarism indexes
+    completely so forked workers inherit them, compile the pattern libraries
+    and import the parsers. Leaves no database connection or Gemini client
+    behind to be shared across the fork; each worker creates its own in warmup().
+    """
+    db.ensure_schema()
+    winnowing.ensure_loaded(wait=True)
+    minhash.ensure_loaded(wait=True)
+    pattern_library.load()
+    for module in WARMUP_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            app.logger.warning(f"Preload could not import {module}: {e}")
+    db.close_pool()
+
+# Metrics
+for _name, _module in (("llm", llm_client), ("llm_cache", llm_cache), ("log_writer", log_writer),
+                       ("sandbox", sandbox), ("build_cache", build_cache), ("analysis_cache", code_analysis),
+                       ("pdf", pdf_render), ("jobs", jobs), ("winnowing", winnowing), ("minhash", minhash)):
+    metrics.register_collector(_name, _module.stats)
+
+@app.before_request
+def start_timing():
+    g.request_started = time.perf_counter()
+    metrics.begin_request()
+
+@app.after_request
+def record_timing(response):
+    breakdown = metrics.end_request()
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    endpoint = request.endpoint or 'unknown'
+    metrics.observe("request_seconds", elapsed, endpoint=endpoint)
+    metrics.inc("requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+    # Per-stage breakdown for browser devtools/curl -v, on demand or always with METRICS_SERVER_TIMING=1
+    if metrics.SERVER_TIMING or request.args.get('timing') == '1':
+        breakdown['total'] = elapsed
+        response.headers['Server-Timing'] = metrics.server_timing(breakdown)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -32,13 +122,15 @@ def optimize():
     if request.method == 'POST':
         code = request.form['code']
         language = request.form['language']
-        optimized_code, debug_info, exec_time, opt_level = test7.optimize_code(code, language)
+        profile = request.form.get('profile') == 'on'
+        optimized_code, debug_info, exec_time, opt_level = test7.optimize_code(code, language, profile=profile)
         return render_template('optimize.html', 
                              code=code, 
                              result=optimized_code, 
                              report=debug_info, 
                              exec_time=exec_time, 
-                             opt_level=opt_level, 
+                             opt_level=opt_level,
+                             profile=profile, 
                              language=language)
     return render_template('optimize.html', code=None, result=None, report=None, exec_time=None, opt_level=None)
 
@@ -63,9 +155,9 @@ def document():
     if request.method == 'POST':
         code = request.form['code']
         language = request.form['language']
-        documentation, pdf_buffer = test9.generate_documentation(code, language)
+        documentation = test9.generate_documentation(code, language)
         if request.form.get('download') == 'pdf':
-            pdf_buffer.seek(0)
+            pdf_buffer = test9.generate_pdf_documentation(documentation)
             return send_file(
                 pdf_buffer,
                 as_attachment=True,
@@ -78,5 +170,99 @@ def document():
                              language=language)
     return render_template('document.html', code=None, result=None)
 
+# Background Jobs
+def _run_fix(code, language):
+    corrected_code, error_report, error_count = test5.fix_code(code, language)
+    return {'result': corrected_code, 'report': error_report, 'error_count': error_count}
+
+def _run_optimize(code, language):
+    optimized_code, debug_info, exec_time, opt_level = test7.optimize_code(code, language)
+    return {'result': optimized_code, 'report': debug_info, 'exec_time': exec_time, 'opt_level': opt_level}
+
+def _run_plagiarism(code, language):
+    cleaned_code, debug_info, plagiarism_score = test8.check_plagiarism_and_fix(code, language.lower())
+    return {'result': cleaned_code, 'report': debug_info, 'score': plagiarism_score}
+
+def _run_document(code, language):
+    documentation = test9.generate_documentation(code, language)
+    return {'result': documentation}
+
+JOB_FEATURES = {
+    'fix-errors': _run_fix,
+    'optimize': _run_optimize,
+    'check-plagiarism': _run_plagiarism,
+    'document': _run_document,
+}
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    data = request.get_json(silent=True) or request.form
+    feature = data.get('feature')
+    if feature not in JOB_FEATURES:
+        return jsonify(error=f"Unknown feature, expected one of: {', '.join(JOB_FEATURES)}"), 400
+    if not data.get('code') or not data.get('language'):
+        return jsonify(error="Both 'code' and 'language' are required"), 400
+    try:
+        job_id = jobs.submit(feature, JOB_FEATURES[feature], data['code'], data['language'])
+    except jobs.QueueFullError as e:
+        return jsonify(error=f"Job queue is full: {e}"), 503
+    return jsonify(job_id=job_id, status_url=url_for('job_status', job_id=job_id)), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown or expired job"), 404
+    return jsonify(job)
+
+# History
+@app.route('/history/<feature>', methods=['GET'])
+def review_history(feature):
+    """
+    Past reviews for one feature, newest first, as JSON pages. Pass the
+    returned next_cursor back as ?cursor= for the following page.
+    """
+    try:
+        page = history.search(feature, request.args)
+    except history.QueryError as e:
+        return jsonify(error=str(e)), 400
+    except Error as e:
+        return jsonify(error=f"History is unavailable: {e}"), 503
+    if page['next_cursor']:
+        # Only the filters history reads, so keys like _external can't steer url_for
+        args = {key: request.args.getlist(key) for key in history.parameters(feature) if key in request.args}
+        page['next_url'] = url_for('review_history', feature=feature, cursor=page['next_cursor'], **args)
+    return jsonify(page)
+
+# Batch Review
+@app.route('/batch', methods=['POST'])
+def batch_review():
+    """
+    Review every source file in an uploaded zip/tar. Results stream back as
+    NDJSON, one line per (file, feature) as it finishes, then a summary line.
+    """
+    upload = request.files.get('archive')
+    if upload is None:
+        return jsonify(error="Upload the archive in an 'archive' file field"), 400
+    features = [name for value in request.form.getlist('features') for name in value.split(',') if name]
+    features = features or ['fix-errors']
+    unknown = [name for name in features if name not in JOB_FEATURES]
+    if unknown:
+        return jsonify(error=f"Unknown feature {', '.join(unknown)}, expected any of: {', '.join(JOB_FEATURES)}"), 400
+    try:
+        concurrency = int(request.form.get('concurrency', batch.BATCH_CONCURRENCY))
+        files, skipped = batch.extract_sources(upload.read(batch.MAX_ARCHIVE_BYTES + 1), upload.filename)
+    except ValueError:
+        return jsonify(error="'concurrency' must be an integer"), 400
+    except batch.ArchiveError as e:
+        return jsonify(error=str(e)), 400
+    if not files:
+        return jsonify(error="No Python, Java or C source files found in the archive"), 400
+
+    records = batch.run(files, {name: JOB_FEATURES[name] for name in features}, concurrency, skipped)
+    lines = (json.dumps(record, default=str) + '\n' for record in records)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
 if __name__ == '__main__':
+    warmup()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,174 @@
+import llm_client
+import io
+import logging
+import os
+import posixpath
+import tarfile
+import time
+import traceback
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 4))   # default workers per batch
+MAX_BATCH_CONCURRENCY = int(os.environ.get("MAX_BATCH_CONCURRENCY", 16))
+MAX_ARCHIVE_BYTES = 20 * 1024 * 1024
+MAX_FILES = 200
+MAX_FILE_BYTES = 256 * 1024
+
+LANGUAGE_BY_EXTENSION = {
+    ".py": "Python",
+    ".java": "Java",
+    ".c": "C",
+    ".h": "C",
+}
+
+# What a corrupt member or truncated archive raises while it is being read
+READ_ERRORS = (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError, RuntimeError, NotImplementedError)
+
+class ArchiveError(Exception):
+    pass
+
+# Archive Reading
+def _archive_members(data, filename):
+    """
+    Yield (path, size, read) for every regular file in a zip or tar archive;
+    read() returns its bytes. A tar that breaks off after some members ends
+    with (None, None, error).
+    """
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(data))
+        except READ_ERRORS as e:
+            raise ArchiveError(f"{filename or 'upload'} is a corrupt zip archive: {e}")
+        with archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, lambda info=info: archive.read(info)
+        return
+    try:
+        # Mode "r:*" handles plain, gzip, bz2 and xz tarballs
+        archive = tarfile.open(fileobj=io.BytesIO(data), mode="r:*")
+    except tarfile.TarError:
+        raise ArchiveError(f"{filename or 'upload'} is not a zip or tar archive")
+    with archive:
+        members = iter(archive)
+        listed = False
+        while True:
+            try:
+                member = next(members)
+            except StopIteration:
+                return
+            except READ_ERRORS as e:
+                # Members are read in order, so nothing past a truncated or corrupt header can be listed
+                if not listed:
+                    raise ArchiveError(f"{filename or 'upload'} is truncated or corrupt: {e}")
+                yield None, None, e
+                return
+            listed = True
+            if member.isfile():
+                yield member.name, member.size, lambda member=member: archive.extractfile(member).read()
+
+def extract_sources(data, filename=""):
+    """
+    Read the source files out of an uploaded archive without touching the disk.
+    Returns (files, skipped): files are dicts with path, language and code
+    (or error, for a member that couldn't be read, which run() reports as
+    failed); skipped lists (path, reason) for everything that won't be reviewed.
+    """
+    if len(data) > MAX_ARCHIVE_BYTES:
+        raise ArchiveError(f"Archive is larger than {MAX_ARCHIVE_BYTES // (1024 * 1024)} MB")
+    files = []
+    skipped = []
+    for path, size, read in _archive_members(data, filename):
+        if path is None:
+            skipped.append((filename or "upload", f"archive is truncated or corrupt after the files above: {read}"))
+            continue
+        path = posixpath.normpath(path.replace("\\", "/")).lstrip("/")
+        language = LANGUAGE_BY_EXTENSION.get(posixpath.splitext(path)[1].lower())
+        if language is None or "__MACOSX" in path.split("/"):
+            continue
+        if size > MAX_FILE_BYTES:
+            skipped.append((path, f"larger than {MAX_FILE_BYTES // 1024} KB"))
+            continue
+        if len(files) >= MAX_FILES:
+            skipped.append((path, f"archive has more than {MAX_FILES} source files"))
+            continue
+        try:
+            code = read().decode("utf-8")
+        except UnicodeDecodeError:
+            skipped.append((path, "not UTF-8 text"))
+            continue
+        except READ_ERRORS as e:
+            files.append({"path": path, "language": language, "code": None,
+                          "error": f"Could not read file from archive: {type(e).__name__}: {e}"})
+            continue
+        if code.strip():
+            files.append({"path": path, "language": language, "code": code})
+    return files, skipped
+
+# Fan-out
+def _review(path, language, feature, func, code, error=None):
+    start = time.perf_counter()
+    if error is not None:
+        result = None
+    else:
+        try:
+            with llm_client.lane(llm_client.BATCH):
+                result = func(code, language)
+        except Exception as e:
+            logger.error(f"Batch {feature} failed for {path}: {e}\n{traceback.format_exc()}")
+            result, error = None, str(e)
+    return {
+        "type": "result",
+        "path": path,
+        "language": language,
+        "feature": feature,
+        "result": result,
+        "error": error,
+        "seconds": time.perf_counter() - start,
+    }
+
+def run(files, features, concurrency=BATCH_CONCURRENCY, skipped=()):
+    """
+    Run every feature over every file on a pool of `concurrency` threads.
+    `features` maps feature name to func(code, language) -> dict.
+    Yields one record per (file, feature) as soon as it finishes, then a summary.
+    """
+    concurrency = max(1, min(int(concurrency), MAX_BATCH_CONCURRENCY))
+    start = time.perf_counter()
+    per_feature = {name: {"tasks": 0, "failed": 0, "seconds": 0.0} for name in features}
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-worker")
+    try:
+        futures = [executor.submit(_review, f["path"], f["language"], name, func, f["code"], f.get("error"))
+                   for f in files for name, func in features.items()]
+        for future in as_completed(futures):
+            record = future.result()
+            totals = per_feature[record["feature"]]
+            totals["tasks"] += 1
+            totals["failed"] += record["error"] is not None
+            totals["seconds"] += record["seconds"]
+            yield record
+    finally:
+        # A client that disconnects mid-stream shouldn't leave queued reviews running
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    wall = time.perf_counter() - start
+    busy = sum(totals["seconds"] for totals in per_feature.values())
+    yield {
+        "type": "summary",
+        "files": len(files),
+        "skipped": [{"path": path, "reason": reason} for path, reason in skipped],
+        "tasks": sum(totals["tasks"] for totals in per_feature.values()),
+        "failed": sum(totals["failed"] for totals in per_feature.values()),
+        "concurrency": concurrency,
+        "wall_seconds": wall,
+        "busy_seconds": busy,
+        "speedup": busy / wall if wall else 0.0,
+        "features": per_feature,
+    }
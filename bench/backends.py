@@ -0,0 +1,135 @@
+"""Local stand-ins for Gemini and Postgres used by the load tests."""
+import glob
+import logging
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEFAULT_LATENCY = 0.8         # seconds per fake Gemini call
+DEFAULT_JITTER = 0.25         # latency varies uniformly by +/- this fraction
+DEFAULT_RESPONSE_CHARS = 2000
+PG_START_TIMEOUT = 30
+
+# Fake LLM
+class _Usage:
+    def __init__(self, total_token_count):
+        self.total_token_count = total_token_count
+
+class _Response:
+    def __init__(self, text, tokens):
+        self.text = text
+        self.usage_metadata = _Usage(tokens)
+
+class FakeModel:
+    """
+    Answers generate_content() after a configurable delay with a response in
+    the format each feature parses, echoing the submitted code back so the
+    downstream steps (benchmarks, reassembly, PDF) still do real work.
+    """
+
+    def __init__(self, latency=DEFAULT_LATENCY, jitter=DEFAULT_JITTER, response_chars=DEFAULT_RESPONSE_CHARS):
+        self.model_name = f"fake-{latency}s-{response_chars}c"
+        self.latency = latency
+        self.jitter = jitter
+        self.response_chars = response_chars
+
+    def _filler(self, used):
+        words = "The loop dominates the running time and can be restructured. "
+        size = max(0, self.response_chars - used)
+        return (words * (size // len(words) + 1))[:size]
+
+    def generate_content(self, prompt, request_options=None):
+        time.sleep(max(0.0, self.latency * random.uniform(1 - self.jitter, 1 + self.jitter)))
+        match = re.search(r"(?:Python|Java|C) Code:\n(.*?)\n\nFormat your response", prompt, re.DOTALL)
+        code = match.group(1) if match else "def alternative():\n    return sorted(data)"
+        if "### Corrected Code:" in prompt:
+            text = f"### Corrected Code:\n{code}\n\n### Error Analysis:\n- Found: none\n- Fixes: none\n- Suggestions: "
+        elif "### Optimized Code:" in prompt:
+            text = f"### Optimized Code:\n{code}\n\n### Analysis:\n- Complexity: O(n)\n- Optimizations: "
+        elif "### Alternative Code:" in prompt:
+            text = f"### Alternative Code:\n{code}\n\n### Explanation:\n- Changes: renamed\n- Originality: "
+        else:
+            text = (f"### Problem Statement:\nComputes a result.\n\n### Input/Output Format:\n- Input: none\n- Output: text\n\n"
+                    f"### Constraints:\nnone\n\n### Approach/Algorithm:\n- Logic: direct\n\n"
+                    f"### Commented Code:\n{code}\n\n### Example(s):\n- Input: none\n- Output: ")
+        text += self._filler(len(text))
+        return _Response(text, (len(prompt) + len(text)) // 4)
+
+# Throwaway Postgres
+def _pg_binary(name):
+    found = shutil.which(name)
+    if found:
+        return found
+    candidates = sorted(glob.glob(f"/usr/lib/postgresql/*/bin/{name}") + glob.glob(f"/usr/local/pgsql/bin/{name}"))
+    return candidates[-1] if candidates else None
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_postgres():
+    """
+    initdb a cluster in a temp directory and start it on a free port, listening
+    only on a unix socket in that directory. Returns a handle for stop_postgres().
+    """
+    initdb, pg_ctl = _pg_binary("initdb"), _pg_binary("pg_ctl")
+    if not (initdb and pg_ctl):
+        raise RuntimeError("initdb/pg_ctl not found; install PostgreSQL or use --db none")
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        raise RuntimeError("initdb refuses to run as root; run as an unprivileged user or use --db none")
+    datadir = tempfile.mkdtemp(prefix="codeguide-bench-pg-")
+    port = _free_port()
+    subprocess.run([initdb, "-D", datadir, "-U", "postgres", "-A", "trust", "--no-sync"],
+                   check=True, capture_output=True, text=True)
+    options = f"-p {port} -k {datadir} -c listen_addresses='' -c fsync=off -c synchronous_commit=off"
+    subprocess.run([pg_ctl, "-D", datadir, "-o", options, "-l", os.path.join(datadir, "server.log"),
+                    "-w", "-t", str(PG_START_TIMEOUT), "start"], check=True, capture_output=True, text=True)
+    logger.info(f"Throwaway Postgres running in {datadir} on port {port}")
+    return {"datadir": datadir, "port": port, "pg_ctl": pg_ctl}
+
+def stop_postgres(handle):
+    subprocess.run([handle["pg_ctl"], "-D", handle["datadir"], "-m", "fast", "stop"], capture_output=True)
+    shutil.rmtree(handle["datadir"], ignore_errors=True)
+
+# Setup
+def add_arguments(parser):
+    parser.add_argument("--db", choices=["local", "none", "env"], default="none",
+                        help="local: throwaway Postgres; none: run without a database; env: use DB_* settings as configured")
+    parser.add_argument("--llm-latency", type=float, default=DEFAULT_LATENCY, help="seconds per fake Gemini call")
+    parser.add_argument("--llm-jitter", type=float, default=DEFAULT_JITTER)
+    parser.add_argument("--llm-response-chars", type=int, default=DEFAULT_RESPONSE_CHARS)
+    parser.add_argument("--real-llm", action="store_true", help="call Gemini instead of the fake backend")
+
+def setup(args):
+    """
+    Point the app at the chosen database and LLM backend. Must run before the
+    app's modules are imported, since db.py reads its settings at import time.
+    Returns the Postgres handle to stop afterwards (or None).
+    """
+    handle = None
+    if args.db == "local":
+        handle = start_postgres()
+        os.environ.update(DB_HOST=handle["datadir"], DB_PORT=str(handle["port"]), DB_USER="postgres", DB_NAME="postgres")
+    elif args.db == "none":
+        os.environ["DB_ENABLED"] = "0"
+    if not args.real_llm:
+        # The fake backend has no quota; measure the app, not the rate limiter
+        os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "0")
+        os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "0")
+        import llm_client
+        llm_client.set_model(FakeModel(args.llm_latency, args.llm_jitter, args.llm_response_chars))
+    return handle
@@ -0,0 +1,241 @@
+"""
+Drive the app's feature endpoints at a fixed concurrency and report throughput,
+latency percentiles and the per-stage breakdown from Server-Timing headers.
+
+    python bench/loadtest.py --concurrency 8 --requests 200
+    python bench/loadtest.py --db local --llm-latency 1.5 --label pg-slow-llm
+    python bench/loadtest.py --url http://127.0.0.1:5000 --concurrency 16
+    python bench/loadtest.py --compare bench/results/baseline.json
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import backends
+import workloads
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS = 100
+WARMUP_REQUESTS = 4
+HTTP_TIMEOUT = 300
+
+# Transports
+def _in_process_sender():
+    """Send requests through Flask's test client, one client per thread."""
+    import app
+    app.warmup()
+    local = threading.local()
+
+    def send(endpoint, form):
+        if not hasattr(local, "client"):
+            local.client = app.app.test_client()
+        response = local.client.post(f"{endpoint}?timing=1", data=form)
+        return response.status_code, response.headers.get("Server-Timing", "")
+    return send
+
+def _http_sender(base_url):
+    def send(endpoint, form):
+        data = urllib.parse.urlencode(form).encode("utf-8")
+        try:
+            with urllib.request.urlopen(f"{base_url.rstrip('/')}{endpoint}?timing=1", data=data, timeout=HTTP_TIMEOUT) as response:
+                response.read()
+                return response.status, response.headers.get("Server-Timing", "")
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get("Server-Timing", "")
+    return send
+
+def parse_server_timing(header):
+    """'llm;dur=812.0, parse;dur=1.3' -> {'llm': 0.812, 'parse': 0.0013}"""
+    stages = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if name and key.strip() == "dur":
+                stages[name] = float(value) / 1000
+    return stages
+
+# Driving
+def drive(send, request_stream, concurrency, total, warmup=WARMUP_REQUESTS):
+    """Send warmup requests, then `total` requests from `concurrency` threads. Returns records and wall time."""
+    lock = threading.Lock()
+    records = []
+    stream = iter(request_stream)
+
+    def next_request():
+        with lock:
+            return next(stream)
+
+    for _ in range(warmup):
+        send(*next_request())
+
+    def worker(count):
+        for _ in range(count):
+            endpoint, form = next_request()
+            start = time.perf_counter()
+            try:
+                status, timing = send(endpoint, form)
+            except Exception as e:
+                status, timing = f"error: {e}", ""
+            elapsed = time.perf_counter() - start
+            with lock:
+                records.append({"endpoint": endpoint, "status": status, "seconds": elapsed,
+                                "stages": parse_server_timing(timing)})
+
+    shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as executor:
+        list(executor.map(worker, shares))
+    return records, time.perf_counter() - start
+
+# Reporting
+def _latency_summary(seconds, wall):
+    import benchmark
+    ordered = sorted(seconds)
+    if not ordered:
+        return {"requests": 0}
+    return {
+        "requests": len(ordered),
+        "throughput": len(ordered) / wall if wall else 0.0,
+        "mean": sum(ordered) / len(ordered),
+        "p50": benchmark.percentile(ordered, 50),
+        "p95": benchmark.percentile(ordered, 95),
+        "p99": benchmark.percentile(ordered, 99),
+        "max": ordered[-1],
+    }
+
+def summarize(records, wall):
+    import benchmark
+    ok = [r for r in records if r["status"] == 200]
+    summary = {"overall": dict(_latency_summary([r["seconds"] for r in ok], wall),
+                               errors=len(records) - len(ok), wall_seconds=wall),
+               "endpoints": {}}
+    for endpoint in sorted({r["endpoint"] for r in records}):
+        mine = [r for r in ok if r["endpoint"] == endpoint]
+        stages = {}
+        for name in sorted({name for r in mine for name in r["stages"]}):
+            values = sorted(r["stages"].get(name, 0.0) for r in mine)
+            stages[name] = {"mean": sum(values) / len(values), "p95": benchmark.percentile(values, 95)}
+        summary["endpoints"][endpoint] = dict(_latency_summary([r["seconds"] for r in mine], wall),
+                                              errors=sum(1 for r in records if r["endpoint"] == endpoint and r["status"] != 200),
+                                              stages=stages)
+    return summary
+
+def _ms(seconds):
+    return f"{seconds * 1000:8.1f}"
+
+def format_summary(summary):
+    o = summary["overall"]
+    lines = [f"{o['requests']} ok, {o['errors']} errors in {o['wall_seconds']:.1f}s: "
+             f"{o.get('throughput', 0):.2f} req/s"]
+    lines.append(f"{'endpoint':<20}{'req':>6}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'err':>6}")
+    for endpoint, e in summary["endpoints"].items():
+        if not e["requests"]:
+            lines.append(f"{endpoint:<20}{0:>6}{'':>8}{'':>10}{'':>10}{'':>10}{e['errors']:>6}")
+            continue
+        lines.append(f"{endpoint:<20}{e['requests']:>6}{e['throughput']:>8.2f}  {_ms(e['p50'])}  {_ms(e['p95'])}  {_ms(e['p99'])}{e['errors']:>6}")
+    for endpoint, e in summary["endpoints"].items():
+        if e.get("stages"):
+            lines.append(f"\nStages for {endpoint} (mean / p95 ms per request):")
+            for name, s in sorted(e["stages"].items(), key=lambda item: -item[1]["mean"]):
+                lines.append(f"  {name:<28}{_ms(s['mean'])} / {_ms(s['p95'])}")
+    return "\n".join(lines)
+
+def format_comparison(baseline, current):
+    """Throughput and latency percentiles of two saved results side by side, with relative change."""
+    lines = [f"Comparing {baseline.get('label')} -> {current.get('label')}"]
+    rows = [("overall", baseline["summary"]["overall"], current["summary"]["overall"])]
+    rows += [(endpoint, baseline["summary"]["endpoints"].get(endpoint, {}), e)
+             for endpoint, e in current["summary"]["endpoints"].items()]
+    for name, before, after in rows:
+        cells = []
+        for key in ("throughput", "p50", "p95", "p99"):
+            if before.get(key) and after.get(key):
+                change = (after[key] - before[key]) / before[key] * 100
+                cells.append(f"{key} {before[key]:.3f} -> {after[key]:.3f} ({change:+.1f}%)")
+        lines.append(f"{name}: " + ("; ".join(cells) if cells else "no comparable data"))
+    return "\n".join(lines)
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def _server_stats():
+    """Internal counters of the in-process app (LLM calls, cache hits, sandbox jobs...)."""
+    import llm_cache
+    import llm_client
+    import log_writer
+    import sandbox
+    return {"llm": llm_client.stats(), "llm_cache": llm_cache.stats(), "log_writer": log_writer.stats(),
+            "sandbox": sandbox.stats()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the feature endpoints with local stand-ins for Gemini and Postgres.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="measured requests (after warmup)")
+    parser.add_argument("--warmup", type=int, default=WARMUP_REQUESTS)
+    parser.add_argument("--endpoints", default=",".join(workloads.ENDPOINTS))
+    parser.add_argument("--languages", default="Python", help="comma-separated: Python, C")
+    parser.add_argument("--repeat", action="store_true", help="resubmit identical code so the caches hit")
+    parser.add_argument("--url", help="drive a running server over HTTP instead of the app in-process")
+    parser.add_argument("--label", help="name of the saved result (default: commit and time)")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", help="saved result to compare this run against")
+    backends.add_arguments(parser)
+    args = parser.parse_args()
+
+    handle = None if args.url else backends.setup(args)
+    try:
+        send = _http_sender(args.url) if args.url else _in_process_sender()
+        stream = workloads.requests(args.endpoints.split(","), args.languages.split(","), unique=not args.repeat)
+        records, wall = drive(send, stream, args.concurrency, args.requests, args.warmup)
+        summary = summarize(records, wall)
+        server = None if args.url else _server_stats()
+    finally:
+        if handle:
+            backends.stop_postgres(handle)
+
+    commit = _git_commit()
+    result = {
+        "label": args.label or f"{commit or 'unknown'}-{time.strftime('%Y%m%d-%H%M%S')}",
+        "timestamp": time.time(),
+        "git_commit": commit,
+        "config": {key: value for key, value in vars(args).items() if key not in ("compare", "no_save", "label")},
+        "summary": summary,
+        "server": server,
+    }
+    print(format_summary(summary))
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{result['label']}.json")
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+        print(f"\nSaved {path}")
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n" + format_comparison(json.load(f), result))
+    return 0 if summary["overall"]["errors"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""
+Run the app with the load-test stand-ins, for driving it over HTTP:
+
+    python bench/serve.py --db local --llm-latency 0.5 --port 5001
+    python bench/loadtest.py --url http://127.0.0.1:5001
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import backends
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the app with a fake Gemini backend and a local or disabled database.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    backends.add_arguments(parser)
+    args = parser.parse_args()
+
+    handle = backends.setup(args)
+    try:
+        import app
+        app.warmup()
+        app.app.run(host=args.host, port=args.port, threaded=True, debug=False)
+    finally:
+        if handle:
+            backends.stop_postgres(handle)
+
+if __name__ == "__main__":
+    main()
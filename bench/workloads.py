@@ -0,0 +1,99 @@
+"""Request mixes for the load tests: one sample submission per endpoint and language."""
+import itertools
+
+PYTHON = {
+    "/fix-errors": '''def average(values):
+    total = 0
+    for v in values:
+        total += v
+    return total / len(values)
+
+def report(items):
+    print("mean", average(items))
+    print("count", cnt)
+
+report([3, 1, 4, 1, 5, 9, 2, 6])
+''',
+    "/optimize": '''def pairs_with_sum(values, target):
+    found = []
+    for i in range(len(values)):
+        for j in range(len(values)):
+            if i < j and values[i] + values[j] == target:
+                found.append((values[i], values[j]))
+    return found
+
+print(len(pairs_with_sum(list(range(300)), 299)))
+''',
+    "/check-plagiarism": '''def bubble_sort(arr):
+    n = len(arr)
+    for i in range(n):
+        for j in range(0, n-i-1):
+            if arr[j] > arr[j+1]:
+                arr[j], arr[j+1] = arr[j+1], arr[j]
+    return arr
+
+print(bubble_sort([5, 2, 9, 1, 7]))
+''',
+    "/document": '''import heapq
+
+def dijkstra(graph, source):
+    dist = {node: float("inf") for node in graph}
+    dist[source] = 0
+    queue = [(0, source)]
+    while queue:
+        d, node = heapq.heappop(queue)
+        if d > dist[node]:
+            continue
+        for neighbour, weight in graph[node]:
+            if d + weight < dist[neighbour]:
+                dist[neighbour] = d + weight
+                heapq.heappush(queue, (dist[neighbour], neighbour))
+    return dist
+
+graph = {"a": [("b", 1), ("c", 4)], "b": [("c", 2)], "c": []}
+print(dijkstra(graph, "a"))
+''',
+}
+
+C = {
+    "/fix-errors": '''#include <stdio.h>
+
+int main() {
+    int values[] = {3, 1, 4, 1, 5};
+    int total = 0;
+    for (int i = 0; i < 5; i++) total += values[i];
+    printf("%d\\n", total);
+    return 0;
+}
+''',
+    "/optimize": '''#include <stdio.h>
+
+int main() {
+    long count = 0;
+    for (int i = 0; i < 2000; i++)
+        for (int j = 0; j < 2000; j++)
+            if ((i ^ j) % 7 == 0) count++;
+    printf("%ld\\n", count);
+    return 0;
+}
+''',
+}
+
+SAMPLES = {"Python": PYTHON, "C": C}
+ENDPOINTS = ["/fix-errors", "/optimize", "/check-plagiarism", "/document"]
+
+def requests(endpoints=ENDPOINTS, languages=("Python",), unique=True):
+    """
+    Endless round-robin of (endpoint, form) pairs over the endpoints and languages.
+    With unique=True every submission gets a distinct trailing comment, so the
+    content-addressed caches miss the way they would for real users.
+    """
+    mix = [(endpoint, language, SAMPLES[language][endpoint])
+           for endpoint in endpoints for language in languages if endpoint in SAMPLES[language]]
+    if not mix:
+        raise ValueError("No samples for the chosen endpoints and languages")
+    comment = {"Python": "#", "C": "//"}
+    for n, (endpoint, language, code) in enumerate(itertools.cycle(mix)):
+        if unique:
+            code = f"{code}{comment[language]} load test request {n}\n"
+        yield endpoint, {"code": code, "language": language}
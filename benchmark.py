@@ -0,0 +1,235 @@
+import logging
+import math
+import os
+import platform
+import re
+import shutil
+import subprocess
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+WARMUP_RUNS = 3
+MIN_TRIALS = 10
+MAX_TRIALS = 50
+TIME_BUDGET_SECONDS = 2.0   # per version, warmups included; trials stop once this is spent (after MIN_TRIALS)
+SLOW_MAX_SAMPLES = 3        # programs too slow for warmups + MIN_TRIALS in the budget get at most this many runs
+RUN_TIMEOUT_SECONDS = 5     # any single run taking longer fails the benchmark
+C_OPT_LEVEL = "-O2"
+JAVA_WARMUP_RUNS = 10       # extra in-JVM iterations so trials measure JIT-compiled code
+ALPHA = 0.05                # significance level for the Mann-Whitney U test
+OUTPUT_LIMIT_CHARS = 64 * 1024  # stdout kept from one run, to check rewrites print the same thing
+
+# Statistics
+def percentile(sorted_samples, q):
+    """Linear-interpolated percentile of an already sorted list, q in [0, 100]."""
+    if len(sorted_samples) == 1:
+        return sorted_samples[0]
+    pos = (len(sorted_samples) - 1) * q / 100
+    lower = math.floor(pos)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (pos - lower)
+
+def median_ci(sorted_samples, z=1.96):
+    """Distribution-free ~95% confidence interval for the median from order statistics."""
+    n = len(sorted_samples)
+    half_width = z * math.sqrt(n) / 2
+    lower = max(0, int(math.floor(n / 2 - half_width)))
+    upper = min(n - 1, int(math.ceil(n / 2 + half_width)))
+    return sorted_samples[lower], sorted_samples[upper]
+
+def summarize(samples):
+    ordered = sorted(samples)
+    mean = sum(ordered) / len(ordered)
+    variance = sum((s - mean) ** 2 for s in ordered) / (len(ordered) - 1) if len(ordered) > 1 else 0.0
+    return {
+        "n": len(ordered),
+        "min": ordered[0],
+        "median": percentile(ordered, 50),
+        "mean": mean,
+        "stdev": math.sqrt(variance),
+        "p95": percentile(ordered, 95),
+        "ci95": median_ci(ordered),
+    }
+
+def mann_whitney_p(a, b):
+    """Two-sided p-value of the Mann-Whitney U test (normal approximation with tie correction)."""
+    n1, n2 = len(a), len(b)
+    combined = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(combined)
+    tie_term = 0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+    n = n1 + n2
+    u1 = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0) - n1 * (n1 + 1) / 2
+    mu = n1 * n2 / 2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (abs(u1 - mu) - 0.5) / sigma
+    return math.erfc(max(z, 0) / math.sqrt(2))
+
+def compare(original, optimized):
+    """Compare two benchmark results; positive improvement means the optimized code is faster."""
+    before, after = original["summary"]["median"], optimized["summary"]["median"]
+    p_value = mann_whitney_p(original["samples"], optimized["samples"])
+    return {
+        "improvement": (before - after) / before * 100 if before else 0.0,
+        "speedup": before / after if after else float("inf"),
+        "p_value": p_value,
+        "significant": p_value < ALPHA,
+    }
+
+def _fmt(seconds):
+    if seconds >= 1:
+        return f"{seconds:.3f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f}ms"
+    return f"{seconds * 1e6:.1f}µs"
+
+def format_result(label, result):
+    s = result["summary"]
+    return (f"{label}: median {_fmt(s['median'])} (95% CI {_fmt(s['ci95'][0])}–{_fmt(s['ci95'][1])}), "
+            f"p95 {_fmt(s['p95'])}, n={s['n']} [{result['method']}]")
+
+def format_comparison(original, optimized):
+    c = compare(original, optimized)
+    verdict = ("statistically significant" if c["significant"] else "not statistically significant") + f" (p={c['p_value']:.3g})"
+    return "\n".join([
+        format_result("Original", original),
+        format_result("Optimized", optimized),
+        f"Execution time: {c['improvement']:.2f}% change, {c['speedup']:.2f}x, {verdict}",
+    ])
+
+# Trial Loops
+def _collect(run_once):
+    """
+    Time run_once within TIME_BUDGET_SECONDS. The first run estimates the cost:
+    if WARMUP_RUNS warmups and MIN_TRIALS trials fit in the budget, warm up and
+    run trials until the budget is spent (MIN_TRIALS..MAX_TRIALS). A slower
+    program is not warmed up; its first run counts as a sample and it gets
+    more runs (up to SLOW_MAX_SAMPLES) only while they fit in the budget.
+    """
+    deadline = time.perf_counter() + TIME_BUDGET_SECONDS
+    first = run_once()
+    if first * (WARMUP_RUNS + MIN_TRIALS) > TIME_BUDGET_SECONDS:
+        samples = [first]
+        while len(samples) < SLOW_MAX_SAMPLES and time.perf_counter() + max(samples) <= deadline:
+            samples.append(run_once())
+        return samples
+    for _ in range(WARMUP_RUNS - 1):  # the first run was a warmup
+        run_once()
+    samples = []
+    while len(samples) < MAX_TRIALS and (len(samples) < MIN_TRIALS or time.perf_counter() < deadline):
+        samples.append(run_once())
+    return samples
+
+def _op_python_bench(request, stdout, stderr):
+    """Sandbox worker operation: time exec() of the submission in a fresh namespace per run."""
+    import io
+    import traceback
+    from contextlib import redirect_stdout, redirect_stderr
+    code = compile(request["code"], "<submission>", "exec")
+    sink = io.StringIO()
+
+    def run_once():
+        sink.seek(0)
+        sink.truncate()
+        namespace = {"__name__": "__main__"}
+        with redirect_stdout(sink), redirect_stderr(sink):
+            start = time.perf_counter_ns()
+            exec(code, namespace)
+            return (time.perf_counter_ns() - start) / 1e9
+
+    try:
+        samples = _collect(run_once)
+        return {"error": None, "samples": samples, "output": sink.getvalue()[:OUTPUT_LIMIT_CHARS]}
+    except BaseException as e:
+        return {"error": {"type": type(e).__name__, "message": str(e), "traceback": traceback.format_exc()}}
+
+# Language Runners
+def _bench_python(code):
+    import sandbox
+    # One run of up to RUN_TIMEOUT_SECONDS, then _collect stays close to its time budget
+    budget = RUN_TIMEOUT_SECONDS + 2 * TIME_BUDGET_SECONDS + 1
+    result = sandbox.run("benchmark:_op_python_bench", timeout=budget, cpu_limit=int(budget) + 1, code=code)
+    if result["error"]:
+        return None, f"{result['error']['type']}: {result['error']['message']}"
+    return {"samples": result["samples"], "output": result["output"], "method": "sandboxed exec, perf_counter_ns"}, None
+
+def _bench_c(code):
+    import build_cache
+    if not shutil.which("gcc"):
+        return None, None
+    exe_name = "bench.exe" if platform.system() == "Windows" else "bench"
+    with build_cache.build(["gcc", C_OPT_LEVEL, "-o", exe_name, "bench.c"], "bench.c", code, [exe_name]) as build:
+        if build["returncode"] != 0:
+            return None, f"Compilation failed: {build['stderr']}"
+        exe = os.path.join(build["workdir"], exe_name)
+
+        try:
+            # One untimed run for the output; the trials discard it
+            output = subprocess.run([exe], cwd=build["workdir"], stdin=subprocess.DEVNULL, capture_output=True,
+                                    timeout=RUN_TIMEOUT_SECONDS).stdout.decode(errors="replace")[:OUTPUT_LIMIT_CHARS]
+        except subprocess.TimeoutExpired:
+            return None, f"Execution timed out after {RUN_TIMEOUT_SECONDS}s"
+
+        def run_once():
+            start = time.perf_counter_ns()
+            subprocess.run([exe], cwd=build["workdir"], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, timeout=RUN_TIMEOUT_SECONDS)
+            return (time.perf_counter_ns() - start) / 1e9
+
+        try:
+            samples = _collect(run_once)
+        except subprocess.TimeoutExpired:
+            return None, f"Execution timed out after {RUN_TIMEOUT_SECONDS}s"
+    return {"samples": samples, "output": output, "method": f"gcc {C_OPT_LEVEL}, process wall time incl. startup"}, None
+
+def _bench_java(code):
+    import java_daemon
+    match = re.search(r"public\s+class\s+(\w+)", code)
+    class_name = match.group(1) if match else "Main"
+    trials = MIN_TRIALS * 2
+    try:
+        result = java_daemon.benchmark(class_name, code, JAVA_WARMUP_RUNS, trials,
+                                       timeout=RUN_TIMEOUT_SECONDS * (JAVA_WARMUP_RUNS + trials))
+    except java_daemon.DaemonUnavailable as e:
+        logger.info(f"Java benchmark skipped, daemon unavailable: {e}")
+        return None, None
+    if result["diagnostics"]:
+        return None, f"Compilation failed: {result['diagnostics']}"
+    if result["timed_out"]:
+        return None, "Execution timed out"
+    if len(result["samples"]) < 2:
+        return None, f"Execution failed: {result['stderr']}"
+    return {"samples": result["samples"], "output": result["stdout"],
+            "method": f"in-JVM main() after {JAVA_WARMUP_RUNS} JIT warmup runs"}, None
+
+def benchmark(code, language):
+    """
+    Time the program with warmup runs and repeated trials.
+    Returns (result, error). result is None with no error when the toolchain
+    needed for the language isn't available here.
+    """
+    runners = {"Python": _bench_python, "C": _bench_c, "Java": _bench_java}
+    if language not in runners:
+        return None, f"Unsupported language: {language}"
+    try:
+        result, error = runners[language](code)
+    except Exception as e:
+        return None, f"Benchmark failed: {e}"
+    if result:
+        result["summary"] = summarize(result["samples"])
+    return result, error
@@ -0,0 +1,46 @@
+import hashlib
+import logging
+import os
+import zlib
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+COMPRESSION = os.environ.get("BLOB_COMPRESSION", "zlib")  # "zlib" or "none"
+COMPRESS_MIN_BYTES = 256   # smaller sources are stored as-is; zlib's header would eat the gain
+ZLIB_LEVEL = 6
+
+def digest(text):
+    """Content address of a source: hex SHA-256 of its UTF-8 bytes (the same as Postgres' sha256(convert_to(text, 'UTF8')))."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def pack(text):
+    """
+    The code_blobs row for a source: (hash, compression, size, content).
+    content is zlib-compressed when that makes it smaller; size is the
+    uncompressed length in bytes.
+    """
+    raw = text.encode("utf-8")
+    key = hashlib.sha256(raw).hexdigest()
+    if COMPRESSION == "zlib" and len(raw) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(raw, ZLIB_LEVEL)
+        if len(compressed) < len(raw):
+            return key, "zlib", len(raw), compressed
+    return key, "none", len(raw), raw
+
+def unpack(compression, content):
+    data = bytes(content)
+    if compression == "zlib":
+        data = zlib.decompress(data)
+    return data.decode("utf-8")
+
+def column(inline_text, compression, content):
+    """
+    Text of a code column read with a LEFT JOIN on code_blobs: the referenced
+    blob, or the inline text of rows written before blobs existed.
+    """
+    if content is None:
+        return inline_text
+    return unpack(compression, content)
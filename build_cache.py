@@ -0,0 +1,190 @@
+import metrics
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+# Cached binaries are executed, so the default is private to the current user (see private_dir)
+_USER = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+CACHE_DIR = os.environ.get("BUILD_CACHE_DIR", os.path.join(tempfile.gettempdir(), f"codeguide-build-cache-{_USER}"))
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+COMPILE_TIMEOUT = 5
+
+_evict_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+def _reinit_after_fork():
+    # The cache directory is already shared safely between processes; only
+    # the in-process eviction lock needs replacing in a forked worker
+    global _evict_lock
+    _evict_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+class UnsafeDirectoryError(OSError):
+    pass
+
+def private_dir(path):
+    """
+    Create `path` as a directory only the current user can access (mode 0700),
+    or check that an existing one is. Raises UnsafeDirectoryError if it is a
+    symlink, owned by someone else or open to group/others, since whoever
+    controls it controls the code we run from it.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):  # Windows: no POSIX owner or mode to check
+        return path
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise UnsafeDirectoryError(f"{path} is not a directory")
+    if info.st_uid != os.getuid():
+        raise UnsafeDirectoryError(f"{path} is owned by uid {info.st_uid}, not {os.getuid()}")
+    if info.st_mode & 0o077:
+        raise UnsafeDirectoryError(f"{path} is accessible to other users (mode {stat.S_IMODE(info.st_mode):o})")
+    return path
+
+_cache_usable = None  # checked on first use
+
+def _cache_dir():
+    """CACHE_DIR once it has been checked to be private, or None if caching is disabled."""
+    global _cache_usable
+    if _cache_usable is None:
+        try:
+            private_dir(CACHE_DIR)
+            _cache_usable = True
+        except OSError as e:
+            logger.error(f"Build cache disabled: {e}")
+            _cache_usable = False
+    return CACHE_DIR if _cache_usable else None
+
+def _cache_key(command, source_name, source):
+    digest = hashlib.sha256()
+    # Resolve the compiler so switching toolchains on PATH doesn't serve stale binaries
+    compiler = shutil.which(command[0]) or command[0]
+    for part in [compiler, *command[1:], source_name]:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(hashlib.sha256(source.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+def _entry_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _evict():
+    """Drop least recently used entries until the cache fits in MAX_CACHE_BYTES."""
+    with _evict_lock:
+        entries = []
+        for key in os.listdir(CACHE_DIR):
+            if key.startswith("."):
+                continue
+            path = os.path.join(CACHE_DIR, key)
+            meta = os.path.join(path, "meta.json")
+            if os.path.isfile(meta):
+                entries.append((os.path.getmtime(meta), _entry_size(path), path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= MAX_CACHE_BYTES:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            _stats["evictions"] += 1
+
+def _load(key, workdir):
+    if _cache_dir() is None:
+        return None
+    path = os.path.join(CACHE_DIR, key)
+    meta_path = os.path.join(path, "meta.json")
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        for name in meta["artifacts"]:
+            shutil.copy2(os.path.join(path, "artifacts", name), os.path.join(workdir, name))
+        os.utime(meta_path)  # mark as recently used
+        return meta
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _store(key, workdir, meta, outputs):
+    """Publish an entry atomically: build it under a temp name, then rename."""
+    if _cache_dir() is None:
+        return
+    staging = os.path.join(CACHE_DIR, f".{key}.{uuid.uuid4().hex}")
+    try:
+        os.makedirs(os.path.join(staging, "artifacts"))
+        artifacts = []
+        if meta["returncode"] == 0:
+            for pattern in outputs:
+                for path in glob.glob(os.path.join(workdir, pattern)):
+                    name = os.path.basename(path)
+                    shutil.copy2(path, os.path.join(staging, "artifacts", name))
+                    artifacts.append(name)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(dict(meta, artifacts=artifacts), f)
+        os.rename(staging, os.path.join(CACHE_DIR, key))
+    except OSError:
+        # Another request published the same key first, or the disk is full
+        shutil.rmtree(staging, ignore_errors=True)
+        return
+    _evict()
+
+@contextmanager
+def build(command, source_name, source, outputs):
+    """
+    Compile `source` in a private temporary directory.
+
+    command is the compiler invocation run inside that directory, source_name the
+    file the source is written to, and outputs the glob patterns of artifacts to
+    keep. An identical (compiler, flags, source) build is served from the cache
+    without running the compiler. Yields a dict with workdir, returncode, stdout,
+    stderr and cached; the directory is removed when the block exits.
+    """
+    workdir = tempfile.mkdtemp(prefix="build-")
+    try:
+        with open(os.path.join(workdir, source_name), "w") as f:
+            f.write(source)
+
+        key = _cache_key(command, source_name, source)
+        meta = _load(key, workdir)
+        if meta is not None:
+            _stats["hits"] += 1
+            yield dict(meta, workdir=workdir, cached=True)
+            return
+
+        _stats["misses"] += 1
+        start = time.perf_counter()
+        with metrics.timer("compile"):
+            result = subprocess.run(command, cwd=workdir, capture_output=True, text=True, timeout=COMPILE_TIMEOUT)
+        meta = {
+            "returncode": result.returncode,
+            "stdout": result.stdout,
+            "stderr": result.stderr,
+            "compile_seconds": time.perf_counter() - start,
+        }
+        _store(key, workdir, meta, outputs)
+        yield dict(meta, workdir=workdir, cached=False)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def stats():
+    return dict(_stats)
@@ -0,0 +1,339 @@
+import metrics
+import ast
+import builtins
+import hashlib
+import io
+import keyword
+import logging
+import os
+import re
+import threading
+import tokenize
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+CACHE_MAX_ENTRIES = 256
+
+BUILTIN_NAMES = frozenset(dir(builtins))
+PYTHON_KEYWORDS = frozenset(keyword.kwlist) | BUILTIN_NAMES
+
+# One scanner for C and Java: a single finditer pass over the source picks up
+# every construct the feature modules look for.
+_C_LIKE_SCANNER = re.compile(r"""
+      (?P<include>\#include\s*[<"](?P<include_name>[^>"]+)[>"])
+    | (?P<import>\bimport\s+(?:static\s+)?(?P<import_name>[\w.]+(?:\.\*)?)\s*;)
+    | (?P<class>\b(?:class|interface|enum)\s+(?P<class_name>\w+))
+    | (?P<function>
+          (?:(?:public|private|protected|static|final|abstract|synchronized|native|inline|extern|unsigned|const)\s+)*
+          (?!(?:else|return|new|throw|case|do)\b)(?P<return_type>[\w<>\[\],.]+[\s*]+)
+          (?!(?:if|for|while|switch|catch|return|sizeof|synchronized)\b)(?P<function_name>\w+)
+          \s*\([^)]*\)\s*(?:throws\s+[\w.,\s]+)?\{)
+    | (?P<loop>\b(?P<loop_kind>for|while)\s*\()
+    """, re.VERBOSE)
+
+# Token classes for normalized streams (comments dropped, names and literals abstracted)
+_C_LIKE_TOKENS = re.compile(r"""
+      (?P<comment>//[^\n]*|/\*.*?\*/)
+    | (?P<directive>\#\s*\w+)
+    | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    | (?P<number>\b\d[\w.]*)
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<op>[^\w\s])
+    """, re.VERBOSE | re.DOTALL)
+
+C_KEYWORDS = frozenset("""auto break case char const continue default do double else enum extern float for goto if inline int
+    long register return short signed sizeof static struct switch typedef union unsigned void volatile while""".split())
+JAVA_KEYWORDS = frozenset("""abstract assert boolean break byte case catch char class const continue default do double else enum
+    extends final finally float for if implements import instanceof int interface long native new package private
+    protected public return short static super switch synchronized this throw throws transient try void volatile while
+    true false null var""".split())
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+def _reinit_after_fork():
+    # The analysis cache carries over into a forked worker; its lock must not
+    # be inherited in a held state, so the child gets a fresh one
+    global _lock
+    _lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def normalize_language(language):
+    return {"python": "Python", "java": "Java", "c": "C"}.get(str(language).lower(), language)
+
+def content_hash(code, language=""):
+    return hashlib.sha256(f"{normalize_language(language)}\0{code}".encode("utf-8")).hexdigest()
+
+# Python
+class _PythonFacts(ast.NodeVisitor):
+    """Collects everything the feature modules need in one traversal of the tree."""
+
+    def __init__(self):
+        self.functions = []
+        self.classes = []
+        self.imports = []
+        self.structure = []
+        self.loops = []
+        self.stored_names = set()
+        self.undefined_names = set()
+        self.zero_divisions = []
+
+    def visit_FunctionDef(self, node):
+        self.functions.append(node.name)
+        self.structure.append(f"func:{node.name}")
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self.classes.append(node.name)
+        self.structure.append(f"class:{node.name}")
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        self._import(node.names[0].name)
+
+    def visit_ImportFrom(self, node):
+        self._import(node.module or "." * node.level)
+
+    def _import(self, name):
+        self.imports.append(name)
+        self.structure.append(f"import:{name}")
+
+    def visit_For(self, node):
+        self.loops.append(node.lineno)
+        self.generic_visit(node)
+
+    visit_While = visit_For
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Store):
+            self.stored_names.add(node.id)
+        elif isinstance(node.ctx, ast.Load):
+            if node.id not in self.stored_names and node.id not in BUILTIN_NAMES:
+                self.undefined_names.add(node.id)
+
+    def visit_BinOp(self, node):
+        if isinstance(node.op, ast.Div) and isinstance(node.right, ast.Constant) \
+                and isinstance(node.right.value, (int, float)) and not isinstance(node.right.value, bool) \
+                and node.right.value == 0:
+            self.zero_divisions.append(node.lineno)
+        self.generic_visit(node)
+
+def _analyze_python(code):
+    facts = {"language": "Python", "syntax_error": None, "tree": None}
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        facts["syntax_error"] = {"line": e.lineno, "offset": e.offset, "message": str(e)}
+        return facts
+    visitor = _PythonFacts()
+    visitor.visit(tree)
+    spans = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            spans.append({"name": node.name, "start": start, "end": node.end_lineno})
+    facts.update(
+        spans=spans,
+        tree=tree,
+        functions=visitor.functions,
+        classes=visitor.classes,
+        imports=visitor.imports,
+        structure=visitor.structure,
+        loops=visitor.loops,
+        stored_names=visitor.stored_names,
+        undefined_names=visitor.undefined_names,
+        zero_divisions=visitor.zero_divisions,
+    )
+    return facts
+
+# C / Java
+def _matching_brace(code, open_index):
+    """Index of the brace closing the one at open_index (end of code if unbalanced); skips strings and comments."""
+    depth = 0
+    for match in _C_LIKE_TOKENS.finditer(code, open_index):
+        if match.lastgroup != "op":
+            continue
+        if match.group() == "{":
+            depth += 1
+        elif match.group() == "}":
+            depth -= 1
+            if depth == 0:
+                return match.start()
+    return len(code)
+
+def _analyze_c_like(code, language):
+    facts = {
+        "language": language,
+        "syntax_error": None,
+        "functions": [],
+        "function_types": [],
+        "classes": [],
+        "imports": [],
+        "includes": [],
+        "loops": [],
+        "structure": [],
+        "spans": [],
+    }
+    line = 1
+    last = 0
+    for match in _C_LIKE_SCANNER.finditer(code):
+        line += code.count("\n", last, match.start())
+        last = match.start()
+        kind = match.lastgroup
+        if kind == "include":
+            facts["includes"].append(match.group("include_name"))
+            facts["structure"].append(f"include:{match.group('include_name')}")
+        elif kind == "import":
+            facts["imports"].append(match.group("import_name"))
+            facts["structure"].append(f"import:{match.group('import_name')}")
+        elif kind == "class":
+            facts["classes"].append(match.group("class_name"))
+            facts["structure"].append(f"class:{match.group('class_name')}")
+        elif kind == "function":
+            facts["functions"].append(match.group("function_name"))
+            facts["function_types"].append(match.group("return_type").strip(" *\t\n"))
+            facts["structure"].append(f"func:{match.group('function_name')}")
+            end = _matching_brace(code, match.end() - 1)
+            facts["spans"].append({"name": match.group("function_name"), "start": line,
+                                   "end": line + code.count("\n", match.start(), end)})
+        else:
+            facts["loops"].append(line)
+    return facts
+
+# Public API
+def analyze(code, language):
+    """
+    Parse or scan a submission once and return the shared facts dict.
+    Results are memoized by content hash; treat the returned dict as read-only.
+    """
+    language = normalize_language(language)
+    key = content_hash(code, language)
+    with _lock:
+        facts = _cache.get(key)
+        if facts is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return facts
+        _stats["misses"] += 1
+
+    with metrics.timer("parse"):
+        if language == "Python":
+            facts = _analyze_python(code)
+        elif language in ("C", "Java"):
+            facts = _analyze_c_like(code, language)
+        else:
+            facts = {"language": language, "syntax_error": None, "unsupported": True}
+    facts["content_hash"] = key
+
+    with _lock:
+        _cache[key] = facts
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return facts
+
+def _python_tokens(code):
+    tokens = []
+    skip = (tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER)
+    for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+        if tok.type in skip:
+            continue
+        if tok.type == tokenize.NAME:
+            text = tok.string if tok.string in PYTHON_KEYWORDS else "V"
+        elif tok.type == tokenize.NUMBER:
+            text = "N"
+        elif tok.type == tokenize.STRING:
+            text = "S"
+        elif tok.type == tokenize.NEWLINE:
+            text = ";"
+        elif tok.type in (tokenize.INDENT, tokenize.DEDENT):
+            text = tokenize.tok_name[tok.type]
+        else:
+            text = tok.string
+        tokens.append((text, tok.start[0]))
+    return tokens
+
+def _c_like_tokens(code, keywords):
+    tokens = []
+    line = 1
+    last = 0
+    for match in _C_LIKE_TOKENS.finditer(code):
+        line += code.count("\n", last, match.start())
+        last = match.start()
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+        if kind == "name":
+            text = match.group() if match.group() in keywords else "V"
+        elif kind == "number":
+            text = "N"
+        elif kind == "string":
+            text = "S"
+        else:
+            text = match.group()
+        tokens.append((text, line))
+    return tokens
+
+def tokens(code, language):
+    """
+    Normalized token stream as (token, line) pairs: comments and layout dropped,
+    identifiers become V, numbers N and string/char literals S, keywords and
+    operators kept. Memoized alongside analyze().
+    """
+    facts = analyze(code, language)
+    if "tokens" not in facts:
+        language = facts["language"]
+        if language == "Python":
+            try:
+                stream = _python_tokens(code)
+            except Exception:
+                # Incomplete code that tokenize rejects still gets a usable stream
+                stream = _c_like_tokens(code, PYTHON_KEYWORDS)
+        elif language == "Java":
+            stream = _c_like_tokens(code, JAVA_KEYWORDS)
+        else:
+            stream = _c_like_tokens(code, C_KEYWORDS)
+        facts["tokens"] = stream
+    return facts["tokens"]
+
+def java_tree(code):
+    """javalang compilation unit for the code, parsed once and memoized alongside analyze()."""
+    facts = analyze(code, "Java")
+    if "javalang_tree" not in facts:
+        import javalang
+        facts["javalang_tree"] = javalang.parse.parse(code)
+    return facts["javalang_tree"]
+
+def java_structure(code):
+    """
+    Classes, methods and imports from a full javalang parse, memoized alongside analyze().
+    Raises the parser's exception for code javalang can't parse.
+    """
+    facts = analyze(code, "Java")
+    if "javalang" not in facts:
+        import javalang
+        tree = java_tree(code)
+        structure = {"classes": [], "functions": [], "imports": [], "structure": []}
+        for path, node in tree:
+            if isinstance(node, javalang.tree.ClassDeclaration):
+                structure["classes"].append(node.name)
+                structure["structure"].append(f"class:{node.name}")
+            elif isinstance(node, javalang.tree.MethodDeclaration):
+                structure["functions"].append(node.name)
+                structure["structure"].append(f"method:{node.name}")
+            elif isinstance(node, javalang.tree.Import):
+                structure["imports"].append(node.path)
+                structure["structure"].append(f"import:{node.path}")
+        facts["javalang"] = structure
+    return facts["javalang"]
+
+def stats():
+    with _lock:
+        return dict(_stats, entries=len(_cache))
@@ -0,0 +1,277 @@
+from psycopg2 import Error, pool
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+DB_PARAMS = {
+    "dbname": os.environ.get("DB_NAME", "postgres"),
+    "user": os.environ.get("DB_USER", "postgres"),
+    "password": os.environ.get("DB_PASSWORD", "postgres"),
+    "host": os.environ.get("DB_HOST", "localhost"),
+    "port": os.environ.get("DB_PORT", "5432")
+}
+DB_ENABLED = os.environ.get("DB_ENABLED", "1") != "0"  # 0 runs without Postgres: logging and persistent caches are skipped
+POOL_MIN_CONN = 1
+POOL_MAX_CONN = int(os.environ.get("DB_POOL_MAX_CONN", 10))  # per process
+SCHEMA_RETRY_SECONDS = 30  # after a failed migration run, wait this long before trying again
+
+# Source code columns stored in code_blobs, per log table: text column -> hash column.
+# The blob migrations below are generated from this, so extend it only
+# together with a new migration.
+BLOB_COLUMNS = {
+    "code_analysis_logs": {"original_code": "original_hash", "corrected_code": "corrected_hash"},
+    "code_optimization_records": {"original_code": "original_hash", "optimized_code": "optimized_hash"},
+    "code_plag": {"original_code": "original_hash", "cleaned_code": "cleaned_hash"},
+    "code_doc_logs": {"original_code": "original_hash"},
+}
+
+def _move_code_to_blobs(table):
+    """
+    Migration SQL for one log table: add the hash columns, copy every inline
+    source into code_blobs (uncompressed; TOAST still compresses large ones)
+    and replace the inline text with its hash.
+    """
+    columns = BLOB_COLUMNS[table]
+    statements = [f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {hash_column} CHAR(64);"
+                  for hash_column in columns.values()]
+    statements += [f"ALTER TABLE {table} ALTER COLUMN {text_column} DROP NOT NULL;" for text_column in columns]
+    for text_column in columns:
+        raw = f"convert_to({text_column}, 'UTF8')"
+        statements.append(f"""
+        INSERT INTO code_blobs (hash, compression, size, content)
+            SELECT encode(sha256({raw}), 'hex'), 'none', octet_length({raw}), {raw}
+            FROM {table} WHERE {text_column} IS NOT NULL
+            ON CONFLICT (hash) DO NOTHING;""")
+    assignments = [f"{hash_column} = encode(sha256(convert_to({text_column}, 'UTF8')), 'hex'), {text_column} = NULL"
+                   for text_column, hash_column in columns.items()]
+    conditions = " OR ".join(f"{text_column} IS NOT NULL" for text_column in columns)
+    statements.append(f"UPDATE {table} SET {', '.join(assignments)} WHERE {conditions};")
+    return "\n        ".join(statements)
+
+def _history_indexes(table, range_columns):
+    """
+    Migration SQL for the history API's indexes on one log table: newest-first
+    keyset pages, the same per language or per submitted source, and the
+    numeric range filters. A selective range is read through its own index
+    and only the matching rows are sorted by (timestamp, id).
+    """
+    statements = [
+        f"CREATE INDEX IF NOT EXISTS {table}_timestamp_id_idx ON {table} (timestamp, id);",
+        f"CREATE INDEX IF NOT EXISTS {table}_language_timestamp_id_idx ON {table} (lower(language), timestamp, id);",
+        f"CREATE INDEX IF NOT EXISTS {table}_original_hash_idx ON {table} (original_hash, timestamp, id);",
+    ]
+    statements += [f"CREATE INDEX IF NOT EXISTS {table}_{column}_timestamp_id_idx ON {table} ({column}, timestamp, id);"
+                    for column in range_columns]
+    return "\n        ".join(statements)
+
+# Schema migrations, applied in order exactly once per database. Append new
+# entries at the end; never edit one that has already shipped.
+MIGRATIONS = [
+    ("create code_analysis_logs", """
+        CREATE TABLE IF NOT EXISTS code_analysis_logs (
+            id SERIAL PRIMARY KEY,
+            language VARCHAR(20) NOT NULL,
+            original_code TEXT NOT NULL,
+            corrected_code TEXT NOT NULL,
+            error_report TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            error_count INTEGER
+        );"""),
+    ("create code_optimization_records", """
+        CREATE TABLE IF NOT EXISTS code_optimization_records (
+            id SERIAL PRIMARY KEY,
+            language VARCHAR(20),
+            original_code TEXT NOT NULL,
+            optimized_code TEXT NOT NULL,
+            debug_info TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            execution_time FLOAT,
+            optimization_level VARCHAR(20)
+        );"""),
+    ("create code_plag", """
+        CREATE TABLE IF NOT EXISTS code_plag (
+            id SERIAL PRIMARY KEY,
+            language VARCHAR(10) NOT NULL,
+            original_code TEXT NOT NULL,
+            cleaned_code TEXT,
+            plagiarism_score FLOAT,
+            analysis TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );"""),
+    ("create code_doc_logs", """
+        CREATE TABLE IF NOT EXISTS code_doc_logs (
+            id SERIAL PRIMARY KEY,
+            language VARCHAR(20) NOT NULL,
+            original_code TEXT NOT NULL,
+            documentation TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );"""),
+    ("create llm_response_cache", """
+        CREATE TABLE IF NOT EXISTS llm_response_cache (
+            cache_key CHAR(64) PRIMARY KEY,
+            feature VARCHAR(20) NOT NULL,
+            response TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS llm_response_cache_created_at_idx
+            ON llm_response_cache (created_at);"""),
+    ("add code_plag structural signatures", """
+        ALTER TABLE code_plag ADD COLUMN IF NOT EXISTS structure_hash CHAR(64);
+        ALTER TABLE code_plag ADD COLUMN IF NOT EXISTS structure_signature BIGINT[];
+        CREATE INDEX IF NOT EXISTS code_plag_structure_hash_idx ON code_plag (structure_hash);"""),
+    ("create code_blobs", """
+        CREATE TABLE IF NOT EXISTS code_blobs (
+            hash CHAR(64) PRIMARY KEY,
+            compression VARCHAR(10) NOT NULL,
+            size INTEGER NOT NULL,
+            content BYTEA NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );"""),
+    ("move code_analysis_logs sources to code_blobs", _move_code_to_blobs("code_analysis_logs")),
+    ("move code_optimization_records sources to code_blobs", _move_code_to_blobs("code_optimization_records")),
+    ("move code_plag sources to code_blobs", _move_code_to_blobs("code_plag")),
+    ("move code_doc_logs sources to code_blobs", _move_code_to_blobs("code_doc_logs")),
+    ("add history indexes", "\n        ".join([
+        _history_indexes("code_analysis_logs", ["error_count"]),
+        _history_indexes("code_optimization_records", ["execution_time"]),
+        _history_indexes("code_plag", ["plagiarism_score"]),
+        _history_indexes("code_doc_logs", []),
+    ])),
+    ("create job_records", """
+        CREATE TABLE IF NOT EXISTS job_records (
+            job_id CHAR(32) PRIMARY KEY,
+            record TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS job_records_updated_at_idx ON job_records (updated_at);"""),
+]
+
+# Arbitrary constant used to serialize concurrent migration runs
+MIGRATION_LOCK_ID = 724401
+
+_pool = None
+_pool_lock = threading.Lock()
+# psycopg2's pool raises instead of waiting when it runs dry, so borrowers
+# queue on this semaphore first.
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_CONN)
+_schema_ready = False
+_schema_failed_at = None
+_schema_lock = threading.Lock()
+_inherited_pools = []
+
+def _reinit_after_fork():
+    """
+    Runs in a forked child (e.g. a gunicorn worker): start a fresh pool and
+    locks. The parent's connections are kept referenced but never used or
+    closed here, because closing a shared socket would end the parent's session.
+    """
+    global _pool, _pool_lock, _pool_slots, _schema_lock
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    _pool = None
+    _pool_lock = threading.Lock()
+    _pool_slots = threading.BoundedSemaphore(POOL_MAX_CONN)
+    _schema_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+# Connection Pool
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pool.ThreadedConnectionPool(POOL_MIN_CONN, POOL_MAX_CONN, **DB_PARAMS)
+                logger.info("Database connection pool created")
+    return _pool
+
+@contextmanager
+def get_connection():
+    """
+    Borrow a pooled connection for the duration of the block.
+    Commits on success, rolls back on error and always returns the
+    connection to the pool. The first borrow applies pending migrations.
+    """
+    if not DB_ENABLED:
+        raise Error("Database is disabled (DB_ENABLED=0)")
+    if not _schema_ready:
+        ensure_schema()
+    with _borrow() as conn:
+        yield conn
+
+@contextmanager
+def _borrow():
+    with _pool_slots:
+        db_pool = get_pool()
+        conn = db_pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            db_pool.putconn(conn, close=bool(conn.closed))
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+# Schema Setup
+def init_schema():
+    """
+    Apply any pending migrations. Called through ensure_schema() on first use.
+    Returns True if the schema is up to date, False on failure.
+    """
+    try:
+        with _borrow() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );""")
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+            current = cur.fetchone()[0]
+            for version, (name, sql) in enumerate(MIGRATIONS, start=1):
+                if version <= current:
+                    continue
+                logger.info(f"Applying migration {version}: {name}")
+                cur.execute(sql)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        logger.info("Database schema is up to date")
+        return True
+    except Error as e:
+        logger.error(f"Database schema setup failed: {e}")
+        return False
+
+def ensure_schema():
+    """
+    Run init_schema() once per process, on the first connection or from the
+    app's warmup hook, so importing a module never touches Postgres. A
+    database that isn't up yet is retried at most every SCHEMA_RETRY_SECONDS.
+    """
+    global _schema_ready, _schema_failed_at
+    if not DB_ENABLED:
+        return False
+    with _schema_lock:
+        if _schema_ready:
+            return True
+        if _schema_failed_at is not None and time.monotonic() - _schema_failed_at < SCHEMA_RETRY_SECONDS:
+            return False
+        _schema_ready = init_schema()
+        _schema_failed_at = None if _schema_ready else time.monotonic()
+        return _schema_ready
@@ -0,0 +1,56 @@
+# Production serving: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# A pre-fork server: the master imports the app and, with preload on, builds
+# the state every worker can share (schema, plagiarism indexes, pattern
+# libraries) before forking. Each worker then creates its own database pool,
+# Gemini client and background threads after the fork; modules reset any
+# inherited handles through os.register_at_fork hooks.
+import logging
+import multiprocessing
+import os
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_WORKERS", multiprocessing.cpu_count()))
+# Requests mostly wait on Gemini, so each worker also serves several at once on threads
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", 8))
+# Longer than an interactive LLM deadline plus benchmarking; /batch streams and may run longer
+timeout = int(os.environ.get("WEB_TIMEOUT", 300))
+graceful_timeout = 30
+# Build shared state once in the master; WEB_PRELOAD=0 loads the app separately in every worker
+preload_app = os.environ.get("WEB_PRELOAD", "1") != "0"
+accesslog = "-"
+
+# The Gemini rate limits are enforced per process, so split the account-wide
+# budget between the workers. This runs before the app (and llm_client) is imported.
+for _name, _default in (("LLM_REQUESTS_PER_MINUTE", 60), ("LLM_TOKENS_PER_MINUTE", 1000000)):
+    _total = int(os.environ.get(_name, _default))
+    os.environ[_name] = str(max(1, _total // workers)) if _total else "0"
+
+def when_ready(server):
+    """Master, before the first fork: do the shared part of the startup once."""
+    if server.cfg.preload_app:
+        import app
+        app.preload()
+        logger.info("Shared state preloaded; forking workers")
+
+def post_worker_init(worker):
+    """Worker, after fork and app load: create this process's clients and start its background loading."""
+    import app
+    app.warmup()
+
+def worker_exit(server, worker):
+    """Worker, on the way out: flush queued logs and stop this process's helper processes."""
+    import java_daemon
+    import jobs
+    import log_writer
+    import sandbox
+    log_writer.shutdown()
+    jobs.shutdown(wait=False)
+    sandbox.shutdown()
+    java_daemon.stop()
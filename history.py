@@ -0,0 +1,198 @@
+import blobs
+import db
+import metrics
+import base64
+import logging
+import os
+import re
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STATEMENT_TIMEOUT_MS = int(os.environ.get("HISTORY_STATEMENT_TIMEOUT_MS", 5000))  # a runaway filter can't hog Postgres
+
+# What each feature's history returns and filters on:
+#   table  - the log table
+#   code   - response field -> hash column, read back from code_blobs
+#   fields - response field -> column
+#   ranges - filter name -> numeric column, queried with min_<name>/max_<name>
+FEATURES = {
+    "fix-errors": {
+        "table": "code_analysis_logs",
+        "code": {"code": "original_hash", "result": "corrected_hash"},
+        "fields": {"report": "error_report", "error_count": "error_count"},
+        "ranges": {"errors": "error_count"},
+    },
+    "optimize": {
+        "table": "code_optimization_records",
+        "code": {"code": "original_hash", "result": "optimized_hash"},
+        "fields": {"report": "debug_info", "exec_time": "execution_time", "opt_level": "optimization_level"},
+        "ranges": {"exec_time": "execution_time"},
+    },
+    "check-plagiarism": {
+        "table": "code_plag",
+        "code": {"code": "original_hash", "result": "cleaned_hash"},
+        "fields": {"report": "analysis", "score": "plagiarism_score", "structure_hash": "structure_hash"},
+        "ranges": {"score": "plagiarism_score"},
+    },
+    "document": {
+        "table": "code_doc_logs",
+        "code": {"code": "original_hash"},
+        "fields": {"result": "documentation"},
+        "ranges": {},
+    },
+}
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+class QueryError(Exception):
+    pass
+
+# Cursors
+def encode_cursor(timestamp, row_id):
+    """Opaque token for the page after (timestamp, id)."""
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise QueryError(f"Invalid cursor: {e}")
+
+# Query Building
+def _number(params, name):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise QueryError(f"'{name}' must be a number")
+
+def _time(params, name):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise QueryError(f"'{name}' must be an ISO 8601 date or timestamp")
+
+def parameters(feature):
+    """The query-string names build_query reads for a feature, other than cursor."""
+    names = ["language", "hash", "code", "since", "until", "limit"]
+    return names + [f"{bound}_{name}" for name in FEATURES[feature]["ranges"] for bound in ("min", "max")]
+
+def build_query(feature, params):
+    """
+    SQL and arguments for one page of a feature's history, newest first.
+    params is a mapping of query-string values: language, hash (or code, to
+    hash it here), since/until, min_<range>/max_<range>, limit and cursor.
+    Every filter is served by an index from the "add history indexes"
+    migration, and paging continues from the cursor's (timestamp, id)
+    instead of using OFFSET, so deep pages cost the same as the first.
+    Rows without a timestamp are left out, since a cursor can't point at them.
+    """
+    config = FEATURES.get(feature)
+    if config is None:
+        raise QueryError(f"Unknown feature, expected one of: {', '.join(FEATURES)}")
+    table = config["table"]
+
+    try:
+        limit = int(params.get("limit") or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        raise QueryError("'limit' must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise QueryError(f"'limit' must be between 1 and {MAX_PAGE_SIZE}")
+
+    conditions = ["t.timestamp IS NOT NULL"]
+    args = []
+    if params.get("language"):
+        conditions.append("lower(t.language) = lower(%s)")
+        args.append(params["language"])
+
+    content_hash = params.get("hash") or (blobs.digest(params["code"]) if params.get("code") else None)
+    if content_hash:
+        content_hash = content_hash.lower()
+        if not HASH_PATTERN.match(content_hash):
+            raise QueryError("'hash' must be a hex SHA-256 digest")
+        conditions.append("t.original_hash = %s")
+        args.append(content_hash)
+
+    for name, operator in (("since", ">="), ("until", "<")):
+        value = _time(params, name)
+        if value is not None:
+            conditions.append(f"t.timestamp {operator} %s")
+            args.append(value)
+
+    for name, column in config["ranges"].items():
+        for bound, operator in (("min", ">="), ("max", "<=")):
+            value = _number(params, f"{bound}_{name}")
+            if value is not None:
+                conditions.append(f"t.{column} {operator} %s")
+                args.append(value)
+    unknown = [key for key in params if key.startswith(("min_", "max_")) and key[4:] not in config["ranges"]]
+    if unknown:
+        raise QueryError(f"Unsupported range filter {', '.join(unknown)} for {feature}")
+
+    if params.get("cursor"):
+        conditions.append("(t.timestamp, t.id) < (%s, %s)")
+        args.extend(decode_cursor(params["cursor"]))
+
+    columns = ["t.id", "t.timestamp", "t.language"]
+    columns += [f"t.{column}" for column in config["fields"].values()]
+    joins = []
+    text_columns = {hash_column: text_column for text_column, hash_column in db.BLOB_COLUMNS[table].items()}
+    for i, hash_column in enumerate(config["code"].values()):
+        text_column = text_columns[hash_column]
+        columns += [f"t.{hash_column}", f"t.{text_column}", f"b{i}.compression", f"b{i}.content"]
+        joins.append(f"LEFT JOIN code_blobs b{i} ON b{i}.hash = t.{hash_column}")
+
+    sql = (f"SELECT {', '.join(columns)} FROM {table} t {' '.join(joins)} WHERE {' AND '.join(conditions)} "
+           f"ORDER BY t.timestamp DESC, t.id DESC LIMIT %s")
+    # One extra row tells whether there is a next page without a COUNT(*)
+    args.append(limit + 1)
+    return sql, args, limit
+
+def _item(config, row):
+    row_id, timestamp, language = row[:3]
+    item = {"id": row_id, "timestamp": timestamp.isoformat() if timestamp else None, "language": language}
+    position = 3
+    for name in config["fields"]:
+        item[name] = row[position]
+        position += 1
+    for name in config["code"]:
+        content_hash, inline_text, compression, content = row[position:position + 4]
+        item[name] = blobs.column(inline_text, compression, content)
+        item[f"{name}_hash"] = content_hash
+        position += 4
+    return item
+
+def search(feature, params):
+    """
+    One page of a feature's past reviews, newest first.
+    Returns {"feature", "items", "next_cursor"}; next_cursor is None on the
+    last page. Raises QueryError for bad parameters and psycopg2.Error if
+    the database is unavailable.
+    """
+    sql, args, limit = build_query(feature, params)
+    config = FEATURES[feature]
+    with metrics.timer("history_query", feature=feature):
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SET LOCAL statement_timeout = %s", (STATEMENT_TIMEOUT_MS,))
+            cur.execute(sql, args)
+            rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    return {"feature": feature, "items": [_item(config, row) for row in rows], "next_cursor": next_cursor}
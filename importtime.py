@@ -0,0 +1,94 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEFAULT_MODULES = ["app"]
+TOP_N = 15
+RUNS = 3  # the fastest of several cold interpreters is the least noisy
+
+def _parse(stderr):
+    """Turn `-X importtime` lines into dicts with name, depth, self_us and cumulative_us."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append({
+            "name": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return modules
+
+def _measure_once(modules):
+    statement = "; ".join(f"import {module}" for module in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        return None, "\n".join(errors[-5:])
+    return _parse(proc.stderr), None
+
+def measure(modules=DEFAULT_MODULES, runs=RUNS):
+    """
+    Import the modules in fresh interpreters and break down where the time goes.
+    Returns a dict with total_ms, the entries imported directly by the requested
+    modules ("top_level") and the most expensive modules by self time, or an
+    "error" key if the import fails.
+    """
+    best = None
+    for _ in range(runs):
+        entries, error = _measure_once(modules)
+        if error is not None:
+            return {"modules": modules, "error": error}
+        total = sum(entry["cumulative_us"] for entry in entries if entry["depth"] == 0)
+        if best is None or total < best[0]:
+            best = (total, entries)
+    total, entries = best
+    return {
+        "modules": modules,
+        "total_ms": total / 1000,
+        "top_level": sorted(({"name": e["name"], "cumulative_ms": e["cumulative_us"] / 1000}
+                             for e in entries if e["depth"] <= 1),
+                            key=lambda e: -e["cumulative_ms"]),
+        "by_self_time": sorted(({"name": e["name"], "self_ms": e["self_us"] / 1000}
+                                for e in entries),
+                               key=lambda e: -e["self_ms"]),
+    }
+
+def report(result, top=TOP_N):
+    if "error" in result:
+        return f"Importing {', '.join(result['modules'])} failed:\n{result['error']}"
+    lines = [f"Import time for {', '.join(result['modules'])}: {result['total_ms']:.1f} ms", "",
+             "Cumulative (direct imports):"]
+    lines += [f"  {e['cumulative_ms']:9.1f} ms  {e['name']}" for e in result["top_level"][:top]]
+    lines += ["", "Self time:"]
+    lines += [f"  {e['self_ms']:9.1f} ms  {e['name']}" for e in result["by_self_time"][:top]]
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Break down the import time of the app's modules.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=TOP_N)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--json", help="also write the breakdown to this file")
+    args = parser.parse_args()
+
+    result = measure(args.modules, args.runs)
+    print(report(result, args.top))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    return 1 if "error" in result else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import llm_cache
+import llm_client
+import code_analysis
+import metrics
+import ast
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+ENABLED = os.environ.get("INCREMENTAL_REVIEW", "1") != "0"
+MIN_LINES = 40            # smaller files are reviewed in one call; the LLM cache covers exact resubmits
+MIN_UNITS = 2             # a file needs at least this many functions/methods to be split
+MAX_UNIT_LINES = 40       # documentation groups small neighbouring units up to this size
+MAX_PARALLEL_UNITS = 4    # concurrent LLM calls per file for the units that changed
+UNIT_FORMAT_VERSION = 1   # bump when a per-unit prompt or result shape changes
+
+# Splitting
+def _python_spans(tree):
+    """Top-level functions, and the methods of top-level classes so one big class still splits."""
+    spans = []
+    for node in tree.body:
+        children = [node]
+        if isinstance(node, ast.ClassDef):
+            methods = [c for c in node.body if isinstance(c, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            children = methods or children
+        for child in children:
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start = min([child.lineno] + [d.lineno for d in child.decorator_list])
+                name = f"{node.name}.{child.name}" if child is not node else child.name
+                spans.append({"name": name, "start": start, "end": child.end_lineno})
+    return spans
+
+def split_units(code, language):
+    """
+    Cut a submission into contiguous units that together reproduce it exactly:
+    one per function or method, plus the code between them (imports, class
+    headers, globals, entry point). Units are dicts with label, start, end, code
+    and review (False for blank gaps, which are kept verbatim).
+    Returns None when the file is too small or doesn't parse into enough units.
+    """
+    if not ENABLED or code.count('\n') + 1 < MIN_LINES:
+        return None
+    facts = code_analysis.analyze(code, language)
+    if facts.get('syntax_error') or facts.get('unsupported'):
+        return None
+    spans = _python_spans(facts['tree']) if facts['language'] == "Python" else facts['spans']
+
+    top_level = []
+    for span in sorted(spans, key=lambda sp: sp['start']):
+        if not top_level or span['start'] > top_level[-1]['end']:  # nested spans stay with their parent
+            top_level.append(span)
+    if len(top_level) < MIN_UNITS:
+        return None
+
+    lines = code.split('\n')
+    units = []
+
+    def add(label, start, end):
+        if start > end:
+            return
+        text = '\n'.join(lines[start - 1:end])
+        review = bool(text.strip())
+        units.append({"label": label if review else None, "start": start, "end": end, "code": text, "review": review})
+
+    position = 1
+    for span in top_level:
+        add(f"the code at lines {position}-{span['start'] - 1}", position, span['start'] - 1)
+        add(span['name'], span['start'], span['end'])
+        position = span['end'] + 1
+    add(f"the code at lines {position}-{len(lines)}", position, len(lines))
+    return units
+
+def group_units(units, max_lines=MAX_UNIT_LINES):
+    """Merge consecutive small units up to max_lines each, so documentation isn't split per one-liner."""
+    groups = []
+    for unit in units:
+        if not unit['review']:
+            continue
+        size = unit['end'] - unit['start'] + 1
+        last = groups[-1] if groups else None
+        if last and last['end'] - last['start'] + 1 + size <= max_lines:
+            last['label'] = f"{last['label']}, {unit['label']}"
+            last['code'] = f"{last['code']}\n{unit['code']}"
+            last['end'] = unit['end']
+        else:
+            groups.append(dict(unit))
+    return groups
+
+def restore_layout(original, revised):
+    """
+    Fit the model's version of a unit back into the file: the model's answer is
+    stripped, so restore the unit's leading/trailing blank lines and its indentation
+    (methods come back flush-left).
+    """
+    def indent_of(line):
+        return len(line) - len(line.lstrip())
+
+    original_lines = original.split('\n')
+    code_lines = [line for line in original_lines if line.strip()]
+    revised_lines = revised.strip('\n').split('\n')
+    if not code_lines or not revised.strip():
+        return revised
+    revised_lines[0] = code_lines[0][:indent_of(code_lines[0])] + revised_lines[0].lstrip()
+    original_rest = [indent_of(line) for line in code_lines[1:]]
+    revised_rest = [indent_of(line) for line in revised_lines[1:] if line.strip()]
+    if original_rest and revised_rest:
+        shift = min(original_rest) - min(revised_rest)
+        for i, line in enumerate(revised_lines[1:], start=1):
+            if line.strip():
+                revised_lines[i] = " " * shift + line if shift > 0 else line[-shift:]
+
+    leading = len(original_lines) - len(original.lstrip('\n').split('\n'))
+    trailing = len(original_lines) - len(original.rstrip('\n').split('\n'))
+    return '\n'.join([''] * leading + revised_lines + [''] * trailing)
+
+def locate_line(message):
+    """First line number mentioned in a compiler/runtime message, or None."""
+    match = re.search(r"(?:line |:)(\d+)(?::|\b)", message or "")
+    return int(match.group(1)) if match else None
+
+# Per-unit results
+def unit_key(feature, language, code, context=""):
+    """
+    Content address of one unit's result. Trailing whitespace and blank lines
+    are ignored, so re-indenting blank lines or spacing doesn't force a new call.
+    """
+    normalized = '\n'.join(line.rstrip() for line in code.split('\n') if line.strip())
+    return llm_cache.make_key(f"{feature}-unit", f"{llm_client.MODEL_NAME}/v{UNIT_FORMAT_VERSION}", language,
+                              f"{normalized}\0{context}")
+
+def review(feature, language, units, review_unit, context=None, max_parallel=MAX_PARALLEL_UNITS):
+    """
+    Reuse stored results for unchanged units and run review_unit(unit) for the rest,
+    at most max_parallel at once. review_unit returns (result, reusable);
+    only reusable results (JSON-serializable) are stored. context(unit) adds
+    unit-specific prompt inputs to the key.
+    Returns (results aligned with units, summary); units with review=False get None.
+    """
+    results = [None] * len(units)
+    keys = {}
+    pending = []
+    for index, unit in enumerate(units):
+        if not unit.get('review', True):
+            continue
+        keys[index] = unit_key(feature, language, unit['code'], context(unit) if context else "")
+        stored = llm_cache.get(keys[index])
+        if stored is not None:
+            results[index] = {"result": json.loads(stored), "reused": True}
+        else:
+            pending.append(index)
+
+    if pending:
+        # Worker threads don't inherit the caller's LLM lane or timing breakdown, so set them explicitly
+        priority = llm_client.current_lane()
+        breakdown = metrics.current_breakdown()
+
+        def run(index):
+            with llm_client.lane(priority), metrics.attach(breakdown):
+                return review_unit(units[index])
+
+        with ThreadPoolExecutor(max_workers=min(max_parallel, len(pending)), thread_name_prefix="unit-review") as executor:
+            outcomes = list(executor.map(run, pending))
+        for index, (result, reusable) in zip(pending, outcomes):
+            results[index] = {"result": result, "reused": False}
+            if reusable:
+                llm_cache.put(keys[index], f"{feature}-unit", json.dumps(result))
+
+    summary = {"units": len(keys), "reused": len(keys) - len(pending), "reviewed": len(pending)}
+    logger.info(f"Incremental {feature}: {summary['reviewed']} of {summary['units']} units sent to the model")
+    return results, summary
@@ -0,0 +1,384 @@
+import javax.tools.Diagnostic;
+import javax.tools.DiagnosticCollector;
+import javax.tools.FileObject;
+import javax.tools.ForwardingJavaFileManager;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileManager;
+import javax.tools.JavaFileObject;
+import javax.tools.SimpleJavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.BufferedReader;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.io.PrintWriter;
+import java.io.StringWriter;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.InetAddress;
+import java.net.ServerSocket;
+import java.net.Socket;
+import java.net.URI;
+import java.nio.charset.StandardCharsets;
+import java.security.MessageDigest;
+import java.util.Collections;
+import java.util.HashMap;
+import java.util.Locale;
+import java.util.Map;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.atomic.AtomicInteger;
+
+/**
+ * Long-running compile-and-run server used by java_daemon.py.
+ *
+ * Listens on a loopback port (0 = pick one) and prints "READY <port>" once it
+ * accepts connections. The first line of stdin is a secret token chosen by
+ * the client that started us: any local user can reach the port, so every
+ * connection must open with that token (an int byte length and the bytes) or
+ * it is closed unanswered. Then it carries one request and one response,
+ * both encoded as: int count, then count pairs of (key, value) strings, each
+ * string being an int byte length followed by UTF-8 bytes.
+ *
+ * Request keys: class, source, run ("1" to invoke main), timeout_millis, and
+ * for benchmarking bench ("1"), warmup and trials: main is invoked warmup +
+ * trials times in the same JVM so the timed trials run JIT-compiled code.
+ * Response keys: status, diagnostics, stdout, stderr, timed_out,
+ * elapsed_nanos, samples_nanos (comma separated), runaway_threads.
+ */
+public class CompileServer {
+    private static final int OUTPUT_LIMIT = 64 * 1024;
+    private static final JavaCompiler COMPILER = ToolProvider.getSystemJavaCompiler();
+    private static final ThreadRoutedStream OUT = new ThreadRoutedStream(System.out);
+    private static final ThreadRoutedStream ERR = new ThreadRoutedStream(System.err);
+    // Submissions that ignored interruption after a timeout; the client restarts us when this is non-zero
+    private static final AtomicInteger RUNAWAY = new AtomicInteger();
+    private static byte[] token;
+
+    public static void main(String[] args) throws IOException {
+        if (COMPILER == null) {
+            System.err.println("CompileServer needs a JDK: no system Java compiler found");
+            System.exit(2);
+        }
+        String line = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8)).readLine();
+        if (line == null || line.trim().isEmpty()) {
+            System.err.println("CompileServer needs its access token as the first line of stdin");
+            System.exit(2);
+        }
+        token = line.trim().getBytes(StandardCharsets.UTF_8);
+        int port = args.length > 0 ? Integer.parseInt(args[0]) : 0;
+        ServerSocket server = new ServerSocket(port, 50, InetAddress.getLoopbackAddress());
+
+        PrintStream console = System.out;
+        System.setIn(new ByteArrayInputStream(new byte[0]));
+        System.setOut(new PrintStream(OUT, true));
+        System.setErr(new PrintStream(ERR, true));
+        console.println("READY " + server.getLocalPort());
+        console.flush();
+
+        ExecutorService pool = Executors.newFixedThreadPool(Runtime.getRuntime().availableProcessors());
+        while (true) {
+            Socket socket = server.accept();
+            pool.execute(() -> serve(socket));
+        }
+    }
+
+    private static void serve(Socket socket) {
+        try (Socket s = socket;
+             DataInputStream in = new DataInputStream(new BufferedInputStream(s.getInputStream()));
+             DataOutputStream out = new DataOutputStream(new BufferedOutputStream(s.getOutputStream()))) {
+            if (!authenticated(in)) {
+                return;
+            }
+            Map<String, String> response;
+            try {
+                response = handle(readMap(in));
+            } catch (Throwable t) {
+                response = new HashMap<>();
+                response.put("status", "error");
+                response.put("message", t.toString());
+            }
+            writeMap(out, response);
+            out.flush();
+        } catch (IOException e) {
+            // Client went away; nothing to report to
+        }
+    }
+
+    static Map<String, String> handle(Map<String, String> request) throws InterruptedException {
+        String className = request.get("class");
+        Map<String, byte[]> classes = new HashMap<>();
+        String diagnostics = compile(className, request.get("source"), classes);
+
+        Map<String, String> response = new HashMap<>();
+        response.put("diagnostics", diagnostics);
+        boolean bench = "1".equals(request.get("bench"));
+        if ((bench || "1".equals(request.get("run"))) && diagnostics.isEmpty() && !classes.isEmpty()) {
+            long timeoutMillis = Long.parseLong(request.getOrDefault("timeout_millis", "5000"));
+            int warmup = bench ? Integer.parseInt(request.getOrDefault("warmup", "5")) : 0;
+            int trials = bench ? Integer.parseInt(request.getOrDefault("trials", "20")) : 1;
+            run(className, classes, warmup, trials, timeoutMillis, response);
+        }
+        response.put("status", "ok");
+        response.put("runaway_threads", String.valueOf(RUNAWAY.get()));
+        return response;
+    }
+
+    // Compilation
+
+    static String compile(String className, String source, Map<String, byte[]> classes) {
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+        StandardJavaFileManager standard = COMPILER.getStandardFileManager(diagnostics, Locale.ROOT, StandardCharsets.UTF_8);
+        JavaFileManager fileManager = new ForwardingJavaFileManager<JavaFileManager>(standard) {
+            @Override
+            public JavaFileObject getJavaFileForOutput(Location location, String name, JavaFileObject.Kind kind, FileObject sibling) {
+                return new SimpleJavaFileObject(URI.create("mem:///" + name.replace('.', '/') + kind.extension), kind) {
+                    @Override
+                    public OutputStream openOutputStream() {
+                        return new ByteArrayOutputStream() {
+                            @Override
+                            public void close() throws IOException {
+                                super.close();
+                                classes.put(name, toByteArray());
+                            }
+                        };
+                    }
+                };
+            }
+        };
+        JavaFileObject unit = new SimpleJavaFileObject(URI.create("string:///" + className + JavaFileObject.Kind.SOURCE.extension), JavaFileObject.Kind.SOURCE) {
+            @Override
+            public CharSequence getCharContent(boolean ignoreEncodingErrors) {
+                return source;
+            }
+        };
+
+        boolean ok;
+        try {
+            ok = COMPILER.getTask(null, fileManager, diagnostics, null, null, Collections.singletonList(unit)).call();
+        } finally {
+            try {
+                fileManager.close();
+            } catch (IOException e) {
+                // In-memory outputs only; nothing to release
+            }
+        }
+
+        // Same shape as javac's own stderr so callers can't tell the two apart
+        StringBuilder report = new StringBuilder();
+        for (Diagnostic<? extends JavaFileObject> d : diagnostics.getDiagnostics()) {
+            if (d.getKind() == Diagnostic.Kind.NOTE) {
+                report.append("Note: ").append(d.getMessage(Locale.ROOT)).append('\n');
+                continue;
+            }
+            report.append(className).append(".java:").append(d.getLineNumber()).append(": ")
+                  .append(d.getKind() == Diagnostic.Kind.ERROR ? "error" : "warning").append(": ")
+                  .append(d.getMessage(Locale.ROOT)).append('\n');
+        }
+        if (!ok) {
+            classes.clear();
+        }
+        return report.toString();
+    }
+
+    // Execution
+
+    static void run(String className, Map<String, byte[]> classes, int warmup, int trials, long timeoutMillis,
+                    Map<String, String> response) throws InterruptedException {
+        ClassLoader loader = new MemoryClassLoader(classes);
+        CappedBuffer stdout = new CappedBuffer(OUTPUT_LIMIT);
+        CappedBuffer stderr = new CappedBuffer(OUTPUT_LIMIT);
+        long[] samples = new long[trials];
+        AtomicInteger completed = new AtomicInteger();
+
+        Thread runner = new Thread(() -> {
+            OUT.capture(stdout);
+            ERR.capture(stderr);
+            try {
+                Method main = Class.forName(className, true, loader).getMethod("main", String[].class);
+                for (int i = 0; i < warmup + trials; i++) {
+                    long start = System.nanoTime();
+                    main.invoke(null, (Object) new String[0]);
+                    long elapsed = System.nanoTime() - start;
+                    if (i >= warmup) {
+                        samples[i - warmup] = elapsed;
+                        completed.incrementAndGet();
+                    }
+                }
+            } catch (InvocationTargetException e) {
+                stderr.writeText("Exception in thread \"main\" " + stackTrace(e.getCause()));
+            } catch (NoSuchMethodException e) {
+                stderr.writeText("Error: Main method not found in class " + className + "\n");
+            } catch (Throwable t) {
+                stderr.writeText(stackTrace(t));
+            } finally {
+                System.out.flush();
+                System.err.flush();
+                OUT.release();
+                ERR.release();
+            }
+        }, "submission-main");
+        runner.setDaemon(true);
+        runner.setContextClassLoader(loader);
+
+        long start = System.nanoTime();
+        runner.start();
+        runner.join(timeoutMillis);
+        response.put("elapsed_nanos", String.valueOf(System.nanoTime() - start));
+        if (runner.isAlive()) {
+            runner.interrupt();
+            RUNAWAY.incrementAndGet();
+            response.put("timed_out", "1");
+        } else {
+            response.put("timed_out", "0");
+        }
+        response.put("stdout", stdout.text());
+        response.put("stderr", stderr.text());
+        StringBuilder timings = new StringBuilder();
+        for (int i = 0; i < completed.get(); i++) {
+            timings.append(i == 0 ? "" : ",").append(samples[i]);
+        }
+        response.put("samples_nanos", timings.toString());
+    }
+
+    private static String stackTrace(Throwable t) {
+        StringWriter writer = new StringWriter();
+        t.printStackTrace(new PrintWriter(writer));
+        return writer.toString();
+    }
+
+    /** Loads only the submission's classes; the server's own classes are not visible to it. */
+    static final class MemoryClassLoader extends ClassLoader {
+        private final Map<String, byte[]> classes;
+
+        MemoryClassLoader(Map<String, byte[]> classes) {
+            super(ClassLoader.getSystemClassLoader().getParent());
+            this.classes = classes;
+        }
+
+        @Override
+        protected Class<?> findClass(String name) throws ClassNotFoundException {
+            byte[] bytes = classes.get(name);
+            if (bytes == null) {
+                throw new ClassNotFoundException(name);
+            }
+            return defineClass(name, bytes, 0, bytes.length);
+        }
+    }
+
+    /** Sends System.out/err writes to the buffer of whichever submission thread (or its children) wrote them. */
+    static final class ThreadRoutedStream extends OutputStream {
+        private final OutputStream fallback;
+        private final InheritableThreadLocal<OutputStream> target = new InheritableThreadLocal<>();
+
+        ThreadRoutedStream(OutputStream fallback) {
+            this.fallback = fallback;
+        }
+
+        void capture(OutputStream buffer) {
+            target.set(buffer);
+        }
+
+        void release() {
+            target.remove();
+        }
+
+        private OutputStream current() {
+            OutputStream buffer = target.get();
+            return buffer != null ? buffer : fallback;
+        }
+
+        @Override
+        public void write(int b) throws IOException {
+            current().write(b);
+        }
+
+        @Override
+        public void write(byte[] b, int off, int len) throws IOException {
+            current().write(b, off, len);
+        }
+
+        @Override
+        public void flush() throws IOException {
+            current().flush();
+        }
+    }
+
+    static final class CappedBuffer extends ByteArrayOutputStream {
+        private final int limit;
+
+        CappedBuffer(int limit) {
+            this.limit = limit;
+        }
+
+        @Override
+        public synchronized void write(int b) {
+            if (count < limit) {
+                super.write(b);
+            }
+        }
+
+        @Override
+        public synchronized void write(byte[] b, int off, int len) {
+            super.write(b, off, Math.max(0, Math.min(len, limit - count)));
+        }
+
+        void writeText(String text) {
+            byte[] bytes = text.getBytes(StandardCharsets.UTF_8);
+            write(bytes, 0, bytes.length);
+        }
+
+        synchronized String text() {
+            return new String(buf, 0, count, StandardCharsets.UTF_8);
+        }
+    }
+
+    // Wire format
+
+    /** Reads the connection's token frame; the length is checked first so a stranger can't make us allocate. */
+    private static boolean authenticated(DataInputStream in) throws IOException {
+        if (in.readInt() != token.length) {
+            return false;
+        }
+        byte[] presented = new byte[token.length];
+        in.readFully(presented);
+        return MessageDigest.isEqual(presented, token);
+    }
+
+    private static String readString(DataInputStream in) throws IOException {
+        byte[] bytes = new byte[in.readInt()];
+        in.readFully(bytes);
+        return new String(bytes, StandardCharsets.UTF_8);
+    }
+
+    private static void writeString(DataOutputStream out, String value) throws IOException {
+        byte[] bytes = value.getBytes(StandardCharsets.UTF_8);
+        out.writeInt(bytes.length);
+        out.write(bytes);
+    }
+
+    static Map<String, String> readMap(DataInputStream in) throws IOException {
+        int count = in.readInt();
+        Map<String, String> map = new HashMap<>();
+        for (int i = 0; i < count; i++) {
+            map.put(readString(in), readString(in));
+        }
+        return map;
+    }
+
+    static void writeMap(DataOutputStream out, Map<String, String> map) throws IOException {
+        out.writeInt(map.size());
+        for (Map.Entry<String, String> entry : map.entrySet()) {
+            writeString(out, entry.getKey());
+            writeString(out, entry.getValue() == null ? "" : entry.getValue());
+        }
+    }
+}
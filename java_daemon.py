@@ -0,0 +1,209 @@
+import build_cache
+import metrics
+import hashlib
+import logging
+import os
+import secrets
+import shutil
+import socket
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+DAEMON_ENABLED = os.environ.get("JAVA_DAEMON", "1") != "0"
+SERVER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "java", "CompileServer.java")
+_USER = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+CLASSES_BASE_DIR = os.path.join(tempfile.gettempdir(), f"codeguide-java-daemon-{_USER}")
+JVM_OPTIONS = ["-Xmx512m", "-XX:+UseSerialGC"]
+STARTUP_TIMEOUT = 20        # seconds to wait for "READY <port>"
+RESPONSE_MARGIN = 10        # socket timeout on top of the run timeout
+RETRY_AFTER_SECONDS = 60    # after a failed start, use the subprocess path for this long
+
+# Calls that would take the whole daemon down with them; such submissions
+# always use the one-shot subprocess path.
+UNSAFE_IN_DAEMON = ("System.exit", "Runtime.getRuntime", "System.setOut", "System.setErr", "System.setIn")
+
+class DaemonUnavailable(Exception):
+    pass
+
+_lock = threading.Lock()
+_process = None
+_port = None
+_token = None  # every connection must present this; the loopback port is open to all local users
+_failed_at = 0.0
+
+def _reinit_after_fork():
+    """
+    Runs in a forked child (e.g. a gunicorn worker): the daemon belongs to the
+    parent, which stops it. This process starts its own on first use.
+    """
+    global _lock, _process, _port, _token
+    _lock = threading.Lock()
+    _process, _port, _token = None, None, None
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+# Wire format (see CompileServer.java)
+def _encode(fields):
+    parts = [struct.pack(">i", len(fields))]
+    for key, value in fields.items():
+        for text in (key, str(value)):
+            data = text.encode("utf-8")
+            parts.append(struct.pack(">i", len(data)))
+            parts.append(data)
+    return b"".join(parts)
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise ConnectionError("daemon closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def _decode(sock):
+    (count,) = struct.unpack(">i", _recv_exact(sock, 4))
+    fields = {}
+    for _ in range(count):
+        key, value = [_recv_exact(sock, struct.unpack(">i", _recv_exact(sock, 4))[0]).decode("utf-8") for _ in range(2)]
+        fields[key] = value
+    return fields
+
+# Lifecycle
+def _server_classes_dir():
+    """
+    Compile CompileServer.java once per source version. The classes are kept
+    in a per-user directory that only this user can write to, since the JVM
+    loads whatever CompileServer.class it finds there.
+    """
+    with open(SERVER_SOURCE, "rb") as f:
+        version = hashlib.sha256(f.read()).hexdigest()[:16]
+    try:
+        base = build_cache.private_dir(CLASSES_BASE_DIR)
+    except OSError as e:
+        raise DaemonUnavailable(f"Unsafe daemon class directory: {e}")
+    classes_dir = os.path.join(base, version)
+    if not os.path.exists(os.path.join(classes_dir, "CompileServer.class")):
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=base)
+        result = subprocess.run(["javac", "-d", staging, SERVER_SOURCE], capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise DaemonUnavailable(f"Could not compile CompileServer: {result.stderr.strip()}")
+        try:
+            os.rename(staging, classes_dir)
+        except OSError:  # another process got there first
+            shutil.rmtree(staging, ignore_errors=True)
+    return classes_dir
+
+def _drain(stream):
+    for _ in iter(stream.readline, b""):
+        pass
+
+def _start():
+    global _process, _port, _token
+    if not shutil.which("java") or not shutil.which("javac"):
+        raise DaemonUnavailable("java/javac not found on PATH")
+    classes_dir = _server_classes_dir()
+    process = subprocess.Popen(["java", *JVM_OPTIONS, "-cp", classes_dir, "CompileServer", "0"],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    # Handed over on stdin, not the command line, so other users can't read it from ps
+    token = secrets.token_hex(32)
+    process.stdin.write(f"{token}\n".encode("ascii"))
+    process.stdin.close()
+    box = {}
+    reader = threading.Thread(target=lambda: box.update(line=process.stdout.readline()), daemon=True)
+    reader.start()
+    reader.join(STARTUP_TIMEOUT)
+    line = box.get("line", b"").decode("utf-8", "replace").strip()
+    if not line.startswith("READY "):
+        process.kill()
+        raise DaemonUnavailable(f"Daemon did not start: {line or 'no output'}")
+    # Keep the pipe drained so stray daemon output can never block it
+    threading.Thread(target=_drain, args=(process.stdout,), daemon=True).start()
+    _process, _port, _token = process, int(line.split()[1]), token
+    logger.info(f"Java compile daemon listening on port {_port}")
+
+def _ensure_running():
+    global _failed_at
+    with _lock:
+        if _process is not None and _process.poll() is None:
+            return _port, _token
+        if not DAEMON_ENABLED:
+            raise DaemonUnavailable("Java daemon disabled")
+        if time.monotonic() - _failed_at < RETRY_AFTER_SECONDS:
+            raise DaemonUnavailable("Java daemon failed to start recently")
+        try:
+            _start()
+        except (DaemonUnavailable, OSError, subprocess.SubprocessError) as e:
+            _failed_at = time.monotonic()
+            raise DaemonUnavailable(str(e))
+        return _port, _token
+
+def stop():
+    global _process, _port, _token
+    with _lock:
+        if _process is not None:
+            _process.kill()
+            _process.wait()
+        _process, _port, _token = None, None, None
+
+def _request(fields, timeout):
+    if any(call in fields["source"] for call in UNSAFE_IN_DAEMON):
+        raise DaemonUnavailable("Submission uses calls that are not safe in a shared JVM")
+    port, token = _ensure_running()
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=timeout + RESPONSE_MARGIN) as sock:
+            secret = token.encode("ascii")
+            sock.sendall(struct.pack(">i", len(secret)) + secret + _encode(dict(fields, timeout_millis=int(timeout * 1000))))
+            response = _decode(sock)
+    except (OSError, ConnectionError, struct.error) as e:
+        stop()
+        raise DaemonUnavailable(f"Daemon request failed: {e}")
+
+    if response.get("status") != "ok":
+        raise DaemonUnavailable(f"Daemon error: {response.get('message')}")
+    if response.get("runaway_threads", "0") != "0":
+        # A timed-out submission is still spinning inside the JVM; start fresh next time
+        logger.warning("Restarting Java daemon after a runaway submission")
+        stop()
+    return response
+
+# Public API
+def compile_and_run(class_name, source, run=True, timeout=5):
+    """
+    Compile `source` in the daemon and optionally run its main() in an isolated classloader.
+    Returns a dict with diagnostics, stdout, stderr and timed_out.
+    Raises DaemonUnavailable when the caller should fall back to javac/java subprocesses.
+    """
+    with metrics.timer("compile"):
+        response = _request({"class": class_name, "source": source, "run": "1" if run else "0"}, timeout)
+    return {
+        "diagnostics": response.get("diagnostics", ""),
+        "stdout": response.get("stdout", ""),
+        "stderr": response.get("stderr", ""),
+        "timed_out": response.get("timed_out") == "1",
+    }
+
+def benchmark(class_name, source, warmup, trials, timeout):
+    """
+    Invoke main() warmup + trials times in one JVM and time the trials.
+    Returns a dict with diagnostics, stdout, stderr, timed_out and samples (seconds per trial).
+    """
+    response = _request({"class": class_name, "source": source, "bench": "1", "warmup": warmup, "trials": trials}, timeout)
+    samples = response.get("samples_nanos", "")
+    return {
+        "diagnostics": response.get("diagnostics", ""),
+        "stdout": response.get("stdout", ""),
+        "stderr": response.get("stderr", ""),
+        "timed_out": response.get("timed_out") == "1",
+        "samples": [int(n) / 1e9 for n in samples.split(",")] if samples else [],
+    }
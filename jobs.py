@@ -0,0 +1,172 @@
+from psycopg2 import Error
+import db
+import llm_client
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+MAX_PENDING_JOBS = int(os.environ.get("MAX_PENDING_JOBS", 100))  # queued + running
+RESULT_TTL_SECONDS = 3600  # finished jobs are forgotten after this long
+# Mirror job records to Postgres so any worker process can answer GET /jobs/<id>
+SHARED_STORE = db.DB_ENABLED and os.environ.get("JOBS_SHARED_STORE", "1") != "0"
+SHARED_PRUNE_SECONDS = 60  # how often expired records are deleted from the table
+
+class QueueFullError(Exception):
+    pass
+
+_executor = None
+_jobs = {}
+_lock = threading.Lock()
+_pruned_at = 0.0
+
+def _reinit_after_fork():
+    """
+    Runs in a forked child (e.g. a gunicorn worker): the parent's worker
+    threads didn't survive the fork, so start a new pool on first submit().
+    """
+    global _executor, _jobs, _lock
+    _executor = None
+    _jobs = {}
+    _lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job-worker")
+            logger.info(f"Job pool started with {JOB_WORKERS} workers")
+        return _executor
+
+# Shared Store
+def _store(job):
+    """Save a copy of the job record for the other worker processes. Failures only cost visibility."""
+    if not SHARED_STORE:
+        return
+    try:
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO job_records (job_id, record) VALUES (%s, %s)
+                ON CONFLICT (job_id) DO UPDATE SET record = EXCLUDED.record, updated_at = CURRENT_TIMESTAMP""",
+                (job["id"], json.dumps(job, default=str)))
+    except Error as e:
+        logger.warning(f"Could not share job {job['id']}: {e}")
+
+def _load(job_id):
+    if not SHARED_STORE:
+        return None
+    try:
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT record FROM job_records WHERE job_id = %s", (job_id,))
+            row = cur.fetchone()
+    except Error as e:
+        logger.warning(f"Could not look up job {job_id}: {e}")
+        return None
+    return json.loads(row[0]) if row else None
+
+def _prune_shared():
+    global _pruned_at
+    now = time.monotonic()
+    if not SHARED_STORE or now - _pruned_at < SHARED_PRUNE_SECONDS:
+        return
+    _pruned_at = now
+    try:
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM job_records WHERE updated_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'",
+                        (RESULT_TTL_SECONDS,))
+    except Error as e:
+        logger.warning(f"Could not prune shared job records: {e}")
+
+def _expire_finished():
+    cutoff = time.time() - RESULT_TTL_SECONDS
+    with _lock:
+        for job_id in [j for j, job in _jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            del _jobs[job_id]
+    _prune_shared()
+
+def _run(job_id, func, args):
+    with _lock:
+        job = _jobs[job_id]
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        snapshot = dict(job)
+    _store(snapshot)
+    try:
+        # Background work yields to interactive requests for LLM capacity
+        with llm_client.lane(llm_client.BATCH):
+            result = func(*args)
+        status, error = "done", None
+    except Exception as e:
+        logger.error(f"Job {job_id} ({job['feature']}) failed: {e}\n{traceback.format_exc()}")
+        result, status, error = None, "failed", str(e)
+    with _lock:
+        job.update(status=status, result=result, error=error, finished_at=time.time())
+        snapshot = dict(job)
+    _store(snapshot)
+
+def submit(feature, func, *args):
+    """
+    Run func(*args) on the worker pool and return a job id immediately.
+    Raises QueueFullError when MAX_PENDING_JOBS are already queued or running.
+    """
+    _expire_finished()
+    with _lock:
+        pending = sum(1 for job in _jobs.values() if job["status"] in ("queued", "running"))
+        if pending >= MAX_PENDING_JOBS:
+            raise QueueFullError(f"{pending} jobs already pending")
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {
+            "id": job_id,
+            "feature": feature,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        snapshot = dict(_jobs[job_id])
+    _store(snapshot)
+    _get_executor().submit(_run, job_id, func, args)
+    return job_id
+
+def get(job_id):
+    """
+    Return a copy of the job record, or None if unknown or expired. Jobs
+    submitted to another worker process are read from the shared store.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            return dict(job)
+    return _load(job_id)
+
+def stats():
+    with _lock:
+        counts = {}
+        for job in _jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+    counts["workers"] = JOB_WORKERS
+    return counts
+
+def shutdown(wait=True):
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
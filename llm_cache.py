@@ -0,0 +1,143 @@
+from psycopg2 import Error
+import db
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+MEMORY_MAX_ENTRIES = 1000       # in-process LRU tier
+PERSISTENT_MAX_ENTRIES = 50000  # rows kept in llm_response_cache
+TTL_SECONDS = 7 * 24 * 3600     # responses older than this are treated as misses
+PRUNE_EVERY = 100               # persistent size check every N stores
+
+_memory = OrderedDict()  # key -> (stored_at, text)
+_lock = threading.Lock()
+_stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+def _reinit_after_fork():
+    # Forked workers start with the parent's memory tier and a fresh lock
+    global _lock
+    _lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def _count(key, amount=1):
+    with _lock:
+        _stats[key] += amount
+
+def make_key(feature, model_name, language, prompt):
+    """Content address for a response: SHA-256 over (feature, model, language, prompt)."""
+    digest = hashlib.sha256()
+    for part in (feature, model_name, language, prompt):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+# Memory Tier
+def _memory_get(key):
+    with _lock:
+        entry = _memory.get(key)
+        if entry is None:
+            return None
+        stored_at, text = entry
+        if time.time() - stored_at > TTL_SECONDS:
+            del _memory[key]
+            return None
+        _memory.move_to_end(key)
+        return text
+
+def _memory_put(key, text, stored_at=None):
+    with _lock:
+        _memory[key] = (stored_at or time.time(), text)
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_MAX_ENTRIES:
+            _memory.popitem(last=False)
+            _stats["evictions"] += 1
+
+# Persistent Tier
+def _persistent_get(key):
+    if not db.DB_ENABLED:
+        return None
+    try:
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT response, EXTRACT(EPOCH FROM created_at)
+                FROM llm_response_cache
+                WHERE cache_key = %s AND created_at > NOW() - %s * INTERVAL '1 second'
+                """, (key, TTL_SECONDS))
+            row = cur.fetchone()
+        return (row[0], float(row[1])) if row else None
+    except Error as e:
+        logger.warning(f"LLM cache lookup failed: {e}")
+        _count("errors")
+        return None
+
+def _persistent_put(key, feature, text):
+    if not db.DB_ENABLED:
+        return
+    try:
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO llm_response_cache (cache_key, feature, response)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (cache_key) DO UPDATE
+                SET response = EXCLUDED.response, created_at = CURRENT_TIMESTAMP
+                """, (key, feature, text))
+            if _stats["stores"] % PRUNE_EVERY == 0:
+                _prune(cur)
+    except Error as e:
+        logger.warning(f"LLM cache store failed: {e}")
+        _count("errors")
+
+def _prune(cur):
+    cur.execute("DELETE FROM llm_response_cache WHERE created_at <= NOW() - %s * INTERVAL '1 second'", (TTL_SECONDS,))
+    expired = cur.rowcount
+    cur.execute("""
+        DELETE FROM llm_response_cache
+        WHERE cache_key IN (
+            SELECT cache_key FROM llm_response_cache
+            ORDER BY created_at DESC
+            OFFSET %s
+        )""", (PERSISTENT_MAX_ENTRIES,))
+    _count("evictions", expired + cur.rowcount)
+
+# Public API
+def get(key):
+    text = _memory_get(key)
+    if text is not None:
+        _count("memory_hits")
+        return text
+    row = _persistent_get(key)
+    if row is not None:
+        text, stored_at = row
+        _memory_put(key, text, stored_at)
+        _count("persistent_hits")
+        return text
+    _count("misses")
+    return None
+
+def put(key, feature, text):
+    _count("stores")
+    _memory_put(key, text)
+    _persistent_put(key, feature, text)
+
+def stats():
+    with _lock:
+        snapshot = dict(_stats)
+        snapshot["memory_entries"] = len(_memory)
+    lookups = snapshot["memory_hits"] + snapshot["persistent_hits"] + snapshot["misses"]
+    snapshot["hit_rate"] = (snapshot["memory_hits"] + snapshot["persistent_hits"]) / lookups if lookups else 0.0
+    return snapshot
+
+def clear_memory():
+    with _lock:
+        _memory.clear()
@@ -0,0 +1,260 @@
+import llm_cache
+import metrics
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")  # unset: LLM features report an error instead of calling out
+MODEL_NAME = "gemini-1.5-pro"
+MAX_CONCURRENT_CALLS = int(os.environ.get("LLM_MAX_CONCURRENCY", 4))
+REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 60))       # 0 = unlimited
+TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 1000000))      # 0 = unlimited
+EXPECTED_OUTPUT_TOKENS = 1024   # reserved per call on top of the prompt; corrected from usage metadata
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+# Priority lanes: interactive calls are always admitted before queued batch calls
+INTERACTIVE = 0
+BATCH = 1
+DEADLINE_SECONDS = {INTERACTIVE: 90, BATCH: 600}
+
+# Errors worth retrying: quota (429), overload (503) and transient server/network failures
+RETRYABLE_ERRORS = ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                    "DeadlineExceeded", "GatewayTimeout", "ConnectionError", "TimeoutError")
+
+class LLMDeadlineExceeded(TimeoutError):
+    pass
+
+
+class _TokenBucket:
+    """Refills at rate_per_minute; a full bucket allows a burst of one minute's budget."""
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)  # an oversized call waits for a full bucket, not forever
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        if self.rate:
+            self._refill(now)
+            self.level -= amount  # may go negative after a correction; later calls wait it off
+
+_cond = threading.Condition()
+_waiting = []  # heap of (lane, sequence) tickets
+_sequence = itertools.count()
+_in_flight = 0
+_request_bucket = _TokenBucket(REQUESTS_PER_MINUTE)
+_token_bucket = _TokenBucket(TOKENS_PER_MINUTE)
+_context = threading.local()
+_model = None
+_model_lock = threading.Lock()
+_model_replaced = False
+_stats = {"calls": 0, "cache_hits": 0, "retries": 0, "failures": 0, "deadline_exceeded": 0,
+          "throttled_seconds": 0.0, "tokens": 0}
+
+# Initialize Gemini
+def get_model():
+    """
+    The shared Gemini model, configured on first use so that importing this
+    module stays cheap. Returns None if GEMINI_API_KEY is unset or
+    initialization fails; the next call retries.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if not GEMINI_API_KEY:
+                    logger.error("GEMINI_API_KEY is not set; LLM features are disabled")
+                    return None
+                try:
+                    import google.generativeai as genai
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    _model = genai.GenerativeModel(MODEL_NAME)
+                    logger.info("Gemini initialized successfully")
+                except Exception as e:
+                    logger.error(f"Gemini initialization failed: {e}")
+    return _model
+
+def set_model(replacement):
+    """
+    Use another object with Gemini's generate_content() interface instead of the
+    real model, e.g. the local stand-in the load tests in bench/ install.
+    """
+    global _model, _model_replaced
+    with _model_lock:
+        _model = replacement
+        _model_replaced = True
+
+def _reinit_after_fork():
+    """
+    Runs in a forked child (e.g. a gunicorn worker): the Gemini client's
+    connections can't be shared with the parent, so the next call configures
+    a new one (a set_model() stand-in is kept). Admission state held by
+    threads that didn't survive the fork is reset; rate limits are per process.
+    """
+    global _cond, _waiting, _in_flight, _model, _model_lock
+    _cond = threading.Condition()
+    _waiting = []
+    _in_flight = 0
+    _model_lock = threading.Lock()
+    if not _model_replaced:
+        _model = None
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def _count(key, amount=1):
+    with _cond:
+        _stats[key] += amount
+
+@contextmanager
+def lane(priority):
+    """Run the block's LLM calls in the given lane (INTERACTIVE or BATCH) on this thread."""
+    previous = current_lane()
+    _context.lane = priority
+    try:
+        yield
+    finally:
+        _context.lane = previous
+
+def current_lane():
+    return getattr(_context, "lane", INTERACTIVE)
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+# Admission
+def _acquire(priority, tokens, deadline):
+    """Block until this call is first in line, a concurrency slot is free and both buckets allow it."""
+    global _in_flight
+    ticket = (priority, next(_sequence))
+    started = time.monotonic()
+    with _cond:
+        heapq.heappush(_waiting, ticket)
+        try:
+            while True:
+                now = time.monotonic()
+                wait = None
+                if _waiting[0] == ticket and _in_flight < MAX_CONCURRENT_CALLS:
+                    wait = max(_request_bucket.wait_time(1, now), _token_bucket.wait_time(tokens, now))
+                    if wait == 0:
+                        _request_bucket.take(1, now)
+                        _token_bucket.take(tokens, now)
+                        _in_flight += 1
+                        _stats["throttled_seconds"] += now - started
+                        return
+                remaining = deadline - now
+                if remaining <= 0:
+                    _stats["deadline_exceeded"] += 1
+                    raise LLMDeadlineExceeded(f"Gave up after waiting {now - started:.1f}s for an LLM slot")
+                _cond.wait(min(wait, remaining) if wait else remaining)
+        finally:
+            _waiting.remove(ticket)
+            heapq.heapify(_waiting)
+            _cond.notify_all()
+
+def _release(tokens_reserved, tokens_used):
+    global _in_flight
+    with _cond:
+        _in_flight -= 1
+        if tokens_used is not None:
+            _token_bucket.take(tokens_used - tokens_reserved, time.monotonic())
+            _stats["tokens"] += tokens_used
+        _cond.notify_all()
+
+def _retryable(error):
+    if getattr(error, "code", None) in (429, 500, 502, 503, 504):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+def _tokens_used(response):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) or None
+
+# Public API
+def generate(prompt, feature, language="", priority=None, deadline=None):
+    """
+    Return the model's text for the prompt, through the response cache.
+    Misses wait for admission (lane priority, MAX_CONCURRENT_CALLS, request and
+    token buckets), and retryable errors back off exponentially with full jitter.
+    Raises LLMDeadlineExceeded once `deadline` seconds (per-lane default) are used up,
+    or the model's own exception when it isn't retryable or retries run out.
+    """
+    model = get_model()
+    if model is None:
+        if not GEMINI_API_KEY:
+            raise RuntimeError("Gemini is not configured: set the GEMINI_API_KEY environment variable")
+        raise RuntimeError("Gemini is not initialized")
+    key = llm_cache.make_key(feature, getattr(model, "model_name", ""), language, prompt)
+    text = llm_cache.get(key)
+    if text is not None:
+        _count("cache_hits")
+        metrics.inc("llm_cache_hits_total", feature=feature)
+        return text
+
+    with metrics.timer("llm", feature=feature):
+        return _generate(model, key, prompt, feature, priority, deadline)
+
+def _generate(model, key, prompt, feature, priority, deadline):
+    priority = current_lane() if priority is None else priority
+    deadline_at = time.monotonic() + (deadline or DEADLINE_SECONDS[priority])
+    reserved = estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+    for attempt in range(MAX_RETRIES + 1):
+        _acquire(priority, reserved, deadline_at)
+        used = None
+        try:
+            _count("calls")
+            remaining = deadline_at - time.monotonic()
+            response = model.generate_content(prompt, request_options={"timeout": max(remaining, 1.0)})
+            used = _tokens_used(response)
+            text = response.text
+        except Exception as e:
+            if not _retryable(e) or attempt == MAX_RETRIES:
+                _count("failures")
+                raise
+            delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+            if time.monotonic() + delay >= deadline_at:
+                _count("deadline_exceeded")
+                raise LLMDeadlineExceeded(f"No time left to retry {feature} call after: {e}") from e
+            _count("retries")
+            logger.warning(f"Retryable LLM error on {feature} call (attempt {attempt + 1}), retrying in {delay:.1f}s: {e}")
+        else:
+            if used:
+                metrics.inc("llm_tokens_total", used, feature=feature)
+            llm_cache.put(key, feature, text)
+            return text
+        finally:
+            _release(reserved, used)
+        time.sleep(delay)
+
+def stats():
+    with _cond:
+        snapshot = dict(_stats)
+        snapshot.update(
+            in_flight=_in_flight,
+            waiting_interactive=sum(1 for p, _ in _waiting if p == INTERACTIVE),
+            waiting_batch=sum(1 for p, _ in _waiting if p == BATCH),
+        )
+    return snapshot
@@ -0,0 +1,263 @@
+from psycopg2 import Error
+from psycopg2.extras import execute_values
+import blobs
+import db
+import metrics
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+QUEUE_MAX_SIZE = 10000      # records held in memory before the overflow policy applies
+BATCH_SIZE = 200            # flush as soon as this many records are waiting
+FLUSH_INTERVAL = 1.0        # ...or this many seconds after the first one arrived
+SHUTDOWN_TIMEOUT = 10.0     # how long a clean shutdown waits for the final flush
+KNOWN_BLOBS_MAX = 20000     # hashes remembered as already stored, so repeats skip the blob insert
+
+# Overflow policy when the queue is full:
+#   "drop" - discard the new record and count it (never blocks a request)
+#   "sync" - write the record inline on the caller's thread (never loses a record)
+OVERFLOW_POLICY = "drop"
+
+# Columns written per table, in insert order. Source code is passed to
+# enqueue() as text (original_code=...) and stored as a code_blobs reference
+# in the matching hash column (see db.BLOB_COLUMNS).
+TABLES = {
+    "code_analysis_logs": ("language", "original_hash", "corrected_hash", "error_report", "error_count"),
+    "code_optimization_records": ("language", "original_hash", "optimized_hash", "debug_info", "execution_time", "optimization_level"),
+    "code_plag": ("language", "original_hash", "cleaned_hash", "plagiarism_score", "analysis",
+                  "structure_hash", "structure_signature"),
+    "code_doc_logs": ("language", "original_hash", "documentation"),
+}
+
+_queue = queue.Queue(maxsize=QUEUE_MAX_SIZE)
+_stop = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+_known_blobs = OrderedDict()
+_known_blobs_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "enqueued": 0,
+    "written": 0,
+    "dropped": 0,
+    "written_inline": 0,
+    "failed": 0,
+    "flushes": 0,
+    "last_flush_seconds": 0.0,
+    "max_flush_seconds": 0.0,
+    "total_flush_seconds": 0.0,
+    "blobs_written": 0,
+    "blobs_deduplicated": 0,
+    "blob_bytes_raw": 0,
+    "blob_bytes_stored": 0,
+}
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+def _hash_positions(table):
+    """Positions of the hash columns in a TABLES row."""
+    hash_columns = set(db.BLOB_COLUMNS.get(table, {}).values())
+    return [i for i, column in enumerate(TABLES[table]) if column in hash_columns]
+
+def _to_blobs(table, rows):
+    """
+    Replace the source texts in rows with their hashes. Returns the rows and
+    the code_blobs rows still to insert: one per distinct source in the
+    batch, minus those this process has already stored.
+    """
+    positions = _hash_positions(table)
+    pending = {}
+    converted = []
+    duplicates = 0
+    for row in rows:
+        row = list(row)
+        for i in positions:
+            if row[i] is None:
+                continue
+            key = blobs.digest(row[i])
+            with _known_blobs_lock:
+                known = key in _known_blobs
+                if known:
+                    _known_blobs.move_to_end(key)
+            if known or key in pending:
+                duplicates += 1
+            else:
+                pending[key] = blobs.pack(row[i])
+            row[i] = key
+        converted.append(tuple(row))
+    _count("blobs_deduplicated", duplicates)
+    return converted, list(pending.values())
+
+def _remember_blobs(keys):
+    with _known_blobs_lock:
+        for key in keys:
+            _known_blobs[key] = True
+            _known_blobs.move_to_end(key)
+        while len(_known_blobs) > KNOWN_BLOBS_MAX:
+            _known_blobs.popitem(last=False)
+
+def _insert_rows(table, rows):
+    """Insert rows (with source texts) and the blobs they reference in one transaction."""
+    columns = TABLES[table]
+    rows, new_blobs = _to_blobs(table, rows)
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        if new_blobs:
+            inserted = execute_values(
+                cur, "INSERT INTO code_blobs (hash, compression, size, content) VALUES %s "
+                     "ON CONFLICT (hash) DO NOTHING RETURNING size, octet_length(content)",
+                new_blobs, page_size=BATCH_SIZE, fetch=True)
+        execute_values(cur, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s", rows, page_size=BATCH_SIZE)
+    if new_blobs:
+        _remember_blobs(key for key, _, _, _ in new_blobs)
+        with _stats_lock:
+            _stats["blobs_written"] += len(inserted)
+            _stats["blobs_deduplicated"] += len(new_blobs) - len(inserted)
+            _stats["blob_bytes_raw"] += sum(raw for raw, _ in inserted)
+            _stats["blob_bytes_stored"] += sum(stored for _, stored in inserted)
+
+def _flush(records):
+    """
+    Write a batch with one multi-row INSERT per table.
+    A failing table is logged and counted; it does not block the others.
+    """
+    by_table = {}
+    for table, row in records:
+        by_table.setdefault(table, []).append(row)
+
+    start = time.perf_counter()
+    for table, rows in by_table.items():
+        try:
+            with metrics.timer("db_insert", table=table):
+                _insert_rows(table, rows)
+            _count("written", len(rows))
+        except Exception as e:
+            logger.error(f"Batched insert into {table} failed ({len(rows)} rows): {e}")
+            _count("failed", len(rows))
+    elapsed = time.perf_counter() - start
+
+    with _stats_lock:
+        _stats["flushes"] += 1
+        _stats["last_flush_seconds"] = elapsed
+        _stats["total_flush_seconds"] += elapsed
+        _stats["max_flush_seconds"] = max(_stats["max_flush_seconds"], elapsed)
+
+def _run():
+    while True:
+        try:
+            first = _queue.get(timeout=FLUSH_INTERVAL)
+        except queue.Empty:
+            if _stop.is_set():
+                return
+            continue
+
+        batch = [first]
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or _stop.is_set():
+                break
+            try:
+                batch.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # On shutdown, drain whatever is left into the same flush
+        while _stop.is_set():
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        _flush(batch)
+
+def start():
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _stop.clear()
+            _thread = threading.Thread(target=_run, name="log-writer", daemon=True)
+            _thread.start()
+            logger.info("Log writer started")
+
+def shutdown(timeout=SHUTDOWN_TIMEOUT):
+    """Flush everything still queued and stop the writer thread."""
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            return
+        _stop.set()
+        _thread.join(timeout)
+        if _thread.is_alive():
+            logger.warning(f"Log writer did not finish flushing within {timeout}s; {_queue.qsize()} records lost")
+        _thread = None
+
+atexit.register(shutdown)
+
+def _reinit_after_fork():
+    """
+    Runs in a forked child (e.g. a gunicorn worker): the writer thread didn't
+    survive the fork and anything still queued belongs to the parent, which
+    writes it itself. Start with an empty queue; the thread restarts on the
+    first enqueue().
+    """
+    global _queue, _stop, _thread, _thread_lock, _known_blobs_lock, _stats_lock
+    _queue = queue.Queue(maxsize=QUEUE_MAX_SIZE)
+    _stop = threading.Event()
+    _thread = None
+    _thread_lock = threading.Lock()
+    _known_blobs_lock = threading.Lock()
+    _stats_lock = threading.Lock()
+    for key in _stats:
+        _stats[key] = type(_stats[key])()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def enqueue(table, **values):
+    """
+    Queue one log record for a background batched insert.
+    Returns True if the record was queued (or written inline), False if dropped.
+    """
+    if not db.DB_ENABLED:
+        _count("dropped")
+        return False
+    sources = {hash_column: text_column for text_column, hash_column in db.BLOB_COLUMNS.get(table, {}).items()}
+    row = tuple(values.get(sources.get(column, column)) for column in TABLES[table])
+    start()
+    try:
+        _queue.put_nowait((table, row))
+        _count("enqueued")
+        return True
+    except queue.Full:
+        pass
+
+    if OVERFLOW_POLICY == "sync":
+        try:
+            _insert_rows(table, [row])
+            _count("written_inline")
+            return True
+        except Error as e:
+            logger.error(f"Inline insert into {table} failed: {e}")
+            _count("failed")
+            return False
+
+    _count("dropped")
+    logger.warning(f"Log queue full, dropped record for {table}")
+    return False
+
+def stats():
+    """Counters for monitoring: queue depth, throughput, flush latency and blob deduplication."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    snapshot["queue_depth"] = _queue.qsize()
+    snapshot["avg_flush_seconds"] = snapshot["total_flush_seconds"] / snapshot["flushes"] if snapshot["flushes"] else 0.0
+    return snapshot
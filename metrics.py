@@ -0,0 +1,174 @@
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+PREFIX = "codeguide"
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", "0") == "1"  # always send the header, not just on ?timing=1
+
+_lock = threading.Lock()
+_histograms = {}   # (name, labels) -> [bucket counts..., +Inf count, sum]
+_counters = {}     # (name, labels) -> value
+_help = {}         # name -> help text
+_collectors = {}   # prefix -> stats() function of another module
+_context = threading.local()
+
+def _reinit_after_fork():
+    # A forked child (e.g. a gunicorn worker) keeps the parent's series but
+    # can't rely on a lock another thread held at fork time
+    global _lock
+    _lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def describe(name, text):
+    _help[name] = text
+
+# Recording
+def observe(name, seconds, **labels):
+    """Add one observation to a latency histogram."""
+    key = (name, _labels(labels))
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        series[bisect.bisect_left(BUCKETS, seconds)] += 1
+        series[-1] += seconds
+
+def inc(name, amount=1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+@contextmanager
+def timer(stage, **labels):
+    """
+    Time a stage of request handling: feeds the stage_seconds histogram, counts
+    errors raised inside the block and adds to the current request's breakdown.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("stage_errors_total", stage=stage, **labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("stage_seconds", elapsed, stage=stage, **labels)
+        breakdown = getattr(_context, "breakdown", None)
+        if breakdown is not None:
+            with _lock:
+                breakdown[stage] = breakdown.get(stage, 0.0) + elapsed
+
+def timed(stage):
+    """Decorator form of timer() for a whole function."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Per-request breakdown
+def begin_request():
+    """Start collecting a stage breakdown for the request handled on this thread."""
+    _context.breakdown = {}
+    return _context.breakdown
+
+def end_request():
+    breakdown = getattr(_context, "breakdown", None)
+    _context.breakdown = None
+    return breakdown or {}
+
+def current_breakdown():
+    return getattr(_context, "breakdown", None)
+
+@contextmanager
+def attach(breakdown):
+    """Let a worker thread add its stages to the breakdown of the request that spawned it."""
+    previous = getattr(_context, "breakdown", None)
+    _context.breakdown = breakdown
+    try:
+        yield
+    finally:
+        _context.breakdown = previous
+
+def server_timing(breakdown):
+    """Format a breakdown as a Server-Timing header value (durations in milliseconds)."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in sorted(breakdown.items()))
+
+# Exposition
+def register_collector(prefix, stats):
+    """Export the numeric fields of another module's stats() dict as gauges named <prefix>_<field>."""
+    _collectors[prefix] = stats
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+def _header(lines, name, kind, text):
+    lines.append(f"# HELP {PREFIX}_{name} {text}")
+    lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: list(series) for key, series in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+
+    for name in sorted({name for name, _ in histograms}):
+        _header(lines, name, "histogram", _help.get(name, f"{name} latency in seconds"))
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{PREFIX}_{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{PREFIX}_{name}_sum{_format_labels(labels)} {series[-1]:.6f}")
+            lines.append(f"{PREFIX}_{name}_count{_format_labels(labels)} {cumulative}")
+
+    for name in sorted({name for name, _ in counters}):
+        _header(lines, name, "counter", _help.get(name, name.replace("_", " ")))
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f"{PREFIX}_{name}{_format_labels(labels)} {value}")
+
+    for prefix, stats in sorted(_collectors.items()):
+        try:
+            snapshot = stats()
+        except Exception as e:
+            logger.warning(f"Metrics collector {prefix} failed: {e}")
+            continue
+        for field, value in sorted(snapshot.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            _header(lines, f"{prefix}_{field}", "gauge", f"{prefix}.stats()['{field}']")
+            lines.append(f"{PREFIX}_{prefix}_{field} {value}")
+    return "\n".join(lines) + "\n"
+
+describe("stage_seconds", "Time spent in each stage of request handling, in seconds")
+describe("stage_errors_total", "Stages that ended with an exception")
+describe("request_seconds", "HTTP request latency in seconds")
+describe("requests_total", "HTTP requests by endpoint and status")
+describe("llm_tokens_total", "Gemini tokens used, by feature")
+describe("llm_cache_hits_total", "Gemini calls answered from the response cache, by feature")
+describe("rewrite_results_total", "Rule-based rewrites accepted or rejected by benchmark verification")
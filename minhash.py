@@ -0,0 +1,288 @@
+from psycopg2 import Error
+from psycopg2.extras import execute_values
+import blobs
+import db
+import code_analysis
+import ast
+import hashlib
+import logging
+import os
+import random
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+NUM_PERM = 128          # signature length
+BANDS = 32              # LSH bands of NUM_PERM // BANDS rows; candidates need ~(1/BANDS)^(1/ROWS) similarity
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4        # consecutive normalized AST nodes per shingle
+MIN_SIMILARITY = 0.5    # estimated Jaccard similarity below which candidates aren't reported
+TOP_MATCHES = 5
+CORPUS_LIMIT = 200000
+BACKFILL_BATCH = 500
+
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures are persisted, so the permutations must never change between processes
+_rng = random.Random(20240611)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+# Normalized Structure
+class _PythonDeclarations(ast.NodeVisitor):
+    """First pass: names the submission defines itself (everything else is library API and kept)."""
+
+    def __init__(self):
+        self.names = set()
+
+    def visit_FunctionDef(self, node):
+        self.names.add(node.name)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_ClassDef = visit_FunctionDef
+
+    def visit_arg(self, node):
+        self.names.add(node.arg)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Store):
+            self.names.add(node.id)
+
+def _canonicalizer(declared):
+    """Map declared identifiers to v0, v1, ... in order of first appearance."""
+    mapping = {}
+
+    def canonical(name):
+        if name not in declared:
+            return name
+        return mapping.setdefault(name, f"v{len(mapping)}")
+    return canonical
+
+def _python_labels(tree):
+    declarations = _PythonDeclarations()
+    declarations.visit(tree)
+    canonical = _canonicalizer(declarations.names)
+    labels = []
+    for node in _preorder(tree):
+        kind = type(node).__name__
+        if isinstance(node, ast.expr_context):
+            continue
+        if isinstance(node, ast.Name):
+            labels.append(f"Name:{canonical(node.id)}")
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            labels.append(f"{kind}:{canonical(node.name)}")
+        elif isinstance(node, ast.arg):
+            labels.append(f"arg:{canonical(node.arg)}")
+        elif isinstance(node, ast.Attribute):
+            labels.append(f"Attribute:{canonical(node.attr)}")
+        elif isinstance(node, ast.Constant):
+            labels.append(f"Constant:{type(node.value).__name__}")
+        elif isinstance(node, ast.alias):
+            labels.append(f"alias:{node.name}")
+        else:
+            labels.append(kind)
+    return labels
+
+def _preorder(tree):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(list(ast.iter_child_nodes(node))))
+
+def _java_literal_kind(value):
+    if value.startswith('"'):
+        return "String"
+    if value.startswith("'"):
+        return "char"
+    if value in ("true", "false", "null"):
+        return value
+    return "number"
+
+def _java_labels(tree):
+    import javalang
+    declared = set()
+    for _, node in tree:
+        if isinstance(node, (javalang.tree.ClassDeclaration, javalang.tree.InterfaceDeclaration,
+                             javalang.tree.MethodDeclaration, javalang.tree.VariableDeclarator,
+                             javalang.tree.FormalParameter)):
+            declared.add(node.name)
+    canonical = _canonicalizer(declared)
+    labels = []
+    for _, node in tree:
+        kind = type(node).__name__
+        if isinstance(node, javalang.tree.Literal):
+            labels.append(f"Literal:{_java_literal_kind(node.value)}")
+        elif isinstance(node, (javalang.tree.MemberReference, javalang.tree.MethodInvocation)):
+            labels.append(f"{kind}:{canonical(node.member)}")
+        elif isinstance(node, (javalang.tree.BinaryOperation, javalang.tree.Assignment)):
+            labels.append(f"{kind}:{getattr(node, 'operator', None) or getattr(node, 'type', '')}")
+        elif isinstance(node, (javalang.tree.ReferenceType, javalang.tree.BasicType)):
+            labels.append(f"{kind}:{canonical(node.name)}")
+        elif hasattr(node, "name") and isinstance(node.name, str):
+            labels.append(f"{kind}:{canonical(node.name)}")
+        else:
+            labels.append(kind)
+    return labels
+
+def structure_labels(code, language):
+    """
+    Preorder node labels of the normalized AST: identifiers the code declares
+    are renamed by first appearance and literals reduced to their type.
+    Languages or code without a usable parse fall back to the normalized token stream.
+    """
+    language = code_analysis.normalize_language(language)
+    if language == "Python":
+        facts = code_analysis.analyze(code, language)
+        if facts["tree"] is not None:
+            return _python_labels(facts["tree"])
+    elif language == "Java":
+        try:
+            return _java_labels(code_analysis.java_tree(code))
+        except Exception as e:
+            logger.debug(f"javalang could not parse submission, using tokens: {e}")
+    return [token for token, _ in code_analysis.tokens(code, language)]
+
+def structure_hash(labels):
+    """Exact structural fingerprint: equal for submissions that differ only in names, literals and layout."""
+    return hashlib.sha256("\x1f".join(labels).encode("utf-8")).hexdigest()
+
+# MinHash
+def _shingles(labels):
+    if len(labels) < SHINGLE_SIZE:
+        grams = ["\x1f".join(labels)] if labels else []
+    else:
+        grams = ["\x1f".join(labels[i:i + SHINGLE_SIZE]) for i in range(len(labels) - SHINGLE_SIZE + 1)]
+    return {int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big") for g in grams}
+
+def signature(labels):
+    """NUM_PERM-value MinHash signature of the label shingles, or None for empty code."""
+    shingles = _shingles(labels)
+    if not shingles:
+        return None
+    return [min((a * h + b) % _PRIME for h in shingles) for a, b in _PERMUTATIONS]
+
+def fingerprint(code, language):
+    """Structural hash and MinHash signature for a submission."""
+    labels = structure_labels(code, language)
+    return {"structure_hash": structure_hash(labels), "signature": signature(labels)}
+
+def estimate_similarity(sig_a, sig_b):
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+# LSH Index
+_lock = threading.RLock()
+_buckets = {}    # (language, band, band values) -> set of doc keys
+_documents = {}  # doc key -> {"id", "language", "signature"}
+_loaded = threading.Event()
+_loader = None
+
+def _bands(signature):
+    return [(band, tuple(signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+def add(code, language, signature, doc_id=None):
+    if signature is None:
+        return None
+    language = code_analysis.normalize_language(language)
+    doc_key = code_analysis.content_hash(code, language)
+    with _lock:
+        if doc_key in _documents:
+            if doc_id is not None and _documents[doc_key]["id"] is None:
+                _documents[doc_key]["id"] = doc_id
+            return doc_key
+        _documents[doc_key] = {"id": doc_id, "language": language, "signature": list(signature)}
+        for band, values in _bands(signature):
+            _buckets.setdefault((language, band, values), set()).add(doc_key)
+    return doc_key
+
+def search(code, language, signature, top=TOP_MATCHES, min_similarity=MIN_SIMILARITY):
+    """
+    Prior submissions with a near-identical structure, best first, including
+    identical ones (call this before add()).
+    Candidates come from BANDS bucket lookups; only those are compared
+    signature-to-signature, never the whole corpus.
+    """
+    ensure_loaded()
+    if signature is None:
+        return []
+    language = code_analysis.normalize_language(language)
+    with _lock:
+        candidates = set()
+        for band, values in _bands(signature):
+            candidates |= _buckets.get((language, band, values), set())
+        documents = {key: _documents[key] for key in candidates}
+
+    matches = []
+    for doc_key, document in documents.items():
+        similarity = estimate_similarity(signature, document["signature"])
+        if similarity >= min_similarity:
+            matches.append({"id": document["id"], "doc_key": doc_key, "similarity": similarity * 100})
+    matches.sort(key=lambda m: m["similarity"], reverse=True)
+    return matches[:top]
+
+def describe(match):
+    label = f"submission #{match['id']}" if match["id"] is not None else f"recent submission {match['doc_key'][:8]}"
+    return f"structure of {label}: {match['similarity']:.1f}% similar"
+
+# Corpus Loading
+def _backfill(cur, rows):
+    execute_values(cur, """
+        UPDATE code_plag SET structure_hash = data.structure_hash, structure_signature = data.structure_signature
+        FROM (VALUES %s) AS data (id, structure_hash, structure_signature)
+        WHERE code_plag.id = data.id""", rows, template="(%s, %s, %s::BIGINT[])", page_size=BACKFILL_BATCH)
+
+def _load_corpus():
+    try:
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT p.id, p.language, p.original_code, b.compression, b.content, p.structure_signature
+                FROM code_plag p LEFT JOIN code_blobs b ON b.hash = p.original_hash
+                ORDER BY p.id DESC LIMIT %s""", (CORPUS_LIMIT,))
+            rows = cur.fetchall()
+            missing = []
+            for row_id, language, inline_code, compression, content, stored in rows:
+                code = blobs.column(inline_code, compression, content)
+                if stored is None:  # logged before signatures were stored
+                    computed = fingerprint(code, language)
+                    stored = computed["signature"]
+                    if stored is not None:
+                        missing.append((row_id, computed["structure_hash"], stored))
+                add(code, language, stored, row_id)
+            if missing:
+                _backfill(cur, missing)
+        logger.info(f"Structural LSH index built from {len(rows)} prior submissions ({len(missing)} backfilled)")
+    except Error as e:
+        logger.error(f"Could not load structural signatures: {e}")
+    finally:
+        _loaded.set()
+
+def _reinit_after_fork():
+    """
+    Runs in a forked child (e.g. a gunicorn worker). The index built so far is
+    shared copy-on-write; if the parent was still loading, this process
+    finishes the job with its own loader (add() skips documents it already has).
+    """
+    global _lock, _loaded, _loader
+    _lock = threading.RLock()
+    if not _loaded.is_set():
+        _loaded = threading.Event()
+        _loader = None
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def ensure_loaded(wait=False):
+    """Start building the LSH index from code_plag in the background (once per process)."""
+    global _loader
+    with _lock:
+        if _loader is None:
+            _loader = threading.Thread(target=_load_corpus, name="structure-index-loader", daemon=True)
+            _loader.start()
+    if wait:
+        _loaded.wait()
+
+def stats():
+    with _lock:
+        return {"documents": len(_documents), "buckets": len(_buckets), "loaded": _loaded.is_set()}
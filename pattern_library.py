@@ -0,0 +1,149 @@
+from collections import deque
+import json
+import logging
+import os
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+LIBRARY_DIR = os.environ.get("PATTERN_LIBRARY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "patterns"))
+MATCH_THRESHOLD = 60.0  # an algorithm is reported when more than this percent of its fragments appear
+
+class AhoCorasick:
+    """
+    Multi-pattern string matcher. Built once from all fragments; scan() finds
+    every occurrence of every fragment in one pass over the text, so the cost
+    doesn't grow with the number of fragments in the library.
+    """
+
+    def __init__(self, fragments):
+        self.fragments = list(fragments)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, fragment in enumerate(self.fragments):
+            state = 0
+            for char in fragment:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(index)
+
+        # Breadth-first failure links; each state inherits the outputs of its fallback
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, child in self._goto[state].items():
+                pending.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def scan(self, text):
+        """Yield (fragment_index, end_position) for every match in text."""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield index, position
+
+def _squash(text):
+    """Drop whitespace so `for(int i` and `for (int i` are the same fragment."""
+    return "".join(text.split())
+
+# Library Loading
+_lock = threading.Lock()
+_libraries = {}  # language -> {"algorithms": {name: {fragment ids}}, "owners": [names per fragment], "matcher": AhoCorasick}
+
+def _reinit_after_fork():
+    # Compiled libraries are inherited by forked workers; the lock is not
+    global _lock
+    _lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def _load_language(language):
+    path = os.path.join(LIBRARY_DIR, f"{language}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            algorithms = json.load(f)["patterns"]
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Could not load pattern library {path}: {e}")
+        algorithms = {}
+
+    fragment_ids = {}
+    entries = {}
+    for name, fragments in algorithms.items():
+        ids = {fragment_ids.setdefault(_squash(fragment), len(fragment_ids)) for fragment in fragments if _squash(fragment)}
+        if ids:
+            entries[name] = ids
+    owners = [[] for _ in fragment_ids]
+    for name, ids in entries.items():
+        for fragment_id in ids:
+            owners[fragment_id].append(name)
+    library = {"algorithms": entries, "owners": owners, "matcher": AhoCorasick(fragment_ids)}
+    logger.info(f"Compiled {len(entries)} {language} algorithm patterns ({len(fragment_ids)} fragments)")
+    return library
+
+def get_library(language):
+    """Compiled library for a language, loaded from LIBRARY_DIR on first use."""
+    language = str(language).lower()
+    with _lock:
+        if language not in _libraries:
+            _libraries[language] = _load_language(language)
+        return _libraries[language]
+
+def load(languages=("python", "java", "c")):
+    """Compile the libraries up front so the first request doesn't pay for it."""
+    for language in languages:
+        get_library(language)
+
+def reload():
+    with _lock:
+        _libraries.clear()
+
+# Matching
+def match(code, language, threshold=MATCH_THRESHOLD):
+    """
+    Scan the code once and score every algorithm in the library.
+    Returns [(name, similarity, lines)] for algorithms above the
+    threshold, best first; lines are where their fragments were found.
+    """
+    library = get_library(language)
+    if not library["algorithms"]:
+        return []
+
+    # Squashed text plus the source line of every kept character
+    chars = []
+    lines = []
+    for line_number, line in enumerate(code.split("\n"), start=1):
+        for char in line:
+            if not char.isspace():
+                chars.append(char)
+                lines.append(line_number)
+    found = {}
+    for index, end in library["matcher"].scan("".join(chars)):
+        found.setdefault(index, lines[end])
+
+    # Only algorithms with at least one fragment present need scoring
+    candidates = {name for index in found for name in library["owners"][index]}
+    results = []
+    for name in candidates:
+        ids = library["algorithms"][name]
+        hits = ids & found.keys()
+        similarity = len(hits) / len(ids) * 100
+        if similarity > threshold:
+            results.append((name, similarity, sorted({found[i] for i in hits})))
+    results.sort(key=lambda r: r[1], reverse=True)
+    return results
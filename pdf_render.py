@@ -0,0 +1,178 @@
+import metrics
+import base64
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+CACHE_DIR = os.environ.get("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "codeguide-pdf-cache"))
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+MAX_DISK_CACHE_BYTES = 256 * 1024 * 1024
+LARGE_DOCUMENT_CHARS = 20000   # documents at least this long are rendered in a worker process
+RENDER_TIMEOUT = 60
+
+_memory = OrderedDict()  # key -> pdf bytes
+_memory_bytes = 0
+_lock = threading.Lock()
+_stats = {"memory_hits": 0, "disk_hits": 0, "renders": 0, "worker_renders": 0, "evictions": 0}
+
+# Rendering
+def _reinit_after_fork():
+    # Forked workers keep the rendered PDFs in memory but need their own lock
+    global _lock
+    _lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def build_pdf(documentation):
+    """Render '### Section:' documentation to PDF bytes with ReportLab."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Preformatted
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.units import inch
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=inch, leftMargin=inch, topMargin=inch, bottomMargin=inch)
+
+    # Custom styles
+    title_style = ParagraphStyle(name='Title', fontSize=16, leading=20, spaceAfter=12, textColor='#00ff9d')
+    heading_style = ParagraphStyle(name='Heading', fontSize=14, leading=18, spaceAfter=10, spaceBefore=12, textColor='#00ff9d')
+    body_style = ParagraphStyle(name='Body', fontSize=12, leading=14, spaceAfter=8)
+    code_style = ParagraphStyle(name='Code', fontName='Courier', fontSize=10, leading=12, spaceAfter=8)
+
+    story = []
+
+    # Clean documentation to remove HTML-like tags
+    clean_documentation = re.sub(r'<para>|</para>', '', documentation)
+
+    # Parse documentation
+    sections = re.split(r'###\s*([\w\s/]+):', clean_documentation)[1:]
+    for i in range(0, len(sections), 2):
+        title, content = sections[i].strip(), sections[i+1].strip()
+        story.append(Paragraph(title, title_style if title == 'Problem Statement' else heading_style))
+        if title == 'Commented Code':
+            story.append(Preformatted(content, code_style))
+        else:
+            for line in content.strip().split('\n'):
+                story.append(Paragraph(line, body_style))
+        story.append(Spacer(1, 0.2 * inch))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+def _op_render(request, stdout, stderr):
+    """Sandbox worker operation: render in a separate process so the GIL isn't held by the web app."""
+    try:
+        return {"error": None, "pdf": base64.b64encode(build_pdf(request["documentation"])).decode("ascii")}
+    except Exception as e:
+        return {"error": {"type": type(e).__name__, "message": str(e)}}
+
+def _render(documentation):
+    if len(documentation) >= LARGE_DOCUMENT_CHARS:
+        import sandbox
+        result = sandbox.run("pdf_render:_op_render", timeout=RENDER_TIMEOUT, cpu_limit=RENDER_TIMEOUT,
+                             documentation=documentation)
+        if not result["error"]:
+            _count("worker_renders")
+            return base64.b64decode(result["pdf"])
+        logger.warning(f"PDF worker render failed, rendering in-process: {result['error']['message']}")
+    _count("renders")
+    return build_pdf(documentation)
+
+# Cache
+def _count(key, amount=1):
+    with _lock:
+        _stats[key] += amount
+
+def _memory_get(key):
+    with _lock:
+        pdf = _memory.get(key)
+        if pdf is not None:
+            _memory.move_to_end(key)
+        return pdf
+
+def _memory_put(key, pdf):
+    global _memory_bytes
+    if len(pdf) > MEMORY_CACHE_BYTES:
+        return
+    with _lock:
+        if key in _memory:
+            return
+        _memory[key] = pdf
+        _memory_bytes += len(pdf)
+        while _memory_bytes > MEMORY_CACHE_BYTES:
+            _, evicted = _memory.popitem(last=False)
+            _memory_bytes -= len(evicted)
+            _stats["evictions"] += 1
+
+def _disk_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.pdf")
+
+def _disk_get(key):
+    path = _disk_path(key)
+    try:
+        with open(path, "rb") as f:
+            pdf = f.read()
+        os.utime(path)  # mark as recently used
+        return pdf
+    except OSError:
+        return None
+
+def _disk_put(key, pdf):
+    """Publish atomically (write a temp file, then rename) and trim the directory to MAX_DISK_CACHE_BYTES."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        staging = os.path.join(CACHE_DIR, f".{uuid.uuid4().hex}.tmp")
+        with open(staging, "wb") as f:
+            f.write(pdf)
+        os.replace(staging, _disk_path(key))
+        entries = []
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(".pdf"):
+                path = os.path.join(CACHE_DIR, name)
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= MAX_DISK_CACHE_BYTES:
+                break
+            os.remove(path)
+            total -= size
+            _count("evictions")
+    except OSError as e:
+        logger.warning(f"Could not store rendered PDF: {e}")
+
+# Public API
+def render(documentation):
+    """
+    PDF bytes for the documentation. Cached by content hash in a bounded
+    in-memory LRU and on disk, so repeat downloads skip ReportLab entirely.
+    """
+    key = hashlib.sha256(documentation.encode("utf-8")).hexdigest()
+    pdf = _memory_get(key)
+    if pdf is not None:
+        _count("memory_hits")
+        return pdf
+    pdf = _disk_get(key)
+    if pdf is not None:
+        _count("disk_hits")
+        _memory_put(key, pdf)
+        return pdf
+    with metrics.timer("pdf"):
+        pdf = _render(documentation)
+    _memory_put(key, pdf)
+    _disk_put(key, pdf)
+    return pdf
+
+def stats():
+    with _lock:
+        return dict(_stats, memory_entries=len(_memory), memory_bytes=_memory_bytes)
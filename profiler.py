@@ -0,0 +1,210 @@
+import logging
+import os
+import platform
+import re
+import shutil
+import subprocess
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+TOP_N = 10                    # functions and lines reported
+PROMPT_TOP_N = 5              # hotspots passed on to the optimizer prompt
+PROFILE_TIMEOUT_SECONDS = 10  # one profiled run of the submission
+SAMPLE_INTERVAL = 0.001       # line sampler period (effectively bounded by sys.getswitchinterval())
+C_PROFILE_FLAGS = ["-pg", "-g", "-O1", "-fno-inline"]  # keep functions visible to gprof
+SOURCE_NAME = "<submission>"
+
+# Entries cProfile records for the profiler itself and the sandbox's output capture
+_PYTHON_NOISE = ("builtins.exec>", "'_lsprof.Profiler'", "_CappedIO", "'_io.StringIO'")
+
+# Python
+def _op_python_profile(request, stdout, stderr):
+    """
+    Sandbox worker operation: run the submission once under cProfile (function
+    timings) while a thread samples the main thread's stack (line timings).
+    """
+    import cProfile
+    import pstats
+    import sys
+    import threading
+    import traceback
+    from contextlib import redirect_stdout, redirect_stderr
+
+    try:
+        code = compile(request["code"], SOURCE_NAME, "exec")
+    except (SyntaxError, ValueError) as e:  # ValueError: source with null bytes
+        return {"error": {"type": type(e).__name__, "message": str(e), "traceback": traceback.format_exc()}}
+    target = threading.get_ident()
+    line_samples = {}
+    total_samples = [0]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(target)
+            seen = set()
+            while frame is not None:
+                if frame.f_code.co_filename == SOURCE_NAME and frame.f_lineno not in seen:
+                    seen.add(frame.f_lineno)
+                    line_samples[frame.f_lineno] = line_samples.get(frame.f_lineno, 0) + 1
+                frame = frame.f_back
+            total_samples[0] += 1
+
+    profile = cProfile.Profile()
+    sampler = threading.Thread(target=sample, daemon=True)
+    result = {"error": None}
+    # The sampler only runs when the main thread yields the GIL, so yield it as often as we sample
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(SAMPLE_INTERVAL)
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            profile.runctx(code, {"__name__": "__main__"}, None)
+    except BaseException as e:  # SystemExit/KeyboardInterrupt from user code included
+        result["error"] = {"type": type(e).__name__, "message": str(e), "traceback": traceback.format_exc()}
+    finally:
+        stop.set()
+        sampler.join()
+        sys.setswitchinterval(switch_interval)
+    result["elapsed"] = time.perf_counter() - start
+
+    functions = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in pstats.Stats(profile).stats.items():
+        if filename == SOURCE_NAME:
+            label = "module level" if name == "<module>" else name
+        elif filename == "~" and not any(noise in name for noise in _PYTHON_NOISE):
+            label, line = name, None
+        else:
+            continue
+        functions.append({"name": label, "line": line, "calls": calls, "self": own, "cumulative": cumulative})
+    result["functions"] = functions
+    result["lines"] = [{"line": line, "samples": count} for line, count in line_samples.items()]
+    result["samples"] = total_samples[0]
+    return result
+
+def _profile_python(code):
+    import sandbox
+    result = sandbox.run("profiler:_op_python_profile", timeout=PROFILE_TIMEOUT_SECONDS,
+                         cpu_limit=PROFILE_TIMEOUT_SECONDS, code=code)
+    if result["error"]:
+        return None, f"{result['error']['type']}: {result['error']['message']}"
+    total = result["samples"]
+    lines = [dict(entry, share=entry["samples"] / total) for entry in result["lines"]] if total else []
+    return {
+        "functions": result["functions"],
+        "lines": lines,
+        "elapsed": result["elapsed"],
+        "method": f"cProfile + stack sampling ({total} samples), sandboxed",
+    }, None
+
+# C
+_GPROF_ROW = re.compile(r"^\s*([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+(?:(\d+)\s+([\d.]+)\s+([\d.]+)\s+)?(\S.*?)\s*$")
+_GPROF_LINE = re.compile(r"^(.*?) \(.*?:(\d+) @ \w+\)$")
+
+def _parse_gprof(output):
+    """Rows of a gprof flat profile as dicts with name, share, self, calls and total_per_call (seconds)."""
+    rows = []
+    unit = 1.0
+    for text in output.splitlines():
+        if "name" in text and "call" in text:
+            unit = 1e-3 if "ms/call" in text else 1e-6 if "us/call" in text else 1e-9 if "ns/call" in text else 1.0
+            continue
+        match = _GPROF_ROW.match(text)
+        if match:
+            percent, _, own, calls, _, total_per_call, name = match.groups()
+            rows.append({
+                "name": name,
+                "share": float(percent) / 100,
+                "self": float(own),
+                "calls": int(calls) if calls else None,
+                "total_per_call": float(total_per_call) * unit if total_per_call else None,
+            })
+    return rows
+
+def _profile_c(code):
+    import build_cache
+    if not (shutil.which("gcc") and shutil.which("gprof")):
+        return None, None
+    exe_name = "profile.exe" if platform.system() == "Windows" else "profile"
+    with build_cache.build(["gcc", *C_PROFILE_FLAGS, "-o", exe_name, "profile.c"], "profile.c", code, [exe_name]) as build:
+        if build["returncode"] != 0:
+            return None, f"Compilation failed: {build['stderr']}"
+        workdir = build["workdir"]
+        start = time.perf_counter()
+        try:
+            subprocess.run([os.path.join(workdir, exe_name)], cwd=workdir, stdin=subprocess.DEVNULL,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=PROFILE_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            return None, f"Execution timed out after {PROFILE_TIMEOUT_SECONDS}s"
+        elapsed = time.perf_counter() - start
+        if not os.path.exists(os.path.join(workdir, "gmon.out")):
+            return None, "The program exited without writing gmon.out"
+        flat = subprocess.run(["gprof", "-b", "-p", exe_name, "gmon.out"], cwd=workdir,
+                              capture_output=True, text=True, timeout=PROFILE_TIMEOUT_SECONDS)
+        by_line = subprocess.run(["gprof", "-b", "-l", "-p", exe_name, "gmon.out"], cwd=workdir,
+                                 capture_output=True, text=True, timeout=PROFILE_TIMEOUT_SECONDS)
+
+    functions = [{"name": row["name"], "line": None, "calls": row["calls"], "self": row["self"],
+                  "cumulative": row["total_per_call"] * row["calls"] if row["calls"] and row["total_per_call"] is not None else row["self"]}
+                 for row in _parse_gprof(flat.stdout)]
+    lines = []
+    for row in _parse_gprof(by_line.stdout):
+        match = _GPROF_LINE.match(row["name"])
+        if match and row["share"] > 0:
+            lines.append({"line": int(match.group(2)), "samples": None, "share": min(row["share"], 1.0)})
+    return {"functions": functions, "lines": lines, "elapsed": elapsed,
+            "method": f"gprof ({' '.join(C_PROFILE_FLAGS)})"}, None
+
+# Public API
+def profile(code, language):
+    """
+    Run the program once under a profiler and collect its hotspots.
+    Returns (result, error); result is None without an error when the
+    language or its profiling toolchain isn't supported here. result holds
+    functions (name, line, calls, self, cumulative seconds) and lines
+    (line, share of run time), both sorted hottest first.
+    """
+    runners = {"Python": _profile_python, "C": _profile_c}
+    if language not in runners:
+        return None, None
+    try:
+        result, error = runners[language](code)
+    except Exception as e:
+        return None, f"Profiling failed: {e}"
+    if result:
+        result["functions"].sort(key=lambda f: (-f["cumulative"], -f["self"]))
+        result["lines"].sort(key=lambda entry: -entry["share"])
+        source = code.split("\n")
+        for entry in result["lines"]:
+            entry["source"] = source[entry["line"] - 1].strip() if 0 < entry["line"] <= len(source) else ""
+    return result, error
+
+def _fmt(seconds):
+    return f"{seconds * 1e3:.2f}ms" if seconds < 1 else f"{seconds:.3f}s"
+
+def format_report(result, top=TOP_N):
+    """Human-readable hotspot tables for the analysis pane."""
+    lines = [f"Hotspots ({result['method']}, run took {_fmt(result['elapsed'])}):", "Functions by cumulative time:"]
+    for f in result["functions"][:top]:
+        where = f" (line {f['line']})" if f["line"] else ""
+        calls = f"{f['calls']} calls, " if f["calls"] is not None else ""
+        lines.append(f"  {f['name']}{where}: {calls}{_fmt(f['cumulative'])} cumulative, {_fmt(f['self'])} self")
+    if result["lines"]:
+        lines.append("Lines by share of run time:")
+        for entry in result["lines"][:top]:
+            lines.append(f"  line {entry['line']}: {entry['share'] * 100:.1f}%  {entry['source']}")
+    return "\n".join(lines)
+
+def prompt_summary(result, top=PROMPT_TOP_N):
+    """Compact hotspot list for the optimizer prompt."""
+    functions = [f for f in result["functions"] if f["name"] != "module level"]
+    items = [f"- function {f['name']}" + (f" (line {f['line']})" if f["line"] else "")
+             + f": {_fmt(f['cumulative'])} cumulative" for f in functions[:top]]
+    items += [f"- line {entry['line']} ({entry['share'] * 100:.0f}% of run time): {entry['source']}"
+              for entry in result["lines"][:top]]
+    return "\n".join(items)
@@ -0,0 +1,1319 @@
+import benchmark
+import ast
+import builtins
+import difflib
+import keyword
+import logging
+import re
+from collections import Counter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+MIN_MEMBERSHIP_ELEMENTS = 3   # shorter literal lists stay lists: a tuple scan is as fast as hashing
+MAX_TOKEN_PASSES = 5          # token rules are re-run to catch nested matches
+MAX_SLOWDOWN_PERCENT = 5.0    # a significant slowdown below this is treated as timing noise
+
+BUILTIN_NAMES = frozenset(dir(builtins))
+
+# Builtins a loop may call without being able to rebind or mutate the loop's names
+_PURE_BUILTINS = frozenset({"abs", "bool", "chr", "divmod", "float", "int", "len", "max", "min", "ord",
+                            "print", "range", "round", "str"})
+
+_BLOCK_FIELDS = ("body", "orelse", "finalbody")
+_SCOPES = (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+_NESTED = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda) + _COMPREHENSIONS
+_SUSPENDS = (ast.Yield, ast.YieldFrom, ast.Await)
+
+# Python: analysis helpers
+def _walk(root, skip=()):
+    """ast.walk that doesn't descend into nodes whose id() is in skip."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if id(node) in skip:
+            continue
+        yield node
+        stack.extend(ast.iter_child_nodes(node))
+
+def _walk_nodes(nodes, skip=()):
+    for node in nodes:
+        yield from _walk(node, skip)
+
+def _bound_names(nodes):
+    """Every name the statements bind: assignments, loop targets, defs, imports, parameters, global declarations."""
+    names = set()
+    for node in _walk_nodes(nodes):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+    return names
+
+def _binding_counts(tree):
+    """How many times each name is bound anywhere in the tree."""
+    counts = Counter()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            counts[node.id] += 1
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            counts[node.name] += 1
+        elif isinstance(node, ast.arg):
+            counts[node.arg] += 1
+        elif isinstance(node, ast.alias):
+            counts[(node.asname or node.name).split(".")[0]] += 1
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            counts[node.name] += 1
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            counts.update(node.names)
+    return counts
+
+def _uses(root, name, skip=()):
+    return sum(1 for node in _walk(root, skip) if isinstance(node, ast.Name) and node.id == name)
+
+def _target_names(target):
+    """Names of a simple loop target (a name or a tuple of names), or None for anything else."""
+    if isinstance(target, ast.Name):
+        return [target.id]
+    if isinstance(target, (ast.Tuple, ast.List)) and all(isinstance(e, ast.Name) for e in target.elts):
+        return [e.id for e in target.elts]
+    return None
+
+def _assigned_name(stmt):
+    """Name of a plain `name = value` statement, else None."""
+    if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+        return stmt.targets[0].id
+    return None
+
+# Builtins that always return a str, int, float or bool
+_SCALAR_BUILTINS = frozenset({"str", "repr", "chr", "ord", "int", "float", "bool", "len", "hash"})
+
+def _hashable_constant(node):
+    return isinstance(node, ast.Constant) and isinstance(node.value, (str, bytes, int, float, type(None))) \
+        and node.value == node.value  # NaN is never found by a set lookup
+
+def _number(node):
+    return isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool)
+
+def _same(a, b):
+    return ast.dump(a) == ast.dump(b)
+
+def _name(id_, store=False):
+    return ast.Name(id=id_, ctx=ast.Store() if store else ast.Load())
+
+def _call(func, args, keywords=()):
+    return ast.Call(func=func if isinstance(func, ast.AST) else _name(func), args=list(args), keywords=list(keywords))
+
+def _singular(name):
+    return name[:-1] if len(name) > 1 and name.endswith("s") and not name.endswith("ss") else f"{name}_item"
+
+class _Replace(ast.NodeTransformer):
+    """Swap the nodes whose id() is a key of `replacements` for fresh copies of the mapped node."""
+
+    def __init__(self, replacements):
+        self.replacements = replacements
+
+    def visit(self, node):
+        if id(node) in self.replacements:
+            return ast.copy_location(self.replacements[id(node)](), node)
+        return super().visit(node)
+
+class Context:
+    """Module-wide facts shared by the Python rules: which builtins are rebound and which names are taken."""
+
+    def __init__(self, tree):
+        self.bound = _bound_names([tree])
+        self.taken = self.bound | {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        self.kinds = {}
+        bindings = _binding_counts(tree)
+        for node in ast.walk(tree):
+            name = _assigned_name(node)
+            if name and bindings[name] == 1:
+                self.kinds[name] = self._literal_kind(node.value)
+
+    def _literal_kind(self, node):
+        if isinstance(node, (ast.List, ast.ListComp)):
+            return "list"
+        if isinstance(node, ast.Tuple):
+            return "tuple"
+        if isinstance(node, (ast.Dict, ast.DictComp)):
+            return "dict"
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ("list", "tuple", "dict") \
+                and self.builtin(node.func.id):
+            return node.func.id
+        return None
+
+    def kind(self, name):
+        """
+        "list", "tuple" or "dict" when the name is bound exactly once in the
+        whole module, by assigning a literal, comprehension or constructor call
+        of that type; else None. Rules that rely on a receiver's type check this.
+        """
+        return self.kinds.get(name)
+
+    def builtin(self, name):
+        """True when `name` still refers to the builtin everywhere in the module."""
+        return name not in self.bound
+
+    def fresh(self, *candidates):
+        """The first candidate name (or a numbered variant of the last) not used anywhere in the module."""
+        for candidate in candidates:
+            if candidate not in self.taken and candidate not in BUILTIN_NAMES and not keyword.iskeyword(candidate):
+                self.taken.add(candidate)
+                return candidate
+        n = 1
+        while f"{candidates[-1]}_{n}" in self.taken:
+            n += 1
+        self.taken.add(f"{candidates[-1]}_{n}")
+        return f"{candidates[-1]}_{n}"
+
+# Python: rule framework
+_PYTHON_RULES = []
+
+def python_rule(cls):
+    """Register a Rule subclass; rules run once each, in registration order."""
+    _PYTHON_RULES.append(cls)
+    return cls
+
+class Rule(ast.NodeTransformer):
+    """
+    Base class for Python rewrites. Subclasses set `name` and `description`,
+    implement visit_* methods and call applied(node) for every rewrite.
+    self.scope is the innermost enclosing module, function, class or lambda.
+    """
+    name = ""
+    description = ""
+
+    def __init__(self, context):
+        self.context = context
+        self.lines = []
+        self.scopes = []
+
+    def visit(self, node):
+        is_scope = isinstance(node, _SCOPES)
+        if is_scope:
+            self.scopes.append(node)
+        try:
+            return super().visit(node)
+        finally:
+            if is_scope:
+                self.scopes.pop()
+
+    @property
+    def scope(self):
+        return self.scopes[-1]
+
+    def applied(self, node):
+        self.lines.append(getattr(node, "lineno", None))
+
+    def leaks(self, names, loop):
+        """
+        True if any of the loop's target names is read or written outside the
+        loop in this scope, other than by loops that bind it again themselves.
+        """
+        for name in names:
+            rebinding = {id(node) for node in ast.walk(self.scope)
+                         if (isinstance(node, ast.For) and name in (_target_names(node.target) or ()))
+                         or (isinstance(node, _COMPREHENSIONS) and any(name in (_target_names(g.target) or ())
+                                                                        for g in node.generators))}
+            if _uses(self.scope, name, skip=rebinding | {id(loop)}):
+                return True
+        return False
+
+class BlockRule(Rule):
+    """
+    Rule over runs of statements. rewrite(stmts, i) returns (consumed, replacement)
+    to swap stmts[i:i + consumed] for the replacement list, or None. Blocks are
+    rewritten innermost first.
+    """
+
+    def generic_visit(self, node):
+        super().generic_visit(node)
+        for field in _BLOCK_FIELDS:
+            stmts = getattr(node, field, None)
+            if isinstance(stmts, list) and stmts and isinstance(stmts[0], ast.stmt):
+                rewritten = self._rewrite_block(stmts)
+                if not rewritten and (field == "body" and not isinstance(node, ast.Module)):
+                    rewritten = [ast.Pass()]
+                setattr(node, field, rewritten)
+        return node
+
+    def _rewrite_block(self, stmts):
+        out = []
+        i = 0
+        while i < len(stmts):
+            result = self.rewrite(stmts, i)
+            if result:
+                consumed, replacement = result
+                self.applied(stmts[i])
+                out.extend(replacement)
+                i += consumed
+            else:
+                out.append(stmts[i])
+                i += 1
+        return out
+
+    def rewrite(self, stmts, i):
+        return None
+
+# Python: rules
+@python_rule
+class ConstantCondition(BlockRule):
+    name = "constant_condition"
+    description = "Removed a branch on a constant condition"
+
+    def rewrite(self, stmts, i):
+        stmt = stmts[i]
+        if not isinstance(stmt, (ast.If, ast.While)) or not isinstance(stmt.test, ast.Constant):
+            return None
+        if isinstance(stmt, ast.While) and stmt.test.value:
+            return None
+        kept, dropped = (stmt.body, stmt.orelse) if stmt.test.value else (stmt.orelse, stmt.body)
+        # Dead code can still make a function a generator or a name local to it
+        if any(isinstance(node, _SUSPENDS) for node in _walk_nodes(dropped)) or _bound_names(dropped):
+            return None
+        return 1, kept
+
+@python_rule
+class ListRangeIteration(Rule):
+    name = "list_range_iteration"
+    description = "Iterated over range() directly instead of a list copy"
+
+    def _unwrap(self, node):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "list" \
+                and self.context.builtin("list") and len(node.args) == 1 and not node.keywords:
+            inner = node.args[0]
+            if isinstance(inner, ast.Call) and isinstance(inner.func, ast.Name) and inner.func.id == "range" \
+                    and self.context.builtin("range"):
+                self.applied(node)
+                return inner
+        return node
+
+    def visit_For(self, node):
+        self.generic_visit(node)
+        node.iter = self._unwrap(node.iter)
+        return node
+
+    def visit_comprehension(self, node):
+        self.generic_visit(node)
+        node.iter = self._unwrap(node.iter)
+        return node
+
+@python_rule
+class DictKeys(Rule):
+    name = "dict_keys"
+    description = "Used the mapping itself instead of .keys() for iteration and membership"
+
+    def _unwrap(self, node):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "keys" \
+                and isinstance(node.func.value, ast.Name) and self.context.kind(node.func.value.id) == "dict" \
+                and not node.args and not node.keywords:
+            self.applied(node)
+            return node.func.value
+        return node
+
+    def visit_For(self, node):
+        self.generic_visit(node)
+        node.iter = self._unwrap(node.iter)
+        return node
+
+    def visit_comprehension(self, node):
+        self.generic_visit(node)
+        node.iter = self._unwrap(node.iter)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        node.comparators = [self._unwrap(c) if isinstance(op, (ast.In, ast.NotIn)) else c
+                            for op, c in zip(node.ops, node.comparators)]
+        return node
+
+@python_rule
+class RangeLenLoop(Rule):
+    name = "range_len_loop"
+    description = "Replaced index-based loop with direct iteration"
+
+    def visit_For(self, node):
+        self.generic_visit(node)
+        it = node.iter
+        if not (isinstance(node.target, ast.Name) and isinstance(it, ast.Call) and isinstance(it.func, ast.Name)
+                and it.func.id == "range" and self.context.builtin("range") and len(it.args) == 1 and not it.keywords):
+            return node
+        inner = it.args[0]
+        if not (isinstance(inner, ast.Call) and isinstance(inner.func, ast.Name) and inner.func.id == "len"
+                and self.context.builtin("len") and len(inner.args) == 1 and isinstance(inner.args[0], ast.Name)):
+            return node
+        sequence, index = inner.args[0].id, node.target.id
+        # seq[i] only means "the i-th item" for a list or tuple; a dict would be looked up by key
+        if self.context.kind(sequence) not in ("list", "tuple") or {sequence, index} & _bound_names(node.body):
+            return node
+        subscripts = [n for n in _walk_nodes(node.body) if isinstance(n, ast.Subscript) and isinstance(n.ctx, ast.Load)
+                      and isinstance(n.value, ast.Name) and n.value.id == sequence
+                      and isinstance(n.slice, ast.Name) and n.slice.id == index]
+        if not subscripts:
+            return node
+        inside = {id(n) for s in subscripts for n in (s.value, s.slice)}
+        names = [n for n in _walk_nodes(node.body) if isinstance(n, ast.Name) and id(n) not in inside]
+        if any(n.id == sequence for n in names):
+            return node  # the sequence is used some other way, e.g. mutated
+        index_used = any(n.id == index for n in names) or _uses(self.scope, index, skip={id(node)})
+        if index_used and not self.context.builtin("enumerate"):
+            return node
+        item = self.context.fresh(_singular(sequence), "item")
+        node.body = [_Replace({id(s): (lambda: _name(item)) for s in subscripts}).visit(stmt) for stmt in node.body]
+        if index_used:
+            node.target = ast.Tuple(elts=[_name(index, True), _name(item, True)], ctx=ast.Store())
+            node.iter = _call("enumerate", [_name(sequence)])
+        else:
+            node.target = _name(item, True)
+            node.iter = _name(sequence)
+        self.applied(node)
+        return node
+
+def _unnest(loop):
+    """
+    For a plain for loop whose body is a chain of nested for/if statements ending
+    in a single statement, return (comprehension generators, final statement).
+    """
+    generators = []
+    node = loop
+    while True:
+        if type(node) is ast.For and not node.orelse and _target_names(node.target):
+            generators.append(ast.comprehension(target=node.target, iter=node.iter, ifs=[], is_async=0))
+        elif type(node) is ast.If and not node.orelse and generators:
+            generators[-1].ifs.append(node.test)
+        else:
+            return None
+        if len(node.body) != 1:
+            return None
+        node = node.body[0]
+        if not isinstance(node, (ast.For, ast.If)):
+            return generators, node
+
+@python_rule
+class LoopToComprehension(BlockRule):
+    name = "loop_to_comprehension"
+    description = "Turned an accumulating loop into a comprehension"
+
+    def _parts(self, stmts, i):
+        """(accumulator name, initial value, generators, final statement, loop) for `x = <empty>` + loop, or None."""
+        if i + 1 >= len(stmts) or isinstance(self.scope, ast.ClassDef):
+            return None
+        name, loop = _assigned_name(stmts[i]), stmts[i + 1]
+        unnested = _unnest(loop) if name else None
+        if not unnested:
+            return None
+        generators, final = unnested
+        if any(isinstance(n, _SUSPENDS + (ast.NamedExpr,)) for n in ast.walk(loop)):
+            return None
+        targets = [t for g in generators for t in _target_names(g.target)]
+        if name in targets or self.leaks(targets, loop):
+            return None
+        return name, stmts[i].value, generators, final, loop
+
+    def rewrite(self, stmts, i):
+        parts = self._parts(stmts, i)
+        if not parts:
+            return None
+        name, initial, generators, final, loop = parts
+        comprehension = None
+        if isinstance(final, ast.Expr) and isinstance(final.value, ast.Call) and len(final.value.args) == 1 \
+                and not final.value.keywords and not isinstance(final.value.args[0], ast.Starred):
+            func, (element,) = final.value.func, final.value.args
+            if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == name:
+                if func.attr == "append" and isinstance(initial, ast.List) and not initial.elts:
+                    comprehension = ast.ListComp(elt=element, generators=generators)
+                elif func.attr == "add" and isinstance(initial, ast.Call) and isinstance(initial.func, ast.Name) \
+                        and initial.func.id == "set" and self.context.builtin("set") and not initial.args and not initial.keywords:
+                    comprehension = ast.SetComp(elt=element, generators=generators)
+        elif isinstance(final, ast.Assign) and len(final.targets) == 1 and isinstance(final.targets[0], ast.Subscript) \
+                and isinstance(final.targets[0].value, ast.Name) and final.targets[0].value.id == name \
+                and isinstance(initial, ast.Dict) and not initial.keys:
+            comprehension = ast.DictComp(key=final.targets[0].slice, value=final.value, generators=generators)
+        if comprehension is None:
+            return None
+        ast.copy_location(comprehension, loop)
+        # The accumulator may only appear as the receiver of the append/add/store
+        if _uses(loop, name) != 1:
+            return None
+        return 2, [ast.copy_location(ast.Assign(targets=[_name(name, True)], value=comprehension), stmts[i])]
+
+@python_rule
+class StringJoinLoop(LoopToComprehension):
+    name = "string_join_loop"
+    description = "Replaced repeated string concatenation in a loop with str.join"
+
+    def rewrite(self, stmts, i):
+        parts = self._parts(stmts, i)
+        if not parts:
+            return None
+        name, initial, generators, final, loop = parts
+        if not (isinstance(initial, ast.Constant) and isinstance(initial.value, str)):
+            return None
+        if not (isinstance(final, ast.AugAssign) and isinstance(final.op, ast.Add)
+                and isinstance(final.target, ast.Name) and final.target.id == name and _uses(loop, name) == 1):
+            return None
+        joined = _call(ast.Attribute(value=ast.Constant(value=""), attr="join", ctx=ast.Load()),
+                       [ast.copy_location(ast.ListComp(elt=final.value, generators=generators), loop)])
+        ast.copy_location(joined, loop)
+        value = ast.BinOp(left=initial, op=ast.Add(), right=joined) if initial.value else joined
+        return 2, [ast.copy_location(ast.Assign(targets=[_name(name, True)], value=value), stmts[i])]
+
+@python_rule
+class GeneratorCallToComprehension(Rule):
+    name = "generator_call_to_comprehension"
+    description = "Built the list/set/dict with a comprehension instead of a generator passed to the constructor"
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if not (isinstance(node.func, ast.Name) and node.func.id in ("list", "set", "dict")
+                and self.context.builtin(node.func.id) and len(node.args) == 1 and not node.keywords
+                and isinstance(node.args[0], ast.GeneratorExp)):
+            return node
+        generator = node.args[0]
+        if node.func.id == "list":
+            replacement = ast.ListComp(elt=generator.elt, generators=generator.generators)
+        elif node.func.id == "set":
+            replacement = ast.SetComp(elt=generator.elt, generators=generator.generators)
+        elif isinstance(generator.elt, ast.Tuple) and len(generator.elt.elts) == 2:
+            replacement = ast.DictComp(key=generator.elt.elts[0], value=generator.elt.elts[1], generators=generator.generators)
+        else:
+            return node
+        self.applied(node)
+        return ast.copy_location(replacement, node)
+
+@python_rule
+class ComprehensionIdentity(Rule):
+    name = "comprehension_identity"
+    description = "Replaced a comprehension that copies its input with list()/set()"
+
+    def _copied(self, node):
+        """The iterable a comprehension merely copies, else None."""
+        if len(node.generators) != 1:
+            return None
+        generator = node.generators[0]
+        if generator.ifs or generator.is_async or not isinstance(generator.target, ast.Name) \
+                or not isinstance(node.elt, ast.Name) or node.elt.id != generator.target.id:
+            return None
+        return generator.iter
+
+    def _identity(self, node, constructor):
+        self.generic_visit(node)
+        iterable = self._copied(node)
+        if iterable is None or not self.context.builtin(constructor):
+            return node
+        self.applied(node)
+        return ast.copy_location(_call(constructor, [iterable]), node)
+
+    def visit_Call(self, node):
+        # str.join takes any iterable, so '<sep>'.join([c for c in s]) needs no copy at all
+        if isinstance(node.func, ast.Attribute) and node.func.attr == "join" and isinstance(node.func.value, ast.Constant) \
+                and isinstance(node.func.value.value, str) and len(node.args) == 1 and not node.keywords \
+                and isinstance(node.args[0], ast.ListComp) and self._copied(node.args[0]) is not None:
+            node.args[0] = self._copied(node.args[0])
+            self.applied(node)
+        self.generic_visit(node)
+        return node
+
+    def visit_ListComp(self, node):
+        return self._identity(node, "list")
+
+    def visit_SetComp(self, node):
+        return self._identity(node, "set")
+
+@python_rule
+class ConstantCollectionToSet(Rule):
+    name = "constant_collection_to_set"
+    description = "Stored a constant collection that is only used for membership tests as a set"
+
+    def _hashable(self, node):
+        """True if `node` always evaluates to a hashable value: a constant, an f-string or a scalar builtin call."""
+        if _hashable_constant(node) or isinstance(node, ast.JoinedStr):
+            return True
+        return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _SCALAR_BUILTINS \
+            and self.context.builtin(node.func.id)
+
+    def visit_Module(self, node):
+        self.generic_visit(node)
+        # A set raises TypeError for an unhashable needle where a list just says
+        # False, so only count tests whose left operand is certainly hashable
+        probes = {id(c) for compare in ast.walk(node) if isinstance(compare, ast.Compare) and len(compare.ops) == 1
+                  and isinstance(compare.ops[0], (ast.In, ast.NotIn)) and self._hashable(compare.left)
+                  for c in compare.comparators}
+        bindings = _binding_counts(node)
+        for stmt in ast.walk(node):
+            name = _assigned_name(stmt)
+            if not name or not isinstance(stmt.value, (ast.List, ast.Tuple)) or bindings[name] != 1 \
+                    or len(stmt.value.elts) < MIN_MEMBERSHIP_ELEMENTS or not all(map(_hashable_constant, stmt.value.elts)):
+                continue
+            loads = [n for n in ast.walk(node) if isinstance(n, ast.Name) and n.id == name and isinstance(n.ctx, ast.Load)]
+            if loads and all(id(n) in probes for n in loads):
+                stmt.value = ast.copy_location(ast.Set(elts=stmt.value.elts), stmt.value)
+                self.applied(stmt)
+        return node
+
+@python_rule
+class SortedFirstToMinMax(Rule):
+    name = "sorted_first_to_min_max"
+    description = "Used min()/max() instead of sorting to take the first element"
+
+    def visit_Subscript(self, node):
+        self.generic_visit(node)
+        call = node.value
+        if not (isinstance(node.ctx, ast.Load) and isinstance(node.slice, ast.Constant) and node.slice.value == 0
+                and not isinstance(node.slice.value, bool) and isinstance(call, ast.Call) and isinstance(call.func, ast.Name)
+                and call.func.id == "sorted" and self.context.builtin("sorted") and len(call.args) == 1
+                and not isinstance(call.args[0], ast.Starred)):
+            return node
+        keywords = {k.arg: k for k in call.keywords}
+        if None in keywords or set(keywords) - {"key", "reverse"}:
+            return node
+        reverse = keywords.pop("reverse", None)
+        if reverse is not None and not (isinstance(reverse.value, ast.Constant) and isinstance(reverse.value.value, bool)):
+            return node
+        func = "max" if reverse is not None and reverse.value.value else "min"
+        if not self.context.builtin(func):
+            return node
+        self.applied(node)
+        return ast.copy_location(_call(func, call.args, keywords.values()), node)
+
+@python_rule
+class SquareToMultiply(Rule):
+    name = "square_to_multiply"
+    description = "Squared by multiplication instead of ** 2"
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow) and isinstance(node.left, ast.Name) and isinstance(node.right, ast.Constant) \
+                and node.right.value == 2 and type(node.right.value) is int:
+            self.applied(node)
+            return ast.copy_location(ast.BinOp(left=_name(node.left.id), op=ast.Mult(), right=_name(node.left.id)), node)
+        return node
+
+def _membership_branches(stmt):
+    """For `if key in mapping` / `if key not in mapping` with an else: (key, mapping, present branch, absent branch)."""
+    test = stmt.test
+    if not (isinstance(test, ast.Compare) and len(test.ops) == 1 and isinstance(test.ops[0], (ast.In, ast.NotIn))
+            and isinstance(test.left, (ast.Name, ast.Constant)) and isinstance(test.comparators[0], ast.Name)
+            and len(stmt.body) == 1 and len(stmt.orelse) == 1):
+        return None
+    present, absent = (stmt.body[0], stmt.orelse[0]) if isinstance(test.ops[0], ast.In) else (stmt.orelse[0], stmt.body[0])
+    return test.left, test.comparators[0], present, absent
+
+def _is_lookup(node, key, mapping):
+    return isinstance(node, ast.Subscript) and _same(node.value, mapping) and _same(node.slice, key)
+
+def _get(mapping, key, default):
+    return _call(ast.Attribute(value=_name(mapping.id), attr="get", ctx=ast.Load()), [key, default])
+
+@python_rule
+class DictGetDefault(BlockRule):
+    name = "dict_get_default"
+    description = "Replaced a membership test and lookup with dict.get()"
+
+    def rewrite(self, stmts, i):
+        stmt = stmts[i]
+        parts = _membership_branches(stmt) if isinstance(stmt, ast.If) else None
+        if not parts:
+            return None
+        key, mapping, present, absent = parts
+        if self.context.kind(mapping.id) != "dict":
+            return None
+        target = _assigned_name(present)
+        if not target or _assigned_name(absent) != target or not _is_lookup(present.value, key, mapping):
+            return None
+        default = absent.value
+        # dict.get() evaluates the default even when the key is present
+        if not (isinstance(default, (ast.Constant, ast.Name)) or
+                (isinstance(default, (ast.List, ast.Tuple, ast.Set)) and not default.elts) or
+                (isinstance(default, ast.Dict) and not default.keys)):
+            return None
+        return 1, [ast.copy_location(ast.Assign(targets=[_name(target, True)], value=_get(mapping, key, default)), stmt)]
+
+@python_rule
+class CounterIncrement(BlockRule):
+    name = "counter_increment"
+    description = "Counted with dict.get() instead of a membership test"
+
+    def rewrite(self, stmts, i):
+        stmt = stmts[i]
+        parts = _membership_branches(stmt) if isinstance(stmt, ast.If) else None
+        if not parts:
+            return None
+        key, mapping, present, absent = parts
+        if self.context.kind(mapping.id) != "dict":
+            return None
+        if isinstance(present, ast.AugAssign) and isinstance(present.op, ast.Add):
+            target, step = present.target, present.value
+        elif isinstance(present, ast.Assign) and len(present.targets) == 1 and isinstance(present.value, ast.BinOp) \
+                and isinstance(present.value.op, ast.Add) and _same(present.value.left, present.targets[0]):
+            target, step = present.targets[0], present.value.right
+        else:
+            return None
+        if not (_is_lookup(target, key, mapping) and _number(step) and isinstance(absent, ast.Assign)
+                and len(absent.targets) == 1 and _is_lookup(absent.targets[0], key, mapping)
+                and _number(absent.value) and absent.value.value == step.value):
+            return None
+        store = ast.Subscript(value=_name(mapping.id), slice=key, ctx=ast.Store())
+        value = ast.BinOp(left=_get(mapping, key, ast.Constant(value=0)), op=ast.Add(), right=step)
+        return 1, [ast.copy_location(ast.Assign(targets=[store], value=value), stmt)]
+
+def _may_jump(stmt):
+    """True if the statement can leave the current iteration early: break, continue, return or raise."""
+    stack = [(stmt, False)]
+    while stack:
+        node, in_loop = stack.pop()
+        if isinstance(node, (ast.Return, ast.Raise)) or (isinstance(node, (ast.Break, ast.Continue)) and not in_loop):
+            return True
+        if isinstance(node, _NESTED):
+            continue
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+            # break/continue in a nested loop's body stay inside it; its else clause belongs to us
+            stack.extend((child, True) for child in node.body)
+            stack.extend((child, in_loop) for child in node.orelse)
+        else:
+            stack.extend((child, in_loop) for child in ast.iter_child_nodes(node))
+    return False
+
+class _LoopRule(BlockRule):
+    """Shared checks for hoisting loop-invariant work out of for/while loops."""
+
+    def loop_parts(self, loop):
+        """The expressions evaluated on every iteration, or None if nothing can safely be hoisted."""
+        if type(loop) not in (ast.For, ast.While):
+            return None
+        parts = ([loop.test] if isinstance(loop, ast.While) else [loop.target]) + loop.body + loop.orelse
+        for node in _walk_nodes(parts):
+            if isinstance(node, _SUSPENDS + (ast.Global, ast.Nonlocal)):
+                return None
+            # Only calls to builtins that can't reach back into our names
+            if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in _PURE_BUILTINS
+                                                   and self.context.builtin(node.func.id)):
+                return None
+        return parts
+
+    def runs_at_least_once(self, loop):
+        """True for `while True` and for loops over a non-empty literal or a constant, non-empty range()."""
+        if isinstance(loop, ast.While):
+            return isinstance(loop.test, ast.Constant) and bool(loop.test.value)
+        it = loop.iter
+        if isinstance(it, (ast.List, ast.Tuple, ast.Set)):
+            return bool(it.elts) and not any(isinstance(e, ast.Starred) for e in it.elts)
+        if isinstance(it, ast.Constant):
+            return isinstance(it.value, (str, bytes)) and bool(it.value)
+        if isinstance(it, ast.Call) and isinstance(it.func, ast.Name) and it.func.id == "range" \
+                and self.context.builtin("range") and 1 <= len(it.args) <= 3 and not it.keywords \
+                and all(isinstance(a, ast.Constant) and type(a.value) is int for a in it.args):
+            try:
+                return len(range(*(a.value for a in it.args))) > 0
+            except ValueError:  # range() step of zero
+                return False
+        return False
+
+    def every_iteration(self, loop):
+        """
+        The parts of the loop evaluated on every pass before anything can skip
+        the rest: a while loop's test, then (only if the loop is known to run at
+        least once) the leading body statements up to the first that may jump
+        out. Compound statements contribute only their header expression.
+        """
+        evaluated = [loop.test] if isinstance(loop, ast.While) else []
+        if not self.runs_at_least_once(loop):
+            return evaluated
+        for stmt in loop.body:
+            if isinstance(stmt, (ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Expr)):
+                evaluated.append(stmt)
+            elif isinstance(stmt, (ast.If, ast.While)):
+                evaluated.append(stmt.test)
+            elif isinstance(stmt, ast.For):
+                evaluated.append(stmt.iter)
+            if _may_jump(stmt):
+                break
+        return evaluated
+
+    def bound_before(self, name, loop):
+        """True if the scope itself assigns the name (or takes it as a parameter) above the loop."""
+        scope = self.scope
+        if isinstance(scope, (ast.FunctionDef, ast.AsyncFunctionDef)) and name in _bound_names([scope.args]):
+            return True
+        nested = {id(node) for node in ast.walk(scope) if isinstance(node, _NESTED) and node is not scope}
+        return any(isinstance(node, ast.Name) and node.id == name and isinstance(node.ctx, ast.Store)
+                   and node.lineno < loop.lineno for node in _walk(scope, skip=nested))
+
+    def hoist(self, loop, parts, found, name_for):
+        """Assign each distinct expression in `found` to a fresh name before the loop and use that name inside it."""
+        assignments, names, replacements = [], {}, {}
+        for node in found:
+            key = ast.dump(node)
+            if key not in names:
+                names[key] = self.context.fresh(name_for(node))
+                assignments.append(ast.copy_location(ast.Assign(targets=[_name(names[key], True)], value=node), loop))
+            replacements[id(node)] = (lambda n=names[key]: _name(n))
+        replace = _Replace(replacements)
+        if isinstance(loop, ast.While):
+            loop.test = replace.visit(loop.test)
+        else:
+            loop.iter = replace.visit(loop.iter)
+        loop.body = [replace.visit(stmt) for stmt in loop.body]
+        loop.orelse = [replace.visit(stmt) for stmt in loop.orelse]
+        return 1, assignments + [loop]
+
+def _is_len_of(node, name=None):
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "len" \
+        and len(node.args) == 1 and not node.keywords and isinstance(node.args[0], ast.Name) \
+        and (name is None or node.args[0].id == name)
+
+@python_rule
+class LoopInvariantLen(_LoopRule):
+    name = "loop_invariant_len"
+    description = "Hoisted len() of a collection the loop doesn't modify"
+
+    def rewrite(self, stmts, i):
+        loop = stmts[i]
+        parts = self.loop_parts(loop)
+        if parts is None or not self.context.builtin("len"):
+            return None
+        # len(x) is only safe to hoist when the loop header already evaluated it
+        # before anything else in the loop: x is then known to have a length
+        head = loop.iter if isinstance(loop, ast.For) else loop.test
+        if isinstance(loop, ast.For):
+            parts = [loop.iter] + parts
+        stored = _bound_names(parts)
+        calls = [n for n in _walk_nodes(parts) if _is_len_of(n) and n.args[0].id not in stored]
+        hoisted = []
+        for name in dict.fromkeys(call.args[0].id for call in calls):
+            if not any(_is_len_of(n, name) for n in ast.walk(head)):
+                continue
+            mine = [call for call in calls if call.args[0].id == name]
+            allowed = {id(call.args[0]) for call in mine} | {id(n.value) for n in _walk_nodes(parts)
+                                                             if isinstance(n, ast.Subscript) and isinstance(n.ctx, ast.Load)}
+            if self._escapes(name) or any(isinstance(n, ast.Name) and n.id == name and id(n) not in allowed
+                                          for n in _walk_nodes(parts)):
+                continue
+            hoisted.extend(mine)
+        if not hoisted:
+            return None
+        return self.hoist(loop, parts, hoisted, lambda call: f"{call.args[0].id}_len")
+
+    def _escapes(self, name):
+        """True if the collection is ever aliased: anything but len(), indexing, iteration and membership tests on it."""
+        plain = set()
+        for node in ast.walk(self.scope):
+            if isinstance(node, ast.Subscript):
+                plain.add(id(node.value))
+            elif _is_len_of(node, name):
+                plain.add(id(node.args[0]))
+            elif isinstance(node, (ast.For, ast.comprehension)):
+                plain.add(id(node.iter))
+            elif isinstance(node, ast.Compare):
+                plain.update(id(c) for c in node.comparators)
+        return any(isinstance(n, ast.Name) and n.id == name and isinstance(n.ctx, ast.Load) and id(n) not in plain
+                   for n in ast.walk(self.scope))
+
+_OPERATOR_WORDS = {ast.Add: "plus", ast.Sub: "minus", ast.Mult: "times"}
+
+def _describe_expression(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Constant):
+        return str(node.value).replace(".", "_").replace("-", "neg")
+    return f"{_describe_expression(node.left)}_{_OPERATOR_WORDS[type(node.op)]}_{_describe_expression(node.right)}"
+
+@python_rule
+class LoopInvariantArithmetic(_LoopRule):
+    name = "loop_invariant_arithmetic"
+    description = "Hoisted arithmetic on values the loop doesn't change"
+
+    def rewrite(self, stmts, i):
+        loop = stmts[i]
+        parts = self.loop_parts(loop)
+        if parts is None:
+            return None
+        stored = _bound_names(parts)
+        found = []
+
+        def invariant(node):
+            if isinstance(node, ast.Name):
+                return node.id not in stored and self.bound_before(node.id, loop)
+            if _number(node):
+                return True
+            return isinstance(node, ast.BinOp) and type(node.op) in _OPERATOR_WORDS \
+                and invariant(node.left) and invariant(node.right)
+
+        def collect(node):
+            if isinstance(node, ast.BinOp) and invariant(node) \
+                    and any(isinstance(n, ast.Name) for n in ast.walk(node)):
+                found.append(node)
+            elif isinstance(node, ast.BoolOp):
+                collect(node.values[0])  # the other operands may be short-circuited
+            elif isinstance(node, ast.IfExp):
+                collect(node.test)
+            elif isinstance(node, ast.Compare):
+                collect(node.left)  # a chained comparison may stop after the first
+                collect(node.comparators[0])
+            elif not isinstance(node, _NESTED):
+                for child in ast.iter_child_nodes(node):
+                    collect(child)
+
+        # Hoisting evaluates the expression once even if the loop never would
+        # have, which could raise where the original didn't
+        for part in self.every_iteration(loop):
+            collect(part)
+        if not found:
+            return None
+        return self.hoist(loop, parts, found,
+                          lambda node: name if len(name := _describe_expression(node)) <= 30 else "invariant")
+
+# Python: source regeneration
+class _Unspliceable(Exception):
+    pass
+
+def _header(node):
+    return ast.dump(type(node)(**{f: ([] if f in _BLOCK_FIELDS else getattr(node, f, None)) for f in node._fields}))
+
+def _changed_regions(old_body, new_body, lines, regions):
+    """Collect (old statements, new statements) pairs covering every difference, as small as possible."""
+    # Unchanged statements stay as written; inserted statements are anchored to the one before them
+    matcher = difflib.SequenceMatcher(None, [ast.dump(s) for s in old_body], [ast.dump(s) for s in new_body], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if tag == "insert":
+            i1, j1 = (i1 - 1, j1 - 1) if i1 else (i1, j1)
+            i2, j2 = (i2, j2) if i1 < i2 else (i2 + 1, j2 + 1)
+        if i2 - i1 != j2 - j1:
+            regions.append((old_body[i1:i2], new_body[j1:j2]))
+        else:
+            _changed_statements(old_body[i1:i2], new_body[j1:j2], lines, regions)
+
+def _changed_statements(old_body, new_body, lines, regions):
+    for old, new in zip(old_body, new_body):
+        if _same(old, new):
+            continue
+        fields = [f for f in _BLOCK_FIELDS if getattr(old, f, None)]
+        nested = type(old) is type(new) and fields and _header(old) == _header(new) and all(
+            bool(getattr(old, f, None)) == bool(getattr(new, f, None)) for f in _BLOCK_FIELDS)
+        # An elif is stored as an If in orelse; it can't be replaced on its own
+        if nested and isinstance(old, ast.If) and old.orelse and \
+                lines[old.orelse[0].lineno - 1].lstrip().startswith("elif"):
+            nested = False
+        if nested:
+            for f in fields:
+                _changed_regions(getattr(old, f), getattr(new, f), lines, regions)
+        else:
+            regions.append(([old], [new]))
+
+def _splice(code, old_tree, new_tree):
+    """
+    Rebuild the source by replacing only the statements that changed, so comments
+    and formatting elsewhere survive. Falls back to unparsing the whole module.
+    """
+    lines = code.split("\n")
+    regions = []
+    _changed_regions(old_tree.body, new_tree.body, lines, regions)
+    try:
+        edits = []
+        for old, new in regions:
+            if not old:
+                raise _Unspliceable()
+            first, last = old[0], old[-1]
+            start = min([first.lineno] + [d.lineno for d in getattr(first, "decorator_list", [])])
+            indent = lines[start - 1].encode()[:first.col_offset].decode()
+            tail = lines[last.end_lineno - 1].encode()[last.end_col_offset:].decode().strip()
+            # Statements sharing a line with code outside the region can't be swapped line by line
+            if indent.strip() or lines[first.lineno - 1].encode()[:first.col_offset].decode().strip() \
+                    or (tail and not tail.startswith("#")):
+                raise _Unspliceable()
+            text = ast.unparse(ast.Module(body=new, type_ignores=[])) if new else ""
+            replacement = [indent + line if line else line for line in text.split("\n")] if text else []
+            edits.append((start, last.end_lineno, replacement))
+        for start, end, replacement in sorted(edits, reverse=True):
+            lines[start - 1:end] = replacement
+        result = "\n".join(lines)
+        if _same(ast.parse(result), new_tree):
+            return result
+    except (_Unspliceable, SyntaxError, UnicodeDecodeError):
+        pass
+    return ast.unparse(new_tree) + "\n"
+
+def _optimize_python(code):
+    try:
+        old_tree, tree = ast.parse(code), ast.parse(code)
+    except SyntaxError:
+        return code, []
+    context = Context(tree)
+    applied = []
+    for rule_class in _PYTHON_RULES:
+        rule = rule_class(context)
+        tree = rule.visit(tree)
+        if rule.lines:
+            applied.append((rule, sorted({line for line in rule.lines if line})))
+    if not applied:
+        return code, []
+    ast.fix_missing_locations(tree)
+    return _splice(code, old_tree, tree), applied
+
+# C / Java: token rules
+_C_LIKE_TOKEN = re.compile(r"""
+      (?P<space>\s+)
+    | (?P<comment>//[^\n]*|/\*.*?\*/)
+    | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    | (?P<name>[A-Za-z_$][\w$]*)
+    | (?P<number>\.?\d[\w.]*)
+    | (?P<op>\+\+|--|->|<<=|>>=|<<|>>|&&|\|\||[-+*/%&|^!=<>]=|.)
+""", re.VERBOSE | re.DOTALL)
+
+_ASSIGNMENT_OPS = frozenset({"=", "+=", "-=", "*=", "/=", "%=", "&=", "|=", "^=", "<<=", ">>=", "++", "--"})
+_OPEN = {"(": ")", "{": "}", "[": "]"}
+
+class Tokens:
+    """
+    A C/Java source as a lossless token list plus a view of its significant
+    tokens (no whitespace or comments). Rules match on `texts` and describe
+    changes as edits over significant-token positions.
+    """
+
+    def __init__(self, code):
+        self.tokens = [[m.lastgroup, m.group()] for m in _C_LIKE_TOKEN.finditer(code)]
+        self.sig = [i for i, (kind, _) in enumerate(self.tokens) if kind not in ("space", "comment")]
+        self.texts = [self.tokens[i][1] for i in self.sig]
+        self.names = {text for kind, text in self.tokens if kind == "name"}
+        self.edits = []
+        self.pending = []
+        self.lines = []
+
+    def close(self, k):
+        """Position of the bracket closing the one at position k (None if unbalanced)."""
+        opener, closer, depth = self.texts[k], _OPEN[self.texts[k]], 0
+        for j in range(k, len(self.texts)):
+            if self.texts[j] == opener:
+                depth += 1
+            elif self.texts[j] == closer:
+                depth -= 1
+                if depth == 0:
+                    return j
+        return None
+
+    def split(self, start, end, separator):
+        """Positions in [start, end) of `separator` at bracket depth zero."""
+        found, depth = [], 0
+        for j in range(start, end):
+            text = self.texts[j]
+            if text in _OPEN:
+                depth += 1
+            elif text in _OPEN.values():
+                depth -= 1
+            elif text == separator and depth == 0:
+                found.append(j)
+        return found
+
+    def source(self, start, end):
+        """Original text (with spacing) of significant positions start..end inclusive."""
+        return "".join(text for _, text in self.tokens[self.sig[start]:self.sig[end] + 1])
+
+    def line(self, k):
+        return 1 + sum(text.count("\n") for _, text in self.tokens[:self.sig[k]])
+
+    def indent(self, k):
+        before = "".join(text for _, text in self.tokens[:self.sig[k]])
+        return re.match(r"[ \t]*", before[before.rfind("\n") + 1:]).group()
+
+    def edit(self, start, end, text, remove_line=False):
+        """Replace significant positions start..end inclusive; remove_line also drops the whitespace before them."""
+        first = self.sig[start]
+        if remove_line and first > 0 and self.tokens[first - 1][0] == "space" and "\n" in self.tokens[first - 1][1]:
+            first -= 1
+        self.pending.append((first, self.sig[end], text, self.line(start)))
+
+    def commit(self):
+        """
+        Keep the edits made since the last commit as one change, unless any of
+        them overlaps an edit already kept (it is then left for the next pass).
+        """
+        pending, self.pending = self.pending, []
+        if not pending or any(first <= other_last and other_first <= last
+               for first, last, _, _ in pending for other_first, other_last, _, _ in self.edits):
+            return False
+        self.edits.extend(pending)
+        self.lines.append(min(line for _, _, _, line in pending))
+        return True
+
+    def apply(self):
+        """Apply the kept edits; returns (code, lines edited)."""
+        for first, last, text, _ in sorted(self.edits, reverse=True):
+            self.tokens[first:last + 1] = [["edit", text]]
+        return "".join(text for _, text in self.tokens), self.lines
+
+    def mutated(self, k):
+        """True if the name at position k is assigned, incremented or has its address taken."""
+        before = self.texts[k - 1] if k else ""
+        after = self.texts[k + 1] if k + 1 < len(self.texts) else ""
+        return after in _ASSIGNMENT_OPS or before in ("++", "--", "&")
+
+_TOKEN_RULES = []
+
+def token_rule(name, description, languages):
+    """Register a C/Java rule: a function taking (Tokens, language) that records edits."""
+    def register(func):
+        _TOKEN_RULES.append((name, description, languages, func))
+        return func
+    return register
+
+def _singular_identifier(name, taken):
+    for candidate in (_singular(name).replace("_item", "Item"), "element"):
+        if candidate not in taken:
+            return candidate
+    n = 1
+    while f"element{n}" in taken:
+        n += 1
+    return f"element{n}"
+
+@token_rule("constant_condition", "Removed a branch on a constant condition", ("C", "Java"))
+def _constant_condition(t, language):
+    constants = {"true": True, "false": False} if language == "Java" else {"1": True, "0": False, "true": True, "false": False}
+    texts = t.texts
+    for k in range(len(texts) - 4):
+        if texts[k] not in ("if", "while") or texts[k + 1] != "(" or texts[k + 2] not in constants \
+                or texts[k + 3] != ")" or texts[k + 4] != "{":
+            continue
+        value = constants[texts[k + 2]]
+        if texts[k] == "while" and value:
+            continue
+        body_end = t.close(k + 4)
+        if body_end is None:
+            continue
+        end, taken = body_end, (k + 4, body_end) if value else None
+        if texts[k] == "if" and body_end + 1 < len(texts) and texts[body_end + 1] == "else":
+            if body_end + 2 >= len(texts) or texts[body_end + 2] != "{":
+                continue  # else-if chains are left alone
+            end = t.close(body_end + 2)
+            if end is None:
+                continue
+            if not value:
+                taken = (body_end + 2, end)
+        if "case" in texts[k:end + 1] or "default" in texts[k:end + 1] or "goto" in texts:
+            continue
+        # Java rejects statements after an unconditional return/throw/break/continue
+        if language == "Java" and taken and {"return", "throw", "break", "continue"} & set(texts[taken[0]:taken[1]]):
+            continue
+        if taken:
+            t.edit(k, end, t.source(*taken))
+        else:
+            t.edit(k, end, "", remove_line=True)
+        t.commit()
+
+def _for_header(t, k):
+    """(init, condition, step, body start, body end) positions of a braced for loop at k, or None."""
+    texts = t.texts
+    if texts[k] != "for" or k + 1 >= len(texts) or texts[k + 1] != "(":
+        return None
+    close = t.close(k + 1)
+    if close is None or close + 1 >= len(texts) or texts[close + 1] != "{":
+        return None
+    semicolons = t.split(k + 2, close, ";")
+    body_end = t.close(close + 1)
+    if len(semicolons) != 2 or body_end is None:
+        return None
+    (a, b) = semicolons
+    return (k + 2, a), (a + 1, b), (b + 1, close), close + 1, body_end
+
+def _counts_up_from_zero(t, init, step):
+    """The index name of `[type] i = 0; ...; i++` (or ++i, i += 1), else None."""
+    texts = t.texts
+    init_texts, step_texts = texts[init[0]:init[1]], texts[step[0]:step[1]]
+    if len(init_texts) < 3 or init_texts[-2:] != ["=", "0"]:
+        return None
+    index = init_texts[-3]
+    if step_texts not in ([index, "++"], ["++", index], [index, "+=", "1"]):
+        return None
+    return index
+
+@token_rule("strlen_condition", "Stopped recomputing strlen() in a loop condition", ("C",))
+def _strlen_condition(t, language):
+    texts = t.texts
+    for k in range(len(texts)):
+        header = _for_header(t, k)
+        if not header:
+            continue
+        init, condition, step, body_start, body_end = header
+        index = _counts_up_from_zero(t, init, step)
+        cond = texts[condition[0]:condition[1]]
+        if not index or len(cond) != 6 or cond[:4] != [index, "<", "strlen", "("] or cond[5] != ")":
+            continue
+        string = cond[4]
+        safe = True
+        for j in range(body_start + 1, body_end):
+            if texts[j] == index and t.mutated(j):
+                safe = False
+            elif texts[j] == string:
+                # The string may only be read through subscripts
+                close = t.close(j + 1) if j + 1 < body_end and texts[j + 1] == "[" else None
+                if close is None or (j and texts[j - 1] in ("++", "--", "&", ".", "->")) or t.mutated(close):
+                    safe = False
+        if safe:
+            t.edit(condition[0], condition[1] - 1, f"{string}[{index}] != '\\0'")
+            t.commit()
+
+@token_rule("index_loop_to_foreach", "Converted to enhanced for loop", ("Java",))
+def _index_loop_to_foreach(t, language):
+    texts = t.texts
+    code = "".join(text for _, text in t.tokens)
+    for k in range(len(texts)):
+        header = _for_header(t, k)
+        if not header:
+            continue
+        init, condition, step, body_start, body_end = header
+        index = _counts_up_from_zero(t, init, step)
+        cond = texts[condition[0]:condition[1]]
+        if not index or texts[init[0]:init[1]][:1] != ["int"] or len(cond) != 5 or cond[:2] != [index, "<"] \
+                or cond[3:] != [".", "length"]:
+            continue
+        array = cond[2]
+        declaration = re.search(rf"\b([\w.]+(?:<[^<>;]*>)?(?:\s*\[\s*\])*)\s*\[\s*\]\s*{re.escape(array)}\b", code) or \
+            re.search(rf"\b([\w.]+(?:<[^<>;]*>)?)\s+{re.escape(array)}\s*\[\s*\]", code)
+        if not declaration:
+            continue
+        reads, safe = [], True
+        for j in range(body_start + 1, body_end):
+            if texts[j] == index:
+                if not (texts[j - 1] == "[" and texts[j - 2] == array and texts[j + 1] == "]"):
+                    safe = False
+            elif texts[j] == array:
+                if texts[j - 1] in (".", "++", "--", "&") or texts[j + 1:j + 4] != ["[", index, "]"] or t.mutated(j + 3):
+                    safe = False
+                else:
+                    reads.append(j)
+        if not safe or not reads:
+            continue
+        element = _singular_identifier(array, t.names)
+        t.edit(k, body_start - 1, f"for ({declaration.group(1)} {element} : {array})")
+        for j in reads:
+            t.edit(j, j + 3, element)
+        if t.commit():
+            t.names.add(element)
+
+@token_rule("string_builder_loop", "Built the string with a StringBuilder instead of += in a loop", ("Java",))
+def _string_builder_loop(t, language):
+    texts = t.texts
+    for k in range(1, len(texts) - 5):
+        if texts[k] != "String" or texts[k - 1] not in (";", "{", "}") or texts[k + 2] != "=" \
+                or t.tokens[t.sig[k + 3]][0] != "string" or texts[k + 4] != ";":
+            continue
+        name, loop = texts[k + 1], k + 5
+        if texts[loop] not in ("for", "while") or texts[loop + 1] != "(":
+            continue
+        header_end = t.close(loop + 1)
+        if header_end is None or texts[header_end + 1] != "{" or name in texts[loop:header_end]:
+            continue
+        body_end = t.close(header_end + 1)
+        if body_end is None:
+            continue
+        appends, safe = [], True
+        for j in range(header_end + 2, body_end):
+            if texts[j] != name or texts[j - 1] == ".":
+                continue
+            ends = t.split(j + 2, body_end, ";")
+            if texts[j - 1] not in (";", "{", "}", ")", "else") or texts[j + 1] != "+=" or not ends \
+                    or name in texts[j + 2:ends[0]]:
+                safe = False
+                break
+            appends.append((j, ends[0]))
+        if not safe or not appends:
+            continue
+        builder = name + "Builder"
+        while builder in t.names:
+            builder += "_"
+        initial = "" if texts[k + 3] == '""' else texts[k + 3]
+        t.edit(k, k + 4, f"StringBuilder {builder} = new StringBuilder({initial});")
+        for j, end in appends:
+            t.edit(j, end, f"{builder}.append({t.source(j + 2, end - 1).strip()});")
+        t.edit(body_end, body_end, f"}}\n{t.indent(k)}String {name} = {builder}.toString();")
+        if t.commit():
+            t.names.add(builder)
+
+_BOXED = frozenset({"Integer", "Long", "Short", "Byte", "Character", "Boolean", "Double", "Float"})
+
+@token_rule("boxed_value_of", "Used valueOf() instead of a boxing constructor", ("Java",))
+def _boxed_value_of(t, language):
+    texts = t.texts
+    for k in range(len(texts) - 2):
+        if texts[k] == "new" and texts[k + 1] in _BOXED and texts[k + 2] == "(":
+            t.edit(k, k + 1, f"{texts[k + 1]}.valueOf")
+            t.commit()
+
+def _optimize_c_like(code, language):
+    applied = []
+    for name, description, languages, rule in _TOKEN_RULES:
+        if language not in languages:
+            continue
+        lines = []
+        for _ in range(MAX_TOKEN_PASSES):
+            tokens = Tokens(code)
+            rule(tokens, language)
+            if not tokens.edits:
+                break
+            code, edited = tokens.apply()
+            lines.extend(edited)
+        if lines:
+            applied.append((name, description, sorted(set(lines))))
+    return code, applied
+
+# Public API
+def optimize(code, language):
+    """
+    Apply the rewrite rules for the language. Returns (code, applied) where
+    applied is one message per rule that changed something, with the lines
+    it touched. Code that doesn't parse, or that no rule matches, comes back
+    unchanged with no messages.
+    """
+    if language == "Python":
+        code, applied = _optimize_python(code)
+        applied = [(rule.name, rule.description, lines) for rule, lines in applied]
+    elif language in ("C", "Java"):
+        code, applied = _optimize_c_like(code, language)
+    else:
+        return code, []
+    messages = []
+    for name, description, lines in applied:
+        where = f" (line{'s' if len(lines) > 1 else ''} {', '.join(map(str, lines))})" if lines else ""
+        messages.append(f"{description}{where}")
+        logger.info(f"Rewrite rule {name} applied to {language} code{where}")
+    return code, messages
+
+def rules(language):
+    """(name, description) of the rules registered for a language, in the order they run."""
+    if language == "Python":
+        return [(rule.name, rule.description) for rule in _PYTHON_RULES]
+    return [(name, description) for name, description, languages, _ in _TOKEN_RULES if language in languages]
+
+def verify(original, rewritten, error=None):
+    """
+    Decide whether a rewrite may be returned, from the benchmark results of the
+    original and rewritten code. Returns (accepted, reason): the rewrite must run,
+    print exactly what the original printed and not be significantly slower
+    (by more than MAX_SLOWDOWN_PERCENT). Code that couldn't be measured, or that
+    prints nothing to compare, leaves the rewrite unverified and so rejected.
+    """
+    if error:
+        return False, f"the rewritten code failed: {error}"
+    if original is None or rewritten is None:
+        return False, "not verified: no toolchain to run it here"
+    if not original.get("output"):
+        return False, "not verified: the code prints nothing, so its behaviour can't be compared"
+    if original.get("output") != rewritten.get("output"):
+        return False, "the rewritten code's output differs from the original's"
+    comparison = benchmark.compare(original, rewritten)
+    if comparison["significant"] and comparison["improvement"] < -MAX_SLOWDOWN_PERCENT:
+        return False, f"the rewritten code is slower ({comparison['improvement']:.2f}% change, p={comparison['p_value']:.3g})"
+    return True, "same output, not slower"
@@ -0,0 +1,316 @@
+import metrics
+import io
+import json
+import logging
+import os
+import queue
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+POOL_SIZE = int(os.environ.get("SANDBOX_WORKERS", os.cpu_count() or 2))
+TIMEOUT_SECONDS = 5                     # wall clock per job
+CPU_LIMIT_SECONDS = 5                   # CPU time per job (RLIMIT_CPU)
+MEMORY_LIMIT_BYTES = 512 * 1024 * 1024  # address space per worker (RLIMIT_AS)
+FILE_SIZE_LIMIT_BYTES = 1024 * 1024     # largest file user code may write (RLIMIT_FSIZE)
+OUTPUT_LIMIT_CHARS = 64 * 1024          # captured stdout/stderr per job
+MAX_JOBS_PER_WORKER = 50                # recycle a worker after this many jobs
+WORKER_CPU_LIMIT_SECONDS = 3600         # CPU time over a worker's whole life (hard RLIMIT_CPU)
+
+# Worker Side
+#
+# Workers are fresh interpreters started from this file, so they share no
+# state with the web app. Requests and results are length-prefixed JSON on
+# the worker's stdin and a duplicate of its original stdout.
+
+class _CappedIO(io.StringIO):
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.truncated = False
+
+    def write(self, s):
+        room = self.limit - self.tell()
+        if room <= 0:
+            self.truncated = self.truncated or bool(s)
+            return len(s)
+        if len(s) > room:
+            self.truncated = True
+        super().write(s[:room])
+        return len(s)
+
+def _read_message(stream):
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    (size,) = struct.unpack(">I", header)
+    return json.loads(stream.read(size).decode("utf-8"))
+
+def _write_message(stream, message):
+    data = json.dumps(message, default=str).encode("utf-8")
+    stream.write(struct.pack(">I", len(data)) + data)
+    stream.flush()
+
+def _apply_limits():
+    try:
+        import resource
+    except ImportError:  # Windows: no rlimits, rely on the wall-clock timeout
+        return
+    for limit, value in ((resource.RLIMIT_AS, MEMORY_LIMIT_BYTES), (resource.RLIMIT_FSIZE, FILE_SIZE_LIMIT_BYTES)):
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError) as e:
+            logger.warning(f"Could not apply sandbox limit {limit}: {e}")
+    # The CPU hard limit is set once for the worker's whole life (a process
+    # can never raise it again); each job only moves the soft limit.
+    try:
+        resource.setrlimit(resource.RLIMIT_CPU, (WORKER_CPU_LIMIT_SECONDS, WORKER_CPU_LIMIT_SECONDS))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Could not apply sandbox CPU limit: {e}")
+
+def _set_cpu_budget(seconds):
+    """
+    Allow the next job `seconds` of CPU on top of what the worker has used
+    so far; going over sends SIGXCPU. Returns False if the limit couldn't be set.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows: rely on the wall-clock timeout
+        return True
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + 1 + seconds
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY and soft > hard:
+        return False
+    try:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+        return True
+    except (ValueError, OSError):
+        return False
+
+def _op_exec(request, stdout, stderr):
+    from contextlib import redirect_stdout, redirect_stderr
+    result = {"error": None}
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            exec(compile(request["code"], "<submission>", "exec"), {"__name__": "__main__"})
+    except BaseException as e:  # SystemExit/KeyboardInterrupt from user code included
+        result["error"] = {"type": type(e).__name__, "message": str(e), "traceback": traceback.format_exc()}
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+# Built-in operations. Any other op is a "module:function" path that the
+# worker imports on first use, so it must not pull in heavy dependencies.
+_OPS = {"exec": _op_exec}
+
+def _resolve_op(name):
+    if name in _OPS:
+        return _OPS[name]
+    if name and ":" in name:
+        import importlib
+        module_name, func_name = name.split(":", 1)
+        try:
+            _OPS[name] = getattr(importlib.import_module(module_name), func_name)
+            return _OPS[name]
+        except (ImportError, AttributeError):
+            return None
+    return None
+
+def _worker_main():
+    protocol_out = os.fdopen(os.dup(1), "wb")
+    # Anything written straight to fd 1/2 must not corrupt the protocol stream
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    protocol_in = sys.stdin.buffer
+    _apply_limits()
+
+    while True:
+        request = _read_message(protocol_in)
+        if request is None:
+            return
+        if not _set_cpu_budget(request.get("cpu_limit", CPU_LIMIT_SECONDS)):
+            # Never run user code without a CPU limit; the pool replaces this worker
+            _write_message(protocol_out, {"error": {"type": "SandboxError", "message": "Could not set the CPU limit"},
+                                          "stdout": "", "stderr": "", "recycle": True})
+            return
+        limit = request.get("output_limit", OUTPUT_LIMIT_CHARS)
+        stdout, stderr = _CappedIO(limit), _CappedIO(limit)
+        op = _resolve_op(request.get("op"))
+        if op is None:
+            result = {"error": {"type": "SandboxError", "message": f"Unknown operation {request.get('op')}"}}
+        else:
+            try:
+                result = op(request, stdout, stderr)
+            except Exception as e:  # a broken operation must not take the worker down
+                result = {"error": {"type": type(e).__name__, "message": str(e), "traceback": traceback.format_exc()}}
+        result["stdout"] = stdout.getvalue()
+        result["stderr"] = stderr.getvalue()
+        result["output_truncated"] = stdout.truncated or stderr.truncated
+        _write_message(protocol_out, result)
+
+# Pool Side
+class _Worker:
+    def __init__(self):
+        self.workdir = tempfile.mkdtemp(prefix="sandbox-")
+        env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": os.path.dirname(os.path.abspath(__file__)),
+               "PYTHONDONTWRITEBYTECODE": "1", "PYTHONHASHSEED": "0"}
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", os.path.abspath(__file__), "--worker"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=self.workdir, env=env)
+        self.jobs = 0
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.wait(timeout=1)
+        except Exception:
+            pass
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except Exception:
+                pass
+        import shutil
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def call(self, request, timeout):
+        """Send one request; returns the decoded result, or raises TimeoutError / EOFError."""
+        _write_message(self.process.stdin, request)
+        box = {}
+
+        def read():
+            try:
+                box["result"] = _read_message(self.process.stdout)
+            except Exception as e:
+                box["error"] = e
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+        reader.join(timeout)
+        if reader.is_alive():
+            raise TimeoutError
+        if box.get("result") is None:
+            raise EOFError(box.get("error") or "worker exited")
+        return box["result"]
+
+_idle = queue.Queue()
+_pool_lock = threading.Lock()
+_started = False
+_stats = {"jobs": 0, "timeouts": 0, "crashes": 0, "recycled": 0}
+
+def _reinit_after_fork():
+    """
+    Runs in a forked child (e.g. a gunicorn worker): the idle workers belong
+    to the parent. Close this process's copies of their pipes, leaving the
+    workers running, and start a pool of its own on first run().
+    """
+    global _idle, _pool_lock, _started
+    inherited = list(_idle.queue)  # not get(): its lock may be held by a thread that didn't survive the fork
+    _idle = queue.Queue()
+    _pool_lock = threading.Lock()
+    _started = False
+    for worker in inherited:
+        for stream in (worker.process.stdin, worker.process.stdout):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def _spawn_async():
+    def spawn():
+        try:
+            _idle.put(_Worker())
+        except Exception as e:
+            logger.error(f"Failed to start sandbox worker: {e}")
+    threading.Thread(target=spawn, daemon=True).start()
+
+def start():
+    """Pre-warm the worker pool. Called lazily by run()."""
+    global _started
+    with _pool_lock:
+        if _started:
+            return
+        for _ in range(POOL_SIZE):
+            _idle.put(_Worker())
+        _started = True
+        logger.info(f"Sandbox pool started with {POOL_SIZE} workers")
+
+def shutdown():
+    global _started
+    with _pool_lock:
+        while True:
+            try:
+                _idle.get_nowait().kill()
+            except queue.Empty:
+                break
+        _started = False
+
+def run(op, timeout=TIMEOUT_SECONDS, **payload):
+    """
+    Run an operation in a pooled sandbox worker.
+    Always returns a dict with 'error' (None or {'type', 'message', ...}), 'stdout' and 'stderr'.
+    """
+    start()
+    request = dict(payload, op=op)
+    try:
+        worker = _idle.get(timeout=timeout + TIMEOUT_SECONDS)
+    except queue.Empty:
+        return {"error": {"type": "SandboxBusyError", "message": "No sandbox worker became available"}, "stdout": "", "stderr": ""}
+    _stats["jobs"] += 1
+    try:
+        with metrics.timer("exec"):
+            result = worker.call(request, timeout)
+    except TimeoutError:
+        _stats["timeouts"] += 1
+        worker.kill()
+        _spawn_async()
+        return {"error": {"type": "TimeoutError", "message": f"Execution timed out after {timeout}s"}, "stdout": "", "stderr": ""}
+    except (EOFError, OSError) as e:
+        _stats["crashes"] += 1
+        try:
+            # The pipe closes a moment before the process is reaped
+            returncode = worker.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            returncode = None
+        worker.kill()
+        _spawn_async()
+        message = "Execution exceeded the CPU time limit" if returncode == -24 else f"Sandbox worker crashed (exit code {returncode}): {e}"
+        return {"error": {"type": "ResourceLimitError", "message": message}, "stdout": "", "stderr": ""}
+
+    worker.jobs += 1
+    if result.pop("recycle", False) or worker.jobs >= MAX_JOBS_PER_WORKER or not worker.alive():
+        _stats["recycled"] += 1
+        worker.kill()
+        _spawn_async()
+    else:
+        _idle.put(worker)
+    return result
+
+def run_python(code, timeout=TIMEOUT_SECONDS):
+    """Execute Python source in the sandbox. See run() for the result shape."""
+    return run("exec", timeout=timeout, code=code)
+
+def stats():
+    snapshot = dict(_stats)
+    snapshot["idle_workers"] = _idle.qsize()
+    return snapshot
+
+if __name__ == "__main__" and "--worker" in sys.argv:
+    _worker_main()
@@ -0,0 +1,173 @@
+from psycopg2 import Error
+import blobs
+import db
+import code_analysis
+import hashlib
+import logging
+import os
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Configuration
+K = 5                   # tokens per k-gram (noise threshold)
+WINDOW = 4              # k-grams per winnowing window (any match of K + WINDOW - 1 tokens is detected)
+MAX_POSTING = 500       # fingerprints shared by more documents than this are boilerplate and skipped
+MIN_SIMILARITY = 20.0   # percent; weaker matches aren't reported
+TOP_MATCHES = 5
+CORPUS_LIMIT = 200000   # most recent code_plag rows loaded at startup
+
+# Fingerprinting
+def _kgram_hash(tokens):
+    digest = hashlib.blake2b("\x1f".join(tokens).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+def fingerprints(code, language):
+    """
+    Winnowed fingerprints of the normalized token stream, as (hash, first_line, last_line).
+    Renaming identifiers or changing literals and layout doesn't change them.
+    """
+    stream = code_analysis.tokens(code, language)
+    if len(stream) < K:
+        return []
+    grams = [(_kgram_hash([t for t, _ in stream[i:i + K]]), stream[i][1], stream[i + K - 1][1])
+             for i in range(len(stream) - K + 1)]
+    if len(grams) <= WINDOW:
+        return [min(grams, key=lambda g: g[0])]
+
+    selected = []
+    last_pos = -1
+    for start in range(len(grams) - WINDOW + 1):
+        # Rightmost minimum in the window, so ties don't select a new position needlessly
+        pos = min(range(start, start + WINDOW), key=lambda i: (grams[i][0], -i))
+        if pos != last_pos:
+            selected.append(grams[pos])
+            last_pos = pos
+    return selected
+
+def _merge_regions(pairs):
+    """Merge (query_start, query_end, doc_start, doc_end) line ranges that touch or overlap."""
+    merged = []
+    for q_start, q_end, d_start, d_end in sorted(pairs):
+        if merged and q_start <= merged[-1][1] + 1:
+            last = merged[-1]
+            merged[-1] = (last[0], max(last[1], q_end), min(last[2], d_start), max(last[3], d_end))
+        else:
+            merged.append((q_start, q_end, d_start, d_end))
+    return merged
+
+# Inverted Index
+_lock = threading.RLock()
+_postings = {}  # (language, hash) -> {doc_key: [(first_line, last_line), ...]}
+_documents = {}  # doc_key -> {"id", "language", "fingerprints"}
+_loaded = threading.Event()
+_loader = None
+
+def add(code, language, doc_id=None):
+    """Index a submission. Identical content (same language) is only indexed once."""
+    language = code_analysis.normalize_language(language)
+    doc_key = code_analysis.content_hash(code, language)
+    prints = fingerprints(code, language)
+    with _lock:
+        if doc_key in _documents:
+            if doc_id is not None and _documents[doc_key]["id"] is None:
+                _documents[doc_key]["id"] = doc_id
+            return doc_key
+        _documents[doc_key] = {"id": doc_id, "language": language, "fingerprints": len({h for h, _, _ in prints})}
+        for h, first, last in prints:
+            _postings.setdefault((language, h), {}).setdefault(doc_key, []).append((first, last))
+    return doc_key
+
+def search(code, language, top=TOP_MATCHES, min_similarity=MIN_SIMILARITY):
+    """
+    Prior submissions sharing fingerprints with this code, best first. An
+    identical earlier submission is a 100% match; call this before add().
+    Each match has id, doc_key, similarity (% of this code's fingerprints found
+    in the match) and regions as (query_start, query_end, match_start, match_end) lines.
+    Only posting lists for this code's own fingerprints are read, so cost
+    depends on the submission's size, not the corpus size.
+    """
+    ensure_loaded()
+    language = code_analysis.normalize_language(language)
+    prints = fingerprints(code, language)
+    distinct = {h for h, _, _ in prints}
+    if not distinct:
+        return []
+
+    shared = {}
+    regions = {}
+    with _lock:
+        for h, first, last in prints:
+            posting = _postings.get((language, h))
+            if not posting or len(posting) > MAX_POSTING:
+                continue
+            for doc_key, locations in posting.items():
+                shared.setdefault(doc_key, set()).add(h)
+                regions.setdefault(doc_key, []).extend((first, last, d_first, d_last) for d_first, d_last in locations)
+        documents = {key: dict(_documents[key]) for key in shared}
+
+    matches = []
+    for doc_key, hashes in shared.items():
+        similarity = len(hashes) / len(distinct) * 100
+        if similarity >= min_similarity:
+            matches.append({
+                "id": documents[doc_key]["id"],
+                "doc_key": doc_key,
+                "similarity": similarity,
+                "regions": _merge_regions(regions[doc_key]),
+            })
+    matches.sort(key=lambda m: m["similarity"], reverse=True)
+    return matches[:top]
+
+def describe(match):
+    label = f"submission #{match['id']}" if match["id"] is not None else f"recent submission {match['doc_key'][:8]}"
+    regions = ", ".join(f"lines {q1}-{q2} ~ {d1}-{d2}" for q1, q2, d1, d2 in match["regions"][:3])
+    return f"{label}: {match['similarity']:.1f}% similar ({regions})"
+
+# Corpus Loading
+def _load_corpus():
+    try:
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT p.id, p.language, p.original_code, b.compression, b.content
+                FROM code_plag p LEFT JOIN code_blobs b ON b.hash = p.original_hash
+                ORDER BY p.id DESC LIMIT %s""", (CORPUS_LIMIT,))
+            rows = cur.fetchall()
+        for row_id, language, inline_code, compression, content in rows:
+            add(blobs.column(inline_code, compression, content), language, row_id)
+        logger.info(f"Plagiarism index built from {len(rows)} prior submissions")
+    except Error as e:
+        logger.error(f"Could not load plagiarism corpus: {e}")
+    finally:
+        _loaded.set()
+
+def _reinit_after_fork():
+    """
+    Runs in a forked child (e.g. a gunicorn worker). The index built so far is
+    shared copy-on-write; if the parent was still loading, this process
+    finishes the job with its own loader (add() skips documents it already has).
+    """
+    global _lock, _loaded, _loader
+    _lock = threading.RLock()
+    if not _loaded.is_set():
+        _loaded = threading.Event()
+        _loader = None
+
+os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def ensure_loaded(wait=False):
+    """Start building the index from code_plag in the background (once per process)."""
+    global _loader
+    with _lock:
+        if _loader is None:
+            _loader = threading.Thread(target=_load_corpus, name="plagiarism-index-loader", daemon=True)
+            _loader.start()
+    if wait:
+        _loaded.wait()
+
+def stats():
+    with _lock:
+        return {"documents": len(_documents), "fingerprints": len(_postings), "loaded": _loaded.is_set()}
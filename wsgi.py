@@ -0,0 +1,7 @@
+# Production entry point for WSGI servers, e.g.
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# Per-process startup (database pool, Gemini client, background threads) is
+# done by the hooks in gunicorn.conf.py, after each worker is forked.
+from app import app
+
+application = app